@@ -1,47 +1,59 @@
 # AI Interaction Tool Package
 # Refactored for better maintainability and organization
+#
+# Public names are loaded lazily (PEP 562) so that importing the package - and
+# starting the MCP server - never touches PyQt5. Qt modules load on the first
+# interaction, or earlier in the background via core.mcp_handler.warm_up().
 
-from .core.dialog import InputDialog
-from .core.config import ConfigManager
-from .ui.file_dialog import FileAttachDialog
-from .ui.file_tree import FileTreeView, FileSystemModel, FileTreeDelegate
-from .ui.styles import get_main_stylesheet, get_file_dialog_stylesheet
-from .utils.translations import get_translations, get_translation
-from .utils.file_utils import read_file_content, validate_file_path
-
-# Legacy compatibility - main entry point
-from .engine import run_ui
-
-# Import description
-from .description import AI_INTERACTION_DESCRIPTION
+import importlib
 
 __version__ = "2.2.0"
 __author__ = "DemonVN"
-__all__ = [
+
+# Public name -> (module, attribute)
+_LAZY_ATTRIBUTES = {
     # Core components
-    'InputDialog',
-    'ConfigManager',
-    
+    'InputDialog': ('.core.dialog', 'InputDialog'),
+    'ConfigManager': ('.core.config', 'ConfigManager'),
+
     # UI components
-    'FileAttachDialog',
-    'FileTreeView',
-    'FileSystemModel', 
-    'FileTreeDelegate',
-    'get_main_stylesheet',
-    'get_file_dialog_stylesheet',
-    
+    'FileAttachDialog': ('.ui.file_dialog', 'FileAttachDialog'),
+    'FileTreeView': ('.ui.file_tree', 'FileTreeView'),
+    'FileSystemModel': ('.ui.file_tree', 'FileSystemModel'),
+    'FileTreeDelegate': ('.ui.file_tree', 'FileTreeDelegate'),
+    'get_main_stylesheet': ('.ui.styles', 'get_main_stylesheet'),
+    'get_file_dialog_stylesheet': ('.ui.styles', 'get_file_dialog_stylesheet'),
+
     # Utilities
-    'get_translations',
-    'get_translation',
-    'read_file_content',
-    'validate_file_path',
-    
-    # Main entry point
-    'run_ui',
-    
+    'get_translations': ('.utils.translations', 'get_translations'),
+    'get_translation': ('.utils.translations', 'get_translation'),
+    'read_file_content': ('.utils.file_utils', 'read_file_content'),
+    'validate_file_path': ('.utils.file_utils', 'validate_file_path'),
+
+    # Legacy compatibility - main entry point
+    'run_ui': ('.engine', 'run_ui'),
+
     # Description
-    'AI_INTERACTION_DESCRIPTION'
-]
+    'AI_INTERACTION_DESCRIPTION': ('.description', 'AI_INTERACTION_DESCRIPTION'),
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    """Import the module behind a public name on first access and cache the value"""
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = _LAZY_ATTRIBUTES[name]
+    value = getattr(importlib.import_module(module_name, __name__), attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
+
 
 def ai_interaction():
-    return run_ui()
\ No newline at end of file
+    from .engine import run_ui
+    return run_ui()
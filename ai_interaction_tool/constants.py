@@ -9,6 +9,16 @@ MAX_FILE_LIST_HEIGHT = 80
 
 # File settings
 CONFIG_FILENAME = "config.json"
+CONFIG_PATH_ENV_VAR = "AI_INTERACTION_CONFIG_PATH"  # Ghi đè đường dẫn config (benchmark, CI)
+CONFIG_SAVE_DELAY = 0.5  # Giây chờ sau thay đổi cuối cùng trước khi ghi config (gộp nhiều thay đổi)
+CONFIG_SAVE_MAX_DELAY = 3.0  # Giây tối đa một thay đổi được nằm chờ khi thay đổi liên tục (resize)
+CONFIG_BACKEND_ENV_VAR = "AI_INTERACTION_CONFIG_BACKEND"  # "json" (mặc định) hoặc "sqlite"
+DEFAULT_CONFIG_BACKEND = "json"
+CONFIG_DB_BUSY_TIMEOUT = 5.0  # Giây chờ khi process khác đang ghi database SQLite
+WORKSPACE_PROFILE_LIMIT = 20  # Số workspace profile tối đa, profile dùng lâu nhất bị xóa trước (LRU)
+WORKSPACE_EXPANDED_PATHS_LIMIT = 200  # Số thư mục đang mở được nhớ cho mỗi workspace
+LIST_STORE_DIRNAME = "config_lists"  # Thư mục (cạnh config) chứa attached files/images dạng append-only
+LIST_STORE_COMPACT_OPS = 64  # Số thao tác được append trước khi file danh sách được ghi gọn lại
 SUPPORTED_ENCODINGS = ["utf-8", "utf-8-sig", "latin-1", "cp1252"]
 
 # UI settings
@@ -17,6 +27,80 @@ SHADOW_BLUR_RADIUS = 15
 SHADOW_OFFSET = (0, 0)
 SHADOW_OPACITY = 80
 
+# UI host process settings - giữ QApplication và InputDialog dựng sẵn trong process riêng
+UI_HOST_ENABLED = True
+UI_HOST_START_TIMEOUT = 30  # Giây chờ host khởi động xong trước khi bỏ cuộc
+UI_HOST_MAX_RESTARTS = 5  # Số lần restart tối đa trong một cửa sổ thời gian
+UI_HOST_RESTART_WINDOW = 60  # Giây
+
+# Responder backend - "qt" (dialog), "replay:<file.jsonl>", "replay-loop:<file.jsonl>", "stdin[:<path>]"
+RESPONDER_ENV_VAR = "AI_INTERACTION_RESPONDER"
+DEFAULT_RESPONDER = "qt"
+
+# Dialog pool - giữ InputDialog đã dựng sẵn và reset giữa các lần gọi
+DIALOG_POOL_ENABLED = True
+DIALOG_POOL_SIZE = 1  # Số dialog rảnh tối đa được giữ lại
+
+# Dựng dialog theo từng phần: prompt + ô nhập trước, phần đính kèm/hiệu ứng dựng dần trên event loop
+PROGRESSIVE_BUILD_ENABLED = True
+
+# Multi-session settings - nhiều request đồng thời hiển thị thành tab trong một cửa sổ
+SESSION_PROMPT_PREVIEW_LENGTH = 60  # Số ký tự prompt hiển thị trong metrics
+SESSION_TAB_TITLE_LENGTH = 24  # Số ký tự prompt hiển thị trên tab
+SESSION_STATUS_REFRESH_MS = 1000  # Chu kỳ cập nhật thời gian chờ trên cửa sổ
+
+# Image optimization - ảnh lớn được thu nhỏ/nén lại (Pillow) trước khi gửi cho model
+IMAGE_OPTIMIZE_ENABLED = True  # Không có Pillow thì ảnh được gửi nguyên bản
+IMAGE_MAX_DIMENSION_ENV_VAR = "AI_INTERACTION_IMAGE_MAX_DIMENSION"  # 0 = không giới hạn
+IMAGE_MAX_BYTES_ENV_VAR = "AI_INTERACTION_IMAGE_MAX_BYTES"  # 0 = không giới hạn
+DEFAULT_IMAGE_MAX_DIMENSION = 1568  # Cạnh dài tối đa (px), model tự thu nhỏ ảnh lớn hơn mức này
+DEFAULT_IMAGE_MAX_BYTES = 1024 * 1024  # Dung lượng tối đa mỗi ảnh sau khi nén
+IMAGE_JPEG_QUALITY = 85  # Chất lượng JPEG ban đầu
+IMAGE_MIN_JPEG_QUALITY = 50  # Dưới mức này thì thu nhỏ ảnh thay vì giảm chất lượng tiếp
+# Ngân sách cho tất cả ảnh trong một response - vượt thì ảnh bị thu nhỏ/giảm chất lượng
+# dần, cuối cùng mới bỏ ảnh ưu tiên thấp nhất (đính kèm sau cùng)
+IMAGE_BUDGET_BYTES_ENV_VAR = "AI_INTERACTION_IMAGE_BUDGET_BYTES"  # 0 = không giới hạn
+IMAGE_BUDGET_TOKENS_ENV_VAR = "AI_INTERACTION_IMAGE_BUDGET_TOKENS"  # 0 = không giới hạn
+DEFAULT_IMAGE_BUDGET_BYTES = 4 * 1024 * 1024  # Tổng byte ảnh (trước base64) mỗi response
+DEFAULT_IMAGE_BUDGET_TOKENS = 16000  # Tổng token ảnh ước lượng mỗi response
+IMAGE_TOKEN_PIXELS = 750  # Token ảnh ≈ width * height / 750 (sau khi model thu nhỏ về DEFAULT_IMAGE_MAX_DIMENSION)
+IMAGE_BUDGET_MIN_DIMENSION = 512  # Cạnh dài không bị thu nhỏ dưới mức này - bỏ ảnh thay vì thu nhỏ tiếp
+# Định dạng (nhận ra theo magic bytes) client MCP decode được; định dạng khác
+# (BMP, TIFF, ICO...) được chuyển sang PNG khi thêm ảnh
+CLIENT_IMAGE_FORMATS = ("png", "jpeg", "gif", "webp")
+
+# Image ingestion - copy/hash/decode thumbnail của ảnh đính kèm chạy trên thread pool
+IMAGE_INGEST_WORKERS = 4  # Số thread xử lý ảnh song song
+IMAGE_INGEST_CHUNK_SIZE = 1024 * 1024  # Byte mỗi lần copy, giữa các chunk kiểm tra hủy và báo tiến độ
+IMAGE_INGEST_SUBMIT_TIMEOUT = 10.0  # Giây tối đa chờ ảnh đang xử lý khi user bấm Gửi
+IMAGE_PREVIEW_SIZE = (122, 92)  # Kích thước thumbnail trên thẻ preview
+IMAGE_RESTORE_BATCH_SIZE = 6  # Số thẻ preview của ảnh đã lưu được dựng mỗi lượt event loop
+IMAGE_VIEWER_REFINE_DELAY_MS = 150  # Image viewer vẽ lại mượt sau khi ngừng zoom/kéo chừng này ms
+
+# Ảnh paste từ clipboard được encode trên thread pool theo định dạng cấu hình được:
+# "png[:0-9]" (mức nén zlib), "webp" (lossless) / "webp:<quality>", "jpeg[:quality]"
+PASTE_FORMAT_ENV_VAR = "AI_INTERACTION_PASTE_FORMAT"
+DEFAULT_PASTE_FORMAT = "png:1"  # Nén nhẹ: nhanh gần gấp rưỡi mức mặc định, file chỉ lớn hơn vài %
+
+# Image store - ảnh trong user_images được lưu theo SHA-256 (mỗi nội dung một blob)
+IMAGES_DIR_ENV_VAR = "AI_INTERACTION_IMAGES_DIR"  # Ghi đè thư mục user_images (benchmark, test)
+IMAGE_STORE_DIRNAME = "store"  # Thư mục con của user_images chứa blob và index
+IMAGE_STORE_LINK_FILES = True  # Hardlink ảnh gốc vào store khi cùng filesystem thay vì copy (file gốc sửa tại chỗ thì ảnh bị bỏ)
+IMAGE_STORE_GC_GRACE = 600  # Giây một blob hết reference được giữ lại trước khi bị xóa
+IMAGE_STORE_GC_INTERVAL = 300  # Giây tối thiểu giữa hai lần dọn store trong một process
+IMAGE_STORE_SESSION_TTL = 7 * 24 * 3600  # Giây - reference của dialog không được làm mới lâu hơn thì bị bỏ
+IMAGE_THUMBNAIL_DIRNAME = "thumbnails"  # Thư mục con của user_images chứa thumbnail đã decode
+
+# Giới hạn dung lượng image store - sweeper nền xóa ảnh lâu không dùng nhất (LRU) khi vượt,
+# kể cả ảnh đã lưu trong config; ảnh đang đính kèm trong dialog đang mở thì không bao giờ bị xóa
+IMAGE_STORE_MAX_BYTES_ENV_VAR = "AI_INTERACTION_IMAGE_STORE_MAX_BYTES"  # 0 = không giới hạn
+IMAGE_STORE_MAX_AGE_DAYS_ENV_VAR = "AI_INTERACTION_IMAGE_STORE_MAX_AGE_DAYS"  # 0 = không giới hạn
+IMAGE_STORE_MAX_FILES_ENV_VAR = "AI_INTERACTION_IMAGE_STORE_MAX_FILES"  # 0 = không giới hạn
+DEFAULT_IMAGE_STORE_MAX_BYTES = 1024 * 1024 * 1024  # Tổng dung lượng blob tối đa
+DEFAULT_IMAGE_STORE_MAX_AGE_DAYS = 30  # Ảnh không được dùng lâu hơn chừng này ngày thì bị xóa
+DEFAULT_IMAGE_STORE_MAX_FILES = 2000  # Số blob tối đa
+IMAGE_STORE_EVICT_BATCH = 50  # Số blob xóa mỗi transaction, giữa các lượt process khác ghi được index
+
 # Default paths
 DEFAULT_PATH = os.path.expanduser("~")
 
@@ -1,23 +1,50 @@
 # Core module for AI Interaction Tool
 # Contains main dialog, configuration management, response formatting, and MCP handler
+# InputDialog (PyQt5) is loaded lazily so the MCP server can import this package without Qt
 
-from .dialog import InputDialog
-from .config import ConfigManager
+from .config import ConfigManager, get_config_manager
 from .response_formatter import (
     format_mixed_response, 
     format_text_only_response, 
     build_error_response,
     validate_response_data
 )
-from .mcp_handler import ai_interaction_tool, get_tool_description
+from .responders import (
+    Responder,
+    QtDialogResponder,
+    ReplayResponder,
+    StdinResponder,
+    create_responder,
+    get_responder,
+    set_responder
+)
+from .mcp_handler import ai_interaction_tool, get_tool_description, get_interaction_metrics, warm_up
 
 __all__ = [
     'InputDialog', 
     'ConfigManager',
+    'get_config_manager',
     'format_mixed_response',
     'format_text_only_response', 
     'build_error_response',
     'validate_response_data',
     'ai_interaction_tool',
-    'get_tool_description'
-] 
\ No newline at end of file
+    'get_tool_description',
+    'get_interaction_metrics',
+    'warm_up',
+    'Responder',
+    'QtDialogResponder',
+    'ReplayResponder',
+    'StdinResponder',
+    'create_responder',
+    'get_responder',
+    'set_responder'
+] 
+
+
+def __getattr__(name):
+    if name == 'InputDialog':
+        from .dialog import InputDialog
+        globals()['InputDialog'] = InputDialog
+        return InputDialog
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
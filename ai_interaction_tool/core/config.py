@@ -1,29 +1,93 @@
 # Configuration management for AI Interaction Tool
+import atexit
+import copy
+import hashlib
 import json
 import os
+import sqlite3
 import sys
-from ..constants import CONFIG_FILENAME, DEFAULT_LANGUAGE
+import threading
+import time
+import weakref
+from ..constants import (
+    CONFIG_FILENAME, CONFIG_PATH_ENV_VAR, DEFAULT_LANGUAGE,
+    CONFIG_SAVE_DELAY, CONFIG_SAVE_MAX_DELAY, WORKSPACE_PROFILE_LIMIT, LIST_STORE_DIRNAME
+)
+from ..utils import metrics
+from .config_store import create_config_store
+from .image_store import get_image_store
+from .list_store import ListStore, SqliteListStore
+
+# Mọi ConfigManager còn sống, để flush khi thoát và trước khi đọc lại file
+_managers = weakref.WeakSet()
+
+
+def flush_all_configs():
+    """Ghi ngay mọi thay đổi đang chờ của tất cả ConfigManager trong process"""
+    for manager in list(_managers):
+        manager.flush()
+
+
+atexit.register(flush_all_configs)
+
 
 class ConfigManager:
     """
     Quản lý cấu hình cho AI Interaction Tool
+    
+    Ghi kiểu write-behind: set()/save_config() chỉ đánh dấu dirty và hẹn giờ,
+    một loạt thay đổi liên tiếp được gộp thành một lần ghi file. flush() ghi ngay
+    (khi đóng dialog, khi thoát process); save_config(wait=True) cũng vậy và trả
+    về kết quả của lần ghi.
+    
+    Dialog và widget dùng chung một instance qua get_config_manager() và
+    subscribe() để nhận thay đổi thay vì đọc lại file.
+    
+    Backend lưu trữ: config.json (mặc định) hoặc SQLite/WAL khi nhiều process
+    cùng ghi config (AI_INTERACTION_CONFIG_BACKEND=sqlite), xem config_store.py.
+    
+    Attached files và metadata ảnh của từng workspace không nằm trong config mà
+    trong các file append-only riêng (list_store.py), để đổi một preference nhỏ
+    không phải ghi lại cả danh sách dài. Với backend SQLite chúng là record
+    trong cùng database.
     """
     
-    def __init__(self):
+    def __init__(self, backend=None):
         """
         Khởi tạo ConfigManager với đường dẫn file cấu hình
+        
+        Args:
+            backend (str): "json" hoặc "sqlite", mặc định theo biến môi trường
         """
-        self.config_path = os.path.join(
+        self.config_path = os.environ.get(CONFIG_PATH_ENV_VAR) or os.path.join(
             os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 
             CONFIG_FILENAME
         )
+        self.store = create_config_store(self.config_path, backend)
+        self._lock = threading.RLock()
+        # Giữ thứ tự các lần ghi khi timer thread và UI thread cùng flush
+        self._write_lock = threading.Lock()
+        self._dirty = False
+        self._dirty_since = None
+        self._dirty_keys = set()
+        self._save_timer = None
+        # Kết quả lần ghi gần nhất, save_config() báo lại cho lần gọi sau
+        self._last_write_ok = True
+        self._subscribers = []
+        # Danh sách lớn tách khỏi config: tên file -> ListStore (tạo khi cần)
+        self.list_dir = os.path.join(os.path.dirname(self.config_path), LIST_STORE_DIRNAME)
+        self._lists = {}
+        self._dirty_lists = set()
+        
         self.config = self._load_default_config()
         self.load_config()
         
         # Ensure config file exists - create it if this is first run
-        if not os.path.exists(self.config_path):
-            print(f"[ConfigManager] First run detected, creating config file at {self.config_path}", file=sys.stderr)
-            self.save_config()
+        if not self.store.exists():
+            print(f"[ConfigManager] First run detected, creating config file at {self.store.path}", file=sys.stderr)
+            self._write_config(full=True)
+        
+        _managers.add(self)
     
     def _load_default_config(self):
         """
@@ -49,17 +113,25 @@ class ConfigManager:
         """
         Tải cấu hình từ file config.json nếu tồn tại
         """
+        # Thay đổi chưa ghi (của mình hoặc manager khác) phải xuống file trước,
+        # nếu không file cũ sẽ đè lên chúng khi merge
+        flush_all_configs()
         try:
-            if os.path.exists(self.config_path):
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    loaded_config = json.load(f)
+            loaded_config = self.store.load()
+            if loaded_config is not None:
+                with self._lock:
                     # Merge với config mặc định để đảm bảo có đủ các key
                     # Use recursive merge để preserve nested structure
                     self._deep_merge(self.config, loaded_config)
-                    print(f"[ConfigManager] Đã tải cấu hình từ {self.config_path}", file=sys.stderr)
+                    # Process khác có thể đã ghi các danh sách
+                    for list_store in self._lists.values():
+                        list_store.invalidate()
+                metrics.increment("config.loads")
+                self._migrate_inline_lists()
+                print(f"[ConfigManager] Đã tải cấu hình từ {self.store.path}", file=sys.stderr)
             else:
                 print(f"[ConfigManager] File cấu hình không tồn tại, sử dụng cấu hình mặc định", file=sys.stderr)
-        except (json.JSONDecodeError, FileNotFoundError, PermissionError) as e:
+        except (json.JSONDecodeError, FileNotFoundError, PermissionError, sqlite3.Error) as e:
             print(f"[ConfigManager] Lỗi khi tải cấu hình: {str(e)}", file=sys.stderr)
             print(f"[ConfigManager] Sử dụng cấu hình mặc định", file=sys.stderr)
             # Reset to default config on any error
@@ -83,61 +155,224 @@ class ConfigManager:
             else:
                 base_dict[key] = value
     
-    def save_config(self):
+    def save_config(self, wait=False):
+        """
+        Yêu cầu lưu cấu hình - ghi trễ và gộp với các thay đổi tiếp theo
+        
+        Args:
+            wait (bool): Ghi ngay (flush()) thay vì hẹn giờ
+        
+        Returns:
+            bool: Với wait=True là kết quả của flush(). Không thì lần ghi thật diễn ra
+            sau CONFIG_SAVE_DELAY, nên chỉ báo được lần ghi trước: False nếu nó lỗi
+            (thay đổi vẫn được giữ và ghi lại lần sau)
+        """
+        metrics.increment("config.save_requests")
+        if wait:
+            return self.flush()
+        with self._lock:
+            if not self._dirty and not self._dirty_lists:
+                # set() không đổi giá trị nào - không cần ghi
+                metrics.increment("config.writes_avoided")
+                return self._last_write_ok
+            if self._save_timer is not None:
+                # Đã có lần ghi đang chờ, lần yêu cầu này được gộp vào đó
+                metrics.increment("config.writes_avoided")
+                self._save_timer.cancel()
+            
+            # Debounce, nhưng không để thay đổi nằm chờ quá CONFIG_SAVE_MAX_DELAY
+            remaining = self._dirty_since + CONFIG_SAVE_MAX_DELAY - time.monotonic()
+            delay = max(0.0, min(CONFIG_SAVE_DELAY, remaining))
+            self._save_timer = threading.Timer(delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+            return self._last_write_ok
+    
+    def flush(self):
+        """
+        Ghi ngay các thay đổi đang chờ (nếu có)
+        
+        Returns:
+            bool: True nếu không có gì để ghi hoặc ghi thành công
+        """
+        with self._lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            dirty_lists = self._dirty_lists
+            self._dirty_lists = set()
+            if not self._dirty:
+                self._dirty_since = None
+        
+        success = self._write_lists(dirty_lists)
+        if self._dirty:
+            success = self._write_config() and success
+        self._last_write_ok = success
+        return success
+    
+    def is_dirty(self):
+        """True nếu còn thay đổi chưa ghi xuống file"""
+        return self._dirty or bool(self._dirty_lists)
+    
+    def _mark_dirty(self, key=None):
+        if not self._dirty:
+            self._dirty = True
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+        if key is not None:
+            self._dirty_keys.add(key)
+    
+    def _write_lists(self, names):
+        """Ghi các danh sách append-only đã thay đổi"""
+        success = True
+        for name in names:
+            list_store = self._lists.get(name)
+            if list_store is None:
+                continue
+            try:
+                list_store.flush()
+            except (OSError, sqlite3.Error) as e:
+                print(f"[ConfigManager] Lỗi khi lưu {list_store.path}: {str(e)}", file=sys.stderr)
+                with self._lock:
+                    self._dirty_lists.add(name)
+                    if self._dirty_since is None:
+                        self._dirty_since = time.monotonic()
+                success = False
+        return success
+    
+    def _write_config(self, full=False):
         """
-        Lưu cấu hình vào file config.json
+        Lưu cấu hình xuống store (config.json hoặc database SQLite)
+        
+        Args:
+            full (bool): Ghi toàn bộ config thay vì chỉ các key đã đổi
         
         Returns:
             bool: True nếu lưu thành công, False nếu có lỗi
         """
-        try:
+        with self._write_lock:
+            started = time.perf_counter()
             # Validate config before saving
             if not isinstance(self.config, dict):
                 print(f"[ConfigManager] Cấu hình không hợp lệ (không phải dict)", file=sys.stderr)
                 return False
             
-            # Tạo thư mục nếu chưa tồn tại
-            config_dir = os.path.dirname(self.config_path)
-            os.makedirs(config_dir, exist_ok=True)
-            
-            # Write to temporary file first, then rename (atomic operation)
-            temp_path = self.config_path + '.tmp'
-            with open(temp_path, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=2)
+            # Chụp dữ liệu dưới lock để timer thread không đọc config đang bị sửa dở,
+            # phần I/O chạy ngoài lock nên UI thread không bị chặn
+            with self._lock:
+                dirty_keys = self._dirty_keys
+                payload = self.store.prepare(self.config, None if full else dirty_keys)
+                self._dirty = False
+                if not self._dirty_lists:
+                    self._dirty_since = None
+                self._dirty_keys = set()
             
-            # Atomic rename to prevent corruption
-            if os.path.exists(self.config_path):
-                # Backup existing config before replace
-                backup_path = self.config_path + '.bak'
-                if os.path.exists(backup_path):
-                    os.remove(backup_path)
-                os.rename(self.config_path, backup_path)
-            
-            os.rename(temp_path, self.config_path)
+            try:
+                self.store.commit(payload)
+            except (PermissionError, OSError, sqlite3.Error) as e:
+                print(f"[ConfigManager] Lỗi quyền truy cập khi lưu cấu hình: {str(e)}", file=sys.stderr)
+                # Giữ dirty để lần flush sau thử lại
+                self._restore_dirty(dirty_keys)
+                return False
+            except Exception as e:
+                print(f"[ConfigManager] Lỗi không mong đợi khi lưu cấu hình: {str(e)}", file=sys.stderr)
+                self._restore_dirty(dirty_keys)
+                return False
             
-            print(f"[ConfigManager] Đã lưu cấu hình vào {self.config_path}", file=sys.stderr)
+            metrics.increment("config.writes")
+            metrics.record_timing("config.write", time.perf_counter() - started)
+            print(f"[ConfigManager] Đã lưu cấu hình vào {self.store.path}", file=sys.stderr)
             return True
-            
-        except (PermissionError, OSError) as e:
-            print(f"[ConfigManager] Lỗi quyền truy cập khi lưu cấu hình: {str(e)}", file=sys.stderr)
-            # Clean up temp file if exists
-            temp_path = self.config_path + '.tmp'
-            if os.path.exists(temp_path):
-                try:
-                    os.remove(temp_path)
-                except:
-                    pass
+    
+    def _restore_dirty(self, dirty_keys):
+        with self._lock:
+            self._mark_dirty()
+            self._dirty_keys |= dirty_keys
+    
+    # === Danh sách append-only ===
+    # <list_dir>/<kind>.<workspace profile id hoặc "global">.jsonl,
+    # hoặc record <kind>.<scope> trong bảng lists khi dùng backend SQLite
+    
+    def _get_list(self, kind, workspace_path):
+        scope = self._workspace_profile_id(workspace_path) if workspace_path else 'global'
+        name = f'{kind}.{scope}'
+        with self._lock:
+            list_store = self._lists.get(name)
+            if list_store is None:
+                path = os.path.join(self.list_dir, name + '.jsonl')
+                if self.store.name == 'sqlite':
+                    list_store = SqliteListStore(self.store.path, name, legacy_path=path)
+                else:
+                    list_store = ListStore(path)
+                self._lists[name] = list_store
+        return name, list_store
+    
+    def _set_list(self, kind, workspace_path, items):
+        """Cập nhật một danh sách; True nếu có thay đổi (đã hẹn ghi)"""
+        name, list_store = self._get_list(kind, workspace_path)
+        if not list_store.replace(items):
             return False
+        with self._lock:
+            self._dirty_lists.add(name)
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+        if kind == 'attached_images':
+            self._update_image_refs(list_store, items)
+        self._notify(kind, items)
+        return True
+    
+    @staticmethod
+    def _update_image_refs(list_store, items):
+        """Ảnh đã lưu giữ reference tới blob của nó trong image store (một holder mỗi danh sách)"""
+        try:
+            image_store = get_image_store()
+            image_store.set_holder_refs(
+                f'config:{list_store.path}',
+                [item.get('sha256') or image_store.sha_from_path(item.get('db_path')) for item in items]
+            )
         except Exception as e:
-            print(f"[ConfigManager] Lỗi không mong đợi khi lưu cấu hình: {str(e)}", file=sys.stderr)
-            # Clean up temp file if exists
-            temp_path = self.config_path + '.tmp'
-            if os.path.exists(temp_path):
-                try:
-                    os.remove(temp_path)
-                except:
-                    pass
-            return False
+            print(f"[ConfigManager] Lỗi khi cập nhật reference ảnh: {str(e)}", file=sys.stderr)
+    
+    def _delete_lists(self, workspace_path):
+        for kind in ('attached_files', 'attached_images'):
+            name, list_store = self._get_list(kind, workspace_path)
+            with self._lock:
+                self._dirty_lists.discard(name)
+            if kind == 'attached_images':
+                self._update_image_refs(list_store, [])
+            try:
+                list_store.delete()
+            except (OSError, sqlite3.Error) as e:
+                print(f"[ConfigManager] Lỗi khi xóa {list_store.path}: {str(e)}", file=sys.stderr)
+    
+    def _migrate_inline_lists(self):
+        """Chuyển danh sách còn nằm trong config (phiên bản cũ) sang file append-only"""
+        migrated = False
+        profiles = self.get('workspace_profiles', {}) or {}
+        for profile_id, profile in profiles.items():
+            if not isinstance(profile, dict):
+                continue
+            for kind in ('attached_files', 'attached_images'):
+                if kind in profile:
+                    if profile.get('path'):
+                        self._set_list(kind, profile['path'], profile[kind] or [])
+                    self.delete(f'workspace_profiles.{profile_id}.{kind}')
+                    migrated = True
+        
+        workspace_path = self.get_last_workspace()
+        if isinstance(self.get('last_workspace'), dict) and 'attached_files' in self.get('last_workspace'):
+            if workspace_path:
+                self._set_list('attached_files', workspace_path, self.get('last_workspace.attached_files') or [])
+            self.delete('last_workspace.attached_files')
+            migrated = True
+        if self.get('last_attached_images') is not None:
+            self._set_list('attached_images', workspace_path, self.get('last_attached_images') or [])
+            self.delete('last_attached_images')
+            migrated = True
+        
+        if migrated:
+            print(f"[ConfigManager] Đã chuyển attached files/images sang {self.list_dir}", file=sys.stderr)
+            self.save_config()
     
     def get(self, key, default=None):
         """
@@ -152,15 +387,20 @@ class ConfigManager:
         """
         try:
             keys = key.split('.')
-            value = self.config
-            
-            for k in keys:
-                if isinstance(value, dict) and k in value:
-                    value = value[k]
-                else:
-                    return default
-            
-            return value
+            with self._lock:
+                value = self.config
+                
+                for k in keys:
+                    if isinstance(value, dict) and k in value:
+                        value = value[k]
+                    else:
+                        return default
+                
+                # Trả bản copy của list/dict: sửa tại chỗ ở phía caller không được
+                # âm thầm đổi config (dirty tracking sẽ không thấy thay đổi đó)
+                if isinstance(value, (dict, list)):
+                    return copy.deepcopy(value)
+                return value
         except Exception:
             return default
     
@@ -174,18 +414,88 @@ class ConfigManager:
         """
         try:
             keys = key.split('.')
+            with self._lock:
+                config_ref = self.config
+                
+                # Navigate to the parent of the target key
+                for k in keys[:-1]:
+                    if k not in config_ref:
+                        config_ref[k] = {}
+                    config_ref = config_ref[k]
+                
+                # Chỉ đánh dấu dirty khi giá trị thật sự thay đổi
+                if keys[-1] in config_ref and config_ref[keys[-1]] == value:
+                    return
+                # Copy để caller sửa list/dict của mình sau đó không làm đổi config ngầm
+                config_ref[keys[-1]] = copy.deepcopy(value)
+                self._mark_dirty(key)
+        except Exception as e:
+            print(f"[ConfigManager] Lỗi khi đặt cấu hình {key}: {str(e)}", file=sys.stderr)
+            return
+        
+        # Gọi subscriber ngoài lock để callback có thể đọc/ghi config
+        self._notify(key, value)
+    
+    def delete(self, key):
+        """
+        Xóa một key cấu hình (dot notation), không làm gì nếu key không tồn tại
+        
+        Args:
+            key (str): Key cấu hình
+        """
+        keys = key.split('.')
+        with self._lock:
             config_ref = self.config
-            
-            # Navigate to the parent of the target key
             for k in keys[:-1]:
-                if k not in config_ref:
-                    config_ref[k] = {}
+                if not isinstance(config_ref, dict) or k not in config_ref:
+                    return
                 config_ref = config_ref[k]
-            
-            # Set the value
-            config_ref[keys[-1]] = value
-        except Exception as e:
-            print(f"[ConfigManager] Lỗi khi đặt cấu hình {key}: {str(e)}", file=sys.stderr)
+            if not isinstance(config_ref, dict) or keys[-1] not in config_ref:
+                return
+            del config_ref[keys[-1]]
+            self._mark_dirty(key)
+        self._notify(key, None)
+    
+    def subscribe(self, callback):
+        """
+        Đăng ký nhận thay đổi cấu hình
+        
+        Bound method được giữ bằng weak reference nên subscriber bị hủy sẽ tự rời đi.
+        Callback chạy trên thread gọi set(); widget Qt nên chuyển tiếp qua signal.
+        
+        Args:
+            callback: Hàm callback(key, value), key ở dạng dot notation như khi gọi set()
+        """
+        ref = weakref.WeakMethod(callback) if hasattr(callback, '__self__') else (lambda: callback)
+        with self._lock:
+            self._subscribers.append(ref)
+    
+    def unsubscribe(self, callback):
+        """Hủy đăng ký callback đã subscribe()"""
+        with self._lock:
+            self._subscribers = [ref for ref in self._subscribers if ref() not in (None, callback)]
+    
+    def _notify(self, key, value):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        
+        dead = []
+        for ref in subscribers:
+            callback = ref()
+            if callback is None:
+                dead.append(ref)
+                continue
+            try:
+                callback(key, value)
+            except RuntimeError:
+                # Widget Qt đã bị xóa phía C++ nhưng wrapper Python còn sống
+                dead.append(ref)
+            except Exception as e:
+                print(f"[ConfigManager] Subscriber lỗi khi nhận thay đổi {key}: {str(e)}", file=sys.stderr)
+        
+        if dead:
+            with self._lock:
+                self._subscribers = [ref for ref in self._subscribers if ref not in dead]
     
     def get_language(self):
         """
@@ -213,7 +523,9 @@ class ConfigManager:
         Returns:
             tuple: (width, height)
         """
-        size = self.get('window_size', {'width': 900, 'height': 750})
+        # Mỗi workspace nhớ kích thước cửa sổ riêng
+        profile = self.get_workspace_profile(self.get_last_workspace())
+        size = (profile or {}).get('window_size') or self.get('window_size', {'width': 900, 'height': 750})
         return size.get('width', 900), size.get('height', 750)
     
     def set_window_size(self, width, height):
@@ -225,6 +537,8 @@ class ConfigManager:
             height (int): Chiều cao
         """
         self.set('window_size', {'width': width, 'height': height})
+        # Resize không tính là "dùng" workspace: chỉ đổi kích thước, giữ last_used
+        self._update_current_workspace_profile(touch=False, window_size={'width': width, 'height': height})
         self.save_config()
     
     def get_last_workspace(self):
@@ -244,11 +558,13 @@ class ConfigManager:
             workspace_path (str): Đường dẫn workspace hoặc None để clear
         """
         if workspace_path:
-            workspace_name = os.path.basename(workspace_path)
+            # Attached files/images nằm trong danh sách riêng của từng workspace,
+            # đổi workspace chỉ là đổi danh sách được đọc
             self.set('last_workspace', {
                 'path': workspace_path,
-                'name': workspace_name
+                'name': os.path.basename(workspace_path)
             })
+            self.update_workspace_profile(workspace_path)
         else:
             # Clear workspace
             self.set('last_workspace', None)
@@ -270,7 +586,7 @@ class ConfigManager:
         Returns:
             list: Danh sách attached files hoặc []
         """
-        return self.get('last_workspace.attached_files', [])
+        return self._get_list('attached_files', self.get_last_workspace())[1].items()
     
     def set_last_attached_files(self, attached_files):
         """
@@ -279,7 +595,142 @@ class ConfigManager:
         Args:
             attached_files (list): Danh sách attached files
         """
-        if attached_files is None:
-            attached_files = []
-        self.set('last_workspace.attached_files', attached_files)
-        self.save_config() 
\ No newline at end of file
+        if self._set_list('attached_files', self.get_last_workspace(), attached_files or []):
+            self.save_config()
+    
+    def get_last_attached_images(self):
+        """
+        Lấy metadata các ảnh đính kèm đã lưu (của workspace hiện tại)
+        
+        Returns:
+            list: Danh sách metadata ảnh hoặc []
+        """
+        return self._get_list('attached_images', self.get_last_workspace())[1].items()
+    
+    def set_last_attached_images(self, image_data):
+        """
+        Lưu metadata các ảnh đính kèm (cho workspace hiện tại)
+        
+        Args:
+            image_data (list): Danh sách metadata ảnh trong database
+        """
+        if self._set_list('attached_images', self.get_last_workspace(), image_data or []):
+            self.save_config()
+    
+    # === Workspace profiles ===
+    # workspace_profiles.<id> = {path, name, expanded_paths, window_size, last_used}
+    # id là hash của đường dẫn nên tra cứu O(1) và key không chứa dấu chấm.
+    # Attached files/images của workspace nằm trong danh sách riêng (_get_list).
+    
+    @staticmethod
+    def _workspace_profile_id(workspace_path):
+        normalized = os.path.normcase(os.path.normpath(os.path.abspath(workspace_path)))
+        return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+    
+    def get_workspace_profile(self, workspace_path):
+        """
+        Lấy trạng thái đã lưu của một workspace
+        
+        Args:
+            workspace_path (str): Đường dẫn workspace
+        
+        Returns:
+            dict hoặc None nếu workspace chưa có profile
+        """
+        if not workspace_path:
+            return None
+        profile = self.get(f'workspace_profiles.{self._workspace_profile_id(workspace_path)}')
+        return profile if isinstance(profile, dict) else None
+    
+    def update_workspace_profile(self, workspace_path, touch=True, **fields):
+        """
+        Cập nhật trạng thái của một workspace và đánh dấu vừa được dùng
+        
+        Args:
+            workspace_path (str): Đường dẫn workspace
+            touch (bool): Cập nhật last_used (profile mới tạo luôn được cập nhật)
+            **fields: expanded_paths, window_size
+        """
+        if not workspace_path:
+            return
+        key = f'workspace_profiles.{self._workspace_profile_id(workspace_path)}'
+        created = self.get_workspace_profile(workspace_path) is None
+        if created:
+            self.set(key, {'path': workspace_path, 'name': os.path.basename(workspace_path)})
+        for field, value in fields.items():
+            self.set(f'{key}.{field}', value)
+        if touch or created:
+            self.set(f'{key}.last_used', time.time())
+        if created:
+            self._evict_workspace_profiles()
+        self.save_config()
+    
+    def get_workspace_attached_files(self, workspace_path):
+        """
+        Files đã attach của một workspace bất kỳ (không cần là workspace hiện tại)
+        
+        Args:
+            workspace_path (str): Đường dẫn workspace
+        
+        Returns:
+            list: Danh sách attached files hoặc []
+        """
+        if not workspace_path:
+            return []
+        return self._get_list('attached_files', workspace_path)[1].items()
+    
+    def get_workspace_profiles(self):
+        """
+        Danh sách workspace đã lưu, dùng gần nhất trước
+        
+        Returns:
+            list: Các profile dict
+        """
+        profiles = [p for p in (self.get('workspace_profiles', {}) or {}).values() if isinstance(p, dict)]
+        return sorted(profiles, key=lambda p: p.get('last_used', 0), reverse=True)
+    
+    def _update_current_workspace_profile(self, touch=True, **fields):
+        workspace_path = self.get_last_workspace()
+        if workspace_path:
+            self.update_workspace_profile(workspace_path, touch=touch, **fields)
+    
+    def _evict_workspace_profiles(self):
+        """Xóa profile dùng lâu nhất khi vượt WORKSPACE_PROFILE_LIMIT"""
+        with self._lock:
+            profiles = self.config.get('workspace_profiles') or {}
+            excess = len(profiles) - WORKSPACE_PROFILE_LIMIT
+            if excess <= 0:
+                return
+            current_id = None
+            if self.get_last_workspace():
+                current_id = self._workspace_profile_id(self.get_last_workspace())
+            candidates = sorted(
+                (profile_id for profile_id in profiles if profile_id != current_id),
+                key=lambda profile_id: (profiles[profile_id] or {}).get('last_used', 0)
+            )
+        for profile_id in candidates[:excess]:
+            workspace_path = (profiles[profile_id] or {}).get('path')
+            print(f"[ConfigManager] Evicting workspace profile {workspace_path}", file=sys.stderr)
+            self.delete(f'workspace_profiles.{profile_id}')
+            if workspace_path:
+                self._delete_lists(workspace_path)
+            metrics.increment("config.workspace_profiles_evicted")
+
+
+
+_shared_manager = None
+_shared_lock = threading.Lock()
+
+
+def get_config_manager():
+    """
+    ConfigManager dùng chung cho cả process: đọc file một lần, giữ trong bộ nhớ
+    
+    Returns:
+        ConfigManager
+    """
+    global _shared_manager
+    with _shared_lock:
+        if _shared_manager is None:
+            _shared_manager = ConfigManager()
+        return _shared_manager
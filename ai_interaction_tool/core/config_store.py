@@ -0,0 +1,253 @@
+# Storage backends for ConfigManager
+# ConfigManager giữ config trong bộ nhớ; store chỉ lo đọc/ghi xuống đĩa.
+#
+# - JsonConfigStore: một file config.json, mỗi lần ghi là cả document (mặc định)
+# - SqliteConfigStore: SQLite ở chế độ WAL, mỗi giá trị lá là một record theo
+#   dot path ("ui_preferences.continue_chat_default"). Chỉ các key đã đổi được
+#   ghi, trong một transaction, nên nhiều mcp_server.py (mỗi cửa sổ IDE một
+#   process) ghi cùng lúc không làm mất thay đổi của nhau và reader không bị chặn.
+
+import json
+import os
+import sqlite3
+import sys
+
+from ..constants import CONFIG_BACKEND_ENV_VAR, DEFAULT_CONFIG_BACKEND, CONFIG_DB_BUSY_TIMEOUT
+
+
+_MISSING = object()
+
+
+class JsonConfigStore:
+    """Cả config trong một file JSON, ghi qua file tạm + rename"""
+
+    name = "json"
+
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        """
+        Đọc toàn bộ config
+
+        Returns:
+            dict hoặc None nếu file chưa tồn tại
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def prepare(self, config, dirty_keys):
+        """Chụp lại dữ liệu cần ghi (gọi dưới lock của ConfigManager)"""
+        return json.dumps(config, ensure_ascii=False, indent=2)
+
+    def commit(self, content):
+        """Ghi dữ liệu đã prepare() xuống đĩa"""
+        # Tạo thư mục nếu chưa tồn tại
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        # Write to temporary file first, then rename (atomic operation)
+        temp_path = self.path + '.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+
+            # Atomic rename to prevent corruption
+            if os.path.exists(self.path):
+                # Backup existing config before replace
+                backup_path = self.path + '.bak'
+                if os.path.exists(backup_path):
+                    os.remove(backup_path)
+                os.rename(self.path, backup_path)
+
+            os.rename(temp_path, self.path)
+        except Exception:
+            # Clean up temp file if exists
+            if os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+            raise
+
+
+def flatten_config(value, prefix=""):
+    """
+    Trải dict lồng nhau thành {dot_path: giá trị lá}
+
+    Dict rỗng được giữ như một giá trị lá để đọc lại vẫn ra {}.
+    """
+    if isinstance(value, dict) and value:
+        records = {}
+        for key, child in value.items():
+            records.update(flatten_config(child, f"{prefix}.{key}" if prefix else key))
+        return records
+    return {prefix: value}
+
+
+def unflatten_config(records):
+    """Dựng lại dict lồng nhau từ {dot_path: giá trị}"""
+    config = {}
+    # Key ngắn trước: record cha (vd. "last_workspace" = null) bị record con ghi đè
+    for path in sorted(records, key=lambda p: p.count('.')):
+        keys = path.split('.')
+        node = config
+        for key in keys[:-1]:
+            if not isinstance(node.get(key), dict):
+                node[key] = {}
+            node = node[key]
+        node[keys[-1]] = records[path]
+    return config
+
+
+class SqliteConfigStore:
+    """
+    Config trong SQLite (WAL), mỗi giá trị lá một record
+
+    Ghi chỉ động tới các dot path đã thay đổi, trong một transaction.
+    Mọi truy cập đi qua lock của ConfigManager nên một connection là đủ.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path, json_path=None):
+        self.path = path
+        # config.json cũ, được import một lần khi database còn trống
+        self.json_path = json_path
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # isolation_level=None: tự quản lý transaction bằng BEGIN IMMEDIATE
+            connection = sqlite3.connect(
+                self.path, timeout=CONFIG_DB_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS config (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            self._connection = connection
+        return self._connection
+
+    def exists(self):
+        if not os.path.exists(self.path):
+            return False
+        return self._connect().execute("SELECT 1 FROM config LIMIT 1").fetchone() is not None
+
+    def load(self):
+        """
+        Đọc toàn bộ config (snapshot nhất quán, không chặn writer khác)
+
+        Returns:
+            dict hoặc None nếu database còn trống
+        """
+        rows = self._connect().execute("SELECT key, value FROM config").fetchall()
+        if not rows:
+            return self._import_json()
+        return unflatten_config({key: json.loads(value) for key, value in rows})
+
+    def _import_json(self):
+        """Lần đầu dùng backend SQLite: chuyển config.json sẵn có sang database"""
+        if not self.json_path or not os.path.exists(self.json_path):
+            return None
+        with open(self.json_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # Process khác có thể vừa import (hoặc đã ghi) trước - khi đó đọc lại từ database
+            if connection.execute("SELECT 1 FROM config LIMIT 1").fetchone() is not None:
+                connection.execute("COMMIT")
+                return self.load()
+            self._apply(connection, self.prepare(config, None))
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        print(f"[ConfigManager] Đã chuyển cấu hình từ {self.json_path} sang {self.path}", file=sys.stderr)
+        return config
+
+    def prepare(self, config, dirty_keys):
+        """
+        Chụp lại các subtree đã thay đổi (gọi dưới lock của ConfigManager)
+
+        Args:
+            config (dict): Config trong bộ nhớ
+            dirty_keys (set): Dot path đã set() từ lần ghi trước, None = toàn bộ config
+
+        Returns:
+            list: [(dot_path, {leaf_path: json_text})], dot_path "" là toàn bộ config
+        """
+        if dirty_keys is None:
+            return [("", {path: json.dumps(value, ensure_ascii=False)
+                          for path, value in flatten_config(config).items()})]
+
+        changes = []
+        for path in sorted(dirty_keys):
+            node = config
+            for key in path.split('.'):
+                if not isinstance(node, dict) or key not in node:
+                    # Key đã bị delete() - chỉ xóa record cũ
+                    node = _MISSING
+                    break
+                node = node[key]
+            records = {} if node is _MISSING else {
+                leaf: json.dumps(value, ensure_ascii=False) for leaf, value in flatten_config(node, path).items()
+            }
+            changes.append((path, records))
+        return changes
+
+    def commit(self, changes):
+        """Thay các subtree đã đổi trong một transaction"""
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._apply(connection, changes)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _apply(self, connection, changes):
+        """Xóa record cũ của từng subtree rồi chèn record mới (trong transaction đang mở)"""
+        for path, records in changes:
+            if path:
+                keys = path.split('.')
+                # Record lá cũ của chính path và của các cha (vd. "last_workspace" = null)
+                ancestors = ['.'.join(keys[:i]) for i in range(1, len(keys) + 1)]
+                connection.executemany("DELETE FROM config WHERE key = ?", [(key,) for key in ancestors])
+                # Con cháu: "path." <= key < "path/" ('/' đứng ngay sau '.')
+                connection.execute(
+                    "DELETE FROM config WHERE key >= ? AND key < ?", (path + '.', path + '/')
+                )
+            else:
+                connection.execute("DELETE FROM config")
+            connection.executemany(
+                "INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)", list(records.items())
+            )
+
+
+def create_config_store(json_path, backend=None):
+    """
+    Chọn backend theo tham số hoặc biến môi trường AI_INTERACTION_CONFIG_BACKEND
+
+    Args:
+        json_path (str): Đường dẫn config.json; database SQLite nằm cạnh nó (config.db)
+        backend (str): "json" hoặc "sqlite"
+
+    Returns:
+        JsonConfigStore hoặc SqliteConfigStore
+    """
+    backend = (backend or os.environ.get(CONFIG_BACKEND_ENV_VAR) or DEFAULT_CONFIG_BACKEND).strip().lower()
+    if backend == "sqlite":
+        return SqliteConfigStore(os.path.splitext(json_path)[0] + ".db", json_path=json_path)
+    if backend != "json":
+        print(f"[ConfigManager] Unknown config backend '{backend}', using json", file=sys.stderr)
+    return JsonConfigStore(json_path)
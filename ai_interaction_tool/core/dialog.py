@@ -2,10 +2,11 @@
 from PyQt5 import QtWidgets, QtCore, QtGui
 import json
 import os
+import sys
 import tempfile
-import uuid
-from pathlib import Path
-from .config import ConfigManager
+import time
+from .config import get_config_manager
+from .response_formatter import build_dialog_payload
 from ..ui.file_dialog import FileAttachDialog
 from ..ui.image_attachment import ImageAttachmentWidget
 from ..ui.styles import (
@@ -17,68 +18,55 @@ from ..ui.styles import (
     get_main_input_textedit_stylesheet
 )
 from ..utils.translations import get_translations, get_translation
+from ..utils import metrics
 from ..constants import (
-    SHADOW_BLUR_RADIUS, SHADOW_OFFSET, SHADOW_OPACITY
+    SHADOW_BLUR_RADIUS, SHADOW_OFFSET, SHADOW_OPACITY, PROGRESSIVE_BUILD_ENABLED
 )
 
 class PasteImageTextEdit(QtWidgets.QTextEdit):
     """Custom QTextEdit that handles image paste events"""
     
-    imagePasted = QtCore.pyqtSignal(str)  # Signal emitted when image is pasted
+    imagePasted = QtCore.pyqtSignal(object)  # Signal emitted with the pasted QImage
     
     def __init__(self, parent=None):
         super().__init__(parent)
         
     def insertFromMimeData(self, source):
-        """Override to handle pasted images - save directly to database"""
+        """Override to handle pasted images - encoding happens on the ingest thread pool"""
         if source.hasImage():
             # Get image from clipboard
             image = source.imageData()
             if image and not image.isNull():
-                # Convert QImage to QPixmap
+                if isinstance(image, QtGui.QPixmap):
+                    image = image.toImage()
                 if isinstance(image, QtGui.QImage):
-                    pixmap = QtGui.QPixmap.fromImage(image)
-                elif isinstance(image, QtGui.QPixmap):
-                    pixmap = image
-                else:
-                    super().insertFromMimeData(source)
+                    # Chỉ lấy ảnh rồi trả lại UI ngay, encode PNG/WebP/JPEG chạy ở background
+                    self.imagePasted.emit(image)
                     return
-                
-                # Save directly to database directory
-                try:
-                    # Get project root directory
-                    current_file = os.path.abspath(__file__)
-                    project_root = os.path.dirname(os.path.dirname(os.path.dirname(current_file)))
-                    
-                    # Create user_images directory
-                    user_images_dir = os.path.join(project_root, "user_images")
-                    os.makedirs(user_images_dir, exist_ok=True)
-                    
-                    # Generate unique filename directly in database
-                    unique_id = str(uuid.uuid4())[:8]
-                    db_filename = f"pasted_{unique_id}.png"
-                    db_path = os.path.join(user_images_dir, db_filename)
-                    
-                    # Save directly to database - NO TEMP FILES
-                    if pixmap.save(db_path, "PNG"):
-                        # Emit signal with database path - UI will handle async processing
-                        self.imagePasted.emit(db_path)
-                        return
-                        
-                except Exception:
-                    pass
         
         # For non-image content, use default behavior
         super().insertFromMimeData(source)
 
 class InputDialog(QtWidgets.QDialog):
+    # Thay đổi config từ dialog/tab khác, luôn được xử lý trên UI thread
+    configChanged = QtCore.pyqtSignal(str, object)
+    
     def __init__(self, prompt=None):
         super().__init__()
+        # Mốc đo time-to-interactive (lần paint đầu tiên sau khi ô nhập đã sẵn sàng)
+        self.build_started = time.perf_counter()
+        self.interactive_started = self.build_started
+        self.interactive_pending = True
+        self.time_to_interactive = None
+        self.time_to_complete = None
+        
         # Store prompt for display
         self.prompt = prompt
         
-        # Khởi tạo config manager
-        self.config_manager = ConfigManager()
+        # Config dùng chung cả process - không đọc lại file cho mỗi dialog
+        self.config_manager = get_config_manager()
+        self.configChanged.connect(self._on_config_changed)
+        self.config_manager.subscribe(self._forward_config_change)
         
         # Set responsive sizing instead of fixed
         self.setMinimumSize(800, 700)  # Much larger minimum size for comfortable UX
@@ -130,6 +118,7 @@ class InputDialog(QtWidgets.QDialog):
         self._setup_language_selection()
         
         # Thêm prompt/summary section nếu có
+        self.prompt_group = None
         if self.prompt:
             self._setup_prompt_section()
         
@@ -139,7 +128,7 @@ class InputDialog(QtWidgets.QDialog):
         # Thêm input area
         self._setup_input_area()
         
-        # Thêm horizontal attachment areas (files + images)
+        # Thêm horizontal attachment areas (files + images) - nội dung dựng sau
         self._setup_horizontal_attachments()
         
         # Thêm continue checkbox và warning
@@ -153,24 +142,91 @@ class InputDialog(QtWidgets.QDialog):
         # Thiết lập focus cho input khi mở dialog
         self.input.setFocus()
         
-        # Thiết lập drop shadow
-        self._setup_shadow_effect()
-        
-        # Restore attached files UI nếu có
-        self._restore_attached_files_ui()
-        
-        # Force refresh button styles để apply semantic colors
-        self._refresh_button_styles()
-        
         self.result_text = None
         self.result_continue = False
         self.result_ready = False
+        self.result_status = None  # "timeout"/"cancelled" khi dialog bị đóng từ phía server
+        self.session_closed = False  # True sau khi dialog đã accept/reject
+        self.request_id = None  # Request MCP đang dùng dialog (getTextWithStatus), None nếu không rõ
+        self.deadline_timer = None
         
         # Setup resize timer for saving window size
         self.resize_timer = QtCore.QTimer()
         self.resize_timer.setSingleShot(True)
         self.resize_timer.timeout.connect(self.save_window_size)
         self.resize_timer.setInterval(500)  # Save 500ms after last resize
+        
+        # Phần phụ dựng dần, mỗi lượt event loop một bước, để user gõ được ngay
+        self.deferred_steps = [
+            self._build_file_attachment_section,
+            self._build_image_attachment_section,
+            self._setup_shadow_effect,
+            self._refresh_button_styles,
+            self._restore_saved_images,
+        ]
+        if PROGRESSIVE_BUILD_ENABLED:
+            QtCore.QTimer.singleShot(0, self._run_next_deferred_step)
+        else:
+            self.ensure_built()
+    
+    def _run_next_deferred_step(self):
+        """Dựng một phần phụ rồi nhường event loop trước khi dựng phần tiếp theo"""
+        if not self.deferred_steps:
+            return
+        self._run_deferred_step(self.deferred_steps.pop(0))
+        if self.deferred_steps:
+            QtCore.QTimer.singleShot(0, self._run_next_deferred_step)
+        else:
+            self._finish_build()
+    
+    def _run_deferred_step(self, step):
+        try:
+            step()
+        except Exception as e:
+            # Một phần phụ lỗi không được làm hỏng ô nhập đang dùng
+            print(f"[InputDialog] Deferred build step {step.__name__} failed: {str(e)}", file=sys.stderr)
+    
+    def ensure_built(self):
+        """
+        Dựng ngay mọi phần còn chờ (và ảnh đã lưu) trước khi đọc/ghi trạng thái của chúng:
+        gửi, đóng, đổi ngôn ngữ, dán ảnh, reset
+        """
+        if self.deferred_steps:
+            while self.deferred_steps:
+                self._run_deferred_step(self.deferred_steps.pop(0))
+            self._finish_build()
+        if hasattr(self, 'image_attachment_widget'):
+            self.image_attachment_widget.ensure_restored()
+    
+    def _finish_build(self):
+        self.time_to_complete = time.perf_counter() - self.build_started
+        metrics.record_timing("dialog.time_to_complete", self.time_to_complete)
+    
+    def _build_file_attachment_section(self):
+        """Bước dựng sau: section file (bên trái) và danh sách file đã lưu"""
+        self.attachments_container.insertWidget(0, self._create_file_attachment_section(), 1)
+        self._restore_attached_files_ui()
+    
+    def _build_image_attachment_section(self):
+        """Bước dựng sau: section ảnh (bên phải), ảnh đã lưu được restore bởi chính widget"""
+        self.attachments_container.addWidget(self._create_image_attachment_section(), 1)
+    
+    def _restore_saved_images(self):
+        """Bước dựng sau cùng: đọc và encode ảnh đã lưu (phần tốn thời gian nhất)"""
+        self.image_attachment_widget.ensure_restored()
+    
+    def showEvent(self, event):
+        # Dialog dựng sẵn từ trước (pool, pre-warm) thì tính từ lúc hiển thị
+        if self.interactive_pending and not self.deferred_steps:
+            self.interactive_started = time.perf_counter()
+        super().showEvent(event)
+    
+    def event(self, event):
+        if self.interactive_pending and event.type() == QtCore.QEvent.Paint:
+            self.interactive_pending = False
+            self.time_to_interactive = time.perf_counter() - self.interactive_started
+            metrics.record_timing("dialog.time_to_interactive", self.time_to_interactive)
+        return super().event(event)
     
     def _setup_prompt_section(self):
         """Thiết lập phần hiển thị prompt/câu hỏi/tóm tắt"""
@@ -179,6 +235,7 @@ class InputDialog(QtWidgets.QDialog):
         
         # Create a stylish prompt section
         prompt_group = QtWidgets.QGroupBox(self.get_translation("prompt_section_title"))
+        self.prompt_group = prompt_group
         prompt_group.setObjectName("promptGroup")
         prompt_layout = QtWidgets.QVBoxLayout(prompt_group)
         
@@ -224,7 +281,27 @@ class InputDialog(QtWidgets.QDialog):
             }
         """)
         
-        self.layout.addWidget(prompt_group)
+        # Luôn đặt ngay dưới phần chọn ngôn ngữ (kể cả khi thêm sau qua set_prompt)
+        self.layout.insertWidget(1, prompt_group)
+    
+    def set_prompt(self, prompt):
+        """
+        Cập nhật prompt/summary cho dialog đã được dựng sẵn (UI host pre-warm)
+        
+        Args:
+            prompt (str): Prompt mới hoặc None để ẩn phần prompt
+        """
+        self.prompt = prompt
+        if not prompt:
+            if self.prompt_group is not None:
+                self.prompt_group.setVisible(False)
+            return
+        
+        if self.prompt_group is None:
+            self._setup_prompt_section()
+        else:
+            self.prompt_label.setText(prompt)
+            self.prompt_group.setVisible(True)
     
     def _setup_language_selection(self):
         """Thiết lập phần chọn ngôn ngữ"""
@@ -280,19 +357,12 @@ class InputDialog(QtWidgets.QDialog):
     
     def _setup_horizontal_attachments(self):
         """Thiết lập khu vực đính kèm file và hình ảnh theo chiều ngang"""
-        # Main horizontal container
-        attachments_container = QtWidgets.QHBoxLayout()
-        attachments_container.setSpacing(15)  # Space between file and image sections
-        
-        # === LEFT SIDE: File Attachments ===
-        file_section = self._create_file_attachment_section()
-        attachments_container.addWidget(file_section, 1)  # Stretch factor 1
+        # Main horizontal container - giữ chỗ trong layout, hai section được thêm
+        # bởi _build_file_attachment_section (trái) và _build_image_attachment_section (phải)
+        self.attachments_container = QtWidgets.QHBoxLayout()
+        self.attachments_container.setSpacing(15)  # Space between file and image sections
         
-        # === RIGHT SIDE: Image Attachments ===
-        image_section = self._create_image_attachment_section()
-        attachments_container.addWidget(image_section, 1)  # Stretch factor 1
-        
-        self.layout.addLayout(attachments_container)
+        self.layout.addLayout(self.attachments_container)
     
     def _create_file_attachment_section(self):
         """Tạo section đính kèm file"""
@@ -390,39 +460,11 @@ class InputDialog(QtWidgets.QDialog):
         
         return self.image_attachment_widget
 
-    def handle_pasted_image(self, db_image_path):
-        """Handle image pasted into input area - use async processing like existing system"""
-        # Use async processing pattern like existing image attachment system
-        QtCore.QTimer.singleShot(0, lambda: self._process_pasted_image(db_image_path))
-    
-    def _process_pasted_image(self, db_image_path):
-        """Process pasted image asynchronously"""
+    def handle_pasted_image(self, image):
+        """Handle image pasted into input area - encoded and stored in the background"""
+        self.ensure_built()
         try:
-            # Use the image attachment widget to add the pasted image
-            if hasattr(self, 'image_attachment_widget'):
-                # Image is already in database, just add to UI
-                if os.path.exists(db_image_path) and "user_images" in db_image_path:
-                    # Convert to base64 from database
-                    base64_data = self.image_attachment_widget.image_to_base64(db_image_path)
-                    if base64_data:
-                        # Add directly to attached_images
-                        # SECURITY: Only store database-relative information
-                        image_info = {
-                            "path": db_image_path,
-                            "filename": Path(db_image_path).name,
-                            "base64_data": base64_data,
-                            "media_type": "image/png",
-                            "source_type": "pasted",
-                            "db_filename": Path(db_image_path).name,
-                            "relative_db_path": os.path.basename(db_image_path)  # Only filename
-                        }
-                        
-                        self.image_attachment_widget.attached_images.append(image_info)
-                        self.image_attachment_widget.add_image_preview(db_image_path)
-                        
-                        # Use async UI update like existing system
-                        QtCore.QTimer.singleShot(0, lambda: self.image_attachment_widget.update_image_ui(auto_scroll=True))
-                    
+            self.image_attachment_widget.ingest_pasted_image(image)
         except Exception as e:
             QtWidgets.QMessageBox.warning(
                 self, 
@@ -560,6 +602,86 @@ class InputDialog(QtWidgets.QDialog):
         # Update button states regardless
         self.update_clear_buttons_state()
     
+    def reset(self, prompt=None):
+        """
+        Chuẩn bị dialog đã dựng sẵn cho một lần gọi mới (dùng lại qua DialogPool).
+        Chỉ cập nhật những phần thay đổi so với config thay vì dựng lại widget.
+        
+        Args:
+            prompt (str): Prompt/câu hỏi/tóm tắt của lần gọi mới
+        """
+        self.ensure_built()
+        self.interactive_started = time.perf_counter()
+        self.interactive_pending = True
+        self.time_to_interactive = None
+        
+        # Kết quả và trạng thái đóng của lần gọi trước
+        self.result_text = None
+        self.result_continue = False
+        self.result_ready = False
+        self.result_status = None
+        self.session_closed = False
+        self.request_id = None
+        self.setResult(0)
+        if self.deadline_timer is not None:
+            self.deadline_timer.stop()
+        
+        self.input.clear()
+        self.set_prompt(prompt)
+        
+        language = self.config_manager.get_language()
+        if language != self.current_language:
+            index = self.language_combo.findData(language)
+            if index >= 0:
+                # currentIndexChanged -> change_language cập nhật toàn bộ nhãn
+                self.language_combo.setCurrentIndex(index)
+        
+        self.continue_checkbox.setChecked(self.config_manager.get('ui_preferences.continue_chat_default', True))
+        
+        self._sync_attached_files_from_config()
+        if hasattr(self, 'image_attachment_widget'):
+            self.image_attachment_widget.sync_with_config()
+        
+        if self.isWindow():
+            saved_width, saved_height = self.config_manager.get_window_size()
+            self.resize(saved_width, saved_height)
+        self.input.setFocus()
+    
+    def _forward_config_change(self, key, value):
+        """Subscriber của ConfigManager - chuyển về UI thread qua signal"""
+        self.configChanged.emit(key, value)
+    
+    def _on_config_changed(self, key, value):
+        """Đồng bộ ngôn ngữ khi dialog khác (tab khác) đổi ngôn ngữ"""
+        if key == 'language' and value != self.current_language:
+            index = self.language_combo.findData(value)
+            if index >= 0:
+                self.language_combo.setCurrentIndex(index)
+    
+    def _sync_attached_files_from_config(self):
+        """Đồng bộ workspace và file đính kèm với config, chỉ dựng lại list khi có thay đổi"""
+        last_workspace = self.config_manager.get_last_workspace()
+        if last_workspace and os.path.exists(last_workspace):
+            self.current_workspace_path = last_workspace
+            self.current_workspace_name = self.config_manager.get_last_workspace_name()
+            saved_files = self.config_manager.get_last_attached_files() or []
+        else:
+            self.current_workspace_path = None
+            self.current_workspace_name = None
+            saved_files = []
+        
+        if saved_files == self.attached_files:
+            return
+        
+        self.attached_files = list(saved_files)
+        self.file_list.clear()
+        if self.attached_files:
+            self._restore_attached_files_ui()
+        else:
+            self.file_list.setVisible(False)
+            self.file_placeholder.setVisible(True)
+            self.update_clear_buttons_state()
+    
     def get_translation(self, key):
         """
         Lấy bản dịch cho khóa ngôn ngữ dựa trên ngôn ngữ hiện tại
@@ -570,6 +692,7 @@ class InputDialog(QtWidgets.QDialog):
         """
         Thay đổi ngôn ngữ hiện tại và cập nhật giao diện
         """
+        self.ensure_built()
         self.current_language = self.language_combo.itemData(index)
         
         # Lưu cấu hình khi thay đổi ngôn ngữ
@@ -628,12 +751,19 @@ class InputDialog(QtWidgets.QDialog):
             workspace_name = dialog.get_workspace_path()
             
             # Lưu workspace state để lần sau sử dụng
+            previous_workspace = self.current_workspace_path
             self.current_workspace_path = dialog.get_full_workspace_path()
             self.current_workspace_name = workspace_name
             
             # Persist workspace state vào config
             self.config_manager.set_last_workspace(self.current_workspace_path)
-            self.config_manager.set_last_attached_files(self.attached_files)
+            if previous_workspace and self.current_workspace_path != previous_workspace:
+                # Workspace khác: file và ảnh đính kèm lấy theo profile của workspace mới
+                # (FileAttachDialog đã nạp các file đã chọn của workspace đó)
+                self._sync_attached_files_from_config()
+                self.image_attachment_widget.sync_with_config()
+            else:
+                self.config_manager.set_last_attached_files(self.attached_files)
             
             if not workspace_name:
                 QtWidgets.QMessageBox.warning(
@@ -866,51 +996,8 @@ class InputDialog(QtWidgets.QDialog):
         """
         Phương thức xử lý khi người dùng nhấn nút Gửi.
         """
-        text = self.input.toPlainText()
-        attached_images = self.image_attachment_widget.get_attached_images() if hasattr(self, 'image_attachment_widget') else self.attached_images
-        if text.strip() or self.attached_files or attached_images:
-            result_dict = {
-                "text": text,
-                "language": self.current_language
-            }
-            
-            # Thêm thông tin về file/folder đính kèm nếu có (chỉ metadata, không đọc content)
-            if self.attached_files:
-                result_dict["attached_files"] = []
-                for item_info in self.attached_files:
-                    try:
-                        relative_path = item_info["relative_path"]
-                        workspace_name = item_info["workspace_name"]
-                        name = item_info["name"]
-                        item_type = item_info["type"]
-                        
-                        # Chỉ thêm metadata, không đọc file content
-                        result_dict["attached_files"].append({
-                            "relative_path": relative_path,
-                            "workspace_name": workspace_name,
-                            "name": name,
-                            "type": item_type
-                        })
-                    except Exception as e:
-                        result_dict["attached_files"].append({
-                            "relative_path": item_info.get("relative_path", "unknown"),
-                            "workspace_name": item_info.get("workspace_name", ""),
-                            "name": item_info.get("name", "unknown"),
-                            "type": item_info.get("type", "unknown"),
-                            "error": str(e)
-                        })
-            
-            # Thêm thông tin về hình ảnh đính kèm nếu có
-            attached_images = self.image_attachment_widget.get_attached_images() if hasattr(self, 'image_attachment_widget') else self.attached_images
-            if attached_images:
-                result_dict["attached_images"] = []
-                for img_info in attached_images:
-                    result_dict["attached_images"].append({
-                        "base64_data": img_info["base64_data"],
-                        "media_type": img_info["media_type"],
-                        "filename": img_info["filename"]
-                    })
-            
+        result_dict = self._build_result_dict()
+        if result_dict is not None:
             self.result_text = json.dumps(result_dict, ensure_ascii=False)
             self.result_continue = self.continue_checkbox.isChecked()
             self.result_ready = True
@@ -927,6 +1014,75 @@ class InputDialog(QtWidgets.QDialog):
             self.input.clear()
             self.accept()
     
+    @QtCore.pyqtSlot(str, str)
+    def interrupt_request(self, request_id, status):
+        """
+        interrupt() chỉ khi dialog vẫn đang phục vụ request_id
+
+        Lần hủy được gửi từ thread khác có thể tới sau khi request đã xong và
+        dialog (dùng lại qua DialogPool) đang mở cho request kế tiếp.
+        """
+        if request_id != self.request_id:
+            return
+        self.interrupt(status)
+    
+    @QtCore.pyqtSlot(str)
+    def interrupt(self, status):
+        """
+        Đóng dialog khi hết thời gian chờ hoặc bị hủy, giữ lại bản nháp hiện có
+        
+        Args:
+            status (str): "timeout" hoặc "cancelled"
+        """
+        if self.result_ready or self.session_closed:
+            return
+        
+        self.result_status = status
+        result_dict = self._build_result_dict()
+        if result_dict is not None:
+            self.result_text = json.dumps(result_dict, ensure_ascii=False)
+            self.result_continue = self.continue_checkbox.isChecked()
+            self.result_ready = True
+        
+        self.dismiss()
+    
+    def dismiss(self):
+        """
+        Đóng dialog như khi user bấm Đóng, kể cả khi dialog đang nằm trong tab bị ẩn
+        (close() chỉ reject khi dialog đang visible)
+        """
+        if self.session_closed:
+            return
+        self._save_state_on_close()
+        self.reject()
+    
+    def done(self, result):
+        self.session_closed = True
+        # Ảnh chưa xử lý xong lúc đóng (hủy/đóng tab) thì bỏ luôn
+        if hasattr(self, 'image_attachment_widget'):
+            self.image_attachment_widget.cancel_ingestion()
+        super().done(result)
+        # Mọi thay đổi config của lần gọi này được ghi một lần khi dialog đóng
+        self.config_manager.flush()
+    
+    def _build_result_dict(self):
+        """
+        Thu thập nội dung hiện tại của dialog (text, files, images)
+        
+        Returns:
+            dict hoặc None nếu không có nội dung nào
+        """
+        # Gửi ngay khi mở dialog vẫn phải kèm file/ảnh đã lưu
+        self.ensure_built()
+        attached_images = []
+        if hasattr(self, 'image_attachment_widget'):
+            # Ảnh đang copy ở background vẫn phải có trong kết quả
+            self.image_attachment_widget.finish_ingestion()
+            attached_images = self.image_attachment_widget.get_attached_images()
+        return build_dialog_payload(
+            self.input.toPlainText(), self.current_language, self.attached_files, attached_images
+        )
+    
     # Cho phép gửi bằng phím Enter
     def resizeEvent(self, event):
         """Handle window resize events và save size với debounce"""
@@ -936,10 +1092,19 @@ class InputDialog(QtWidgets.QDialog):
     
     def save_window_size(self):
         """Save current window size to config"""
-        self.config_manager.set_window_size(self.width(), self.height())
+        # window() là chính dialog, hoặc cửa sổ tab khi dialog được nhúng vào host
+        window = self.window()
+        self.config_manager.set_window_size(window.width(), window.height())
     
     def closeEvent(self, event):
         """Save window size và images khi đóng dialog"""
+        self._save_state_on_close()
+        super().closeEvent(event)
+    
+    def _save_state_on_close(self):
+        """Lưu window size, images và trạng thái checkbox trước khi đóng"""
+        # Chưa restore xong mà lưu thì sẽ ghi đè danh sách ảnh đã lưu bằng danh sách rỗng
+        self.ensure_built()
         self.save_window_size()
         
         # Save images to config if widget exists
@@ -950,8 +1115,6 @@ class InputDialog(QtWidgets.QDialog):
         if hasattr(self, 'image_attachment_widget') and hasattr(self.image_attachment_widget, 'save_images_checkbox'):
             checkbox_state = self.image_attachment_widget.save_images_checkbox.isChecked()
             self.config_manager.set('ui_preferences.save_images_enabled', checkbox_state)
-            
-        super().closeEvent(event)
     
     def keyPressEvent(self, event):
         if event.key() == QtCore.Qt.Key_Return and event.modifiers() == QtCore.Qt.ControlModifier:
@@ -975,11 +1138,65 @@ class InputDialog(QtWidgets.QDialog):
             button.style().polish(button)
             button.update()
 
+    # Dialog đang mở qua getText, để engine.interrupt_ui có thể đóng nó từ thread khác
+    active_dialog = None
+
+    def start_deadline(self, timeout):
+        """
+        Tự động đóng dialog (giữ bản nháp) sau timeout giây
+        
+        Args:
+            timeout (float): Số giây còn lại, None để chờ vô hạn
+        """
+        # Dialog dùng lại qua DialogPool giữ timer cũ, chỉ cần hẹn giờ lại
+        if self.deadline_timer is None:
+            self.deadline_timer = QtCore.QTimer(self)
+            self.deadline_timer.setSingleShot(True)
+            self.deadline_timer.timeout.connect(lambda: self.interrupt("timeout"))
+        self.deadline_timer.stop()
+        
+        if timeout is not None:
+            self.deadline_timer.start(max(0, int(timeout * 1000)))
+
     @staticmethod
     def getText(prompt=None):
-        dialog = InputDialog(prompt=prompt)
-        result = dialog.exec_()
+        text, continue_chat, ok, _status = InputDialog.getTextWithStatus(prompt=prompt)
+        return text, continue_chat, ok
+
+    @staticmethod
+    def getTextWithStatus(prompt=None, timeout=None, pending_interrupt=None, request_id=None):
+        """
+        Như getText, hỗ trợ thêm deadline và trả về trạng thái đóng dialog
+        
+        Args:
+            pending_interrupt: callable() trả về status của lần hủy đến trong lúc
+                dialog đang được dựng (None nếu không có), gọi sau khi active_dialog được đặt
+            request_id: Request đang dùng dialog, để interrupt_request bỏ qua lần hủy của request khác
+        
+        Returns:
+            tuple: (text, continue_chat, ok, status) - status là None, "timeout" hoặc "cancelled"
+        """
+        from .dialog_pool import get_dialog_pool
+        
+        pool = get_dialog_pool()
+        dialog = pool.acquire(prompt)
+        dialog.start_deadline(timeout)
+        dialog.request_id = request_id
+        InputDialog.active_dialog = dialog
+        try:
+            status = pending_interrupt() if pending_interrupt else None
+            if status:
+                # Bị hủy trước khi kịp hiện lên - đóng luôn, không exec_()
+                dialog.interrupt(status)
+            else:
+                dialog.exec_()
+        finally:
+            InputDialog.active_dialog = None
+            dialog.request_id = None
+        
         if dialog.result_ready:
-            return dialog.result_text, dialog.result_continue, True
+            result = dialog.result_text, dialog.result_continue, True, dialog.result_status
         else:
-            return "", False, False 
\ No newline at end of file
+            result = "", False, False, dialog.result_status
+        pool.release(dialog)
+        return result 
\ No newline at end of file
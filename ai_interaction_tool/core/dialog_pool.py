@@ -0,0 +1,98 @@
+"""
+InputDialog pool for AI Interaction Tool
+Keeps fully built, hidden dialogs and resets them between calls instead of
+rebuilding every widget, stylesheet and config read for each interaction.
+All methods must be called on the Qt (UI) thread.
+"""
+
+import sys
+import time
+
+from PyQt5 import sip
+
+from ..constants import DIALOG_POOL_ENABLED, DIALOG_POOL_SIZE
+from ..utils import metrics
+from .dialog import InputDialog
+
+
+class DialogPool:
+    """Idle InputDialog instances ready to be reset and shown"""
+
+    def __init__(self, size=DIALOG_POOL_SIZE, enabled=DIALOG_POOL_ENABLED):
+        self.size = size
+        self.enabled = enabled
+        self._idle = []
+
+    def prewarm(self):
+        """Build dialogs up to the pool size (call on an idle turn of the event loop)"""
+        if not self.enabled:
+            return
+        while len(self._idle) < self.size:
+            started = time.perf_counter()
+            self._idle.append(InputDialog())
+            metrics.record_timing("dialog_pool.build", time.perf_counter() - started)
+
+    def acquire(self, prompt=None):
+        """
+        Get a dialog ready for a new call
+
+        Args:
+            prompt: Optional prompt/question/summary to display at the top of UI
+
+        Returns:
+            InputDialog: A reset pooled dialog, or a newly built one when the pool is empty
+        """
+        started = time.perf_counter()
+        while self._idle:
+            dialog = self._idle.pop()
+            if sip.isdeleted(dialog):
+                continue
+            try:
+                dialog.reset(prompt)
+            except Exception as e:
+                # Dialog hỏng thì bỏ, dựng cái mới thay vì làm hỏng lần gọi
+                print(f"[DialogPool] Reset failed, building a new dialog: {str(e)}", file=sys.stderr)
+                dialog.deleteLater()
+                continue
+            metrics.increment("dialog_pool.reused")
+            metrics.record_timing("dialog_pool.acquire_reused", time.perf_counter() - started)
+            return dialog
+
+        dialog = InputDialog(prompt=prompt)
+        metrics.increment("dialog_pool.created")
+        metrics.record_timing("dialog_pool.acquire_built", time.perf_counter() - started)
+        return dialog
+
+    def release(self, dialog):
+        """
+        Return a finished dialog to the pool, or delete it when the pool is full
+
+        Args:
+            dialog (InputDialog): Dialog whose result has already been read
+
+        Returns:
+            bool: True if the dialog was kept for reuse
+        """
+        if sip.isdeleted(dialog):
+            return False
+        if not self.enabled or len(self._idle) >= self.size:
+            dialog.deleteLater()
+            return False
+
+        dialog.hide()
+        if dialog.parent() is not None:
+            # Tách khỏi tab/cửa sổ chứa nó, lần dùng sau sẽ được nhúng lại
+            dialog.setParent(None)
+        self._idle.append(dialog)
+        return True
+
+
+_pool = None
+
+
+def get_dialog_pool():
+    """Get the process-wide dialog pool (UI thread only)"""
+    global _pool
+    if _pool is None:
+        _pool = DialogPool()
+    return _pool
@@ -0,0 +1,676 @@
+# Content-addressed store cho ảnh trong user_images
+#
+# Mỗi ảnh được lưu đúng một lần theo SHA-256 của nội dung:
+#   user_images/store/<2 ký tự đầu>/<sha256><ext>
+# Cùng một ảnh đính kèm nhiều lần (kể cả dưới tên khác) chỉ có một blob, và hai
+# file khác nhau cùng tên không còn đè lên nhau.
+#
+# Ảnh gốc được hardlink vào store khi cùng filesystem, khác filesystem thì copy
+# (IMAGE_STORE_LINK_FILES). Blob không bao giờ được sửa tại chỗ; hardlink bị sửa qua file gốc
+# thì bị phát hiện nhờ size/mtime đã ghi lại: verify() trước khi gửi ảnh đi, và
+# blob bị bỏ khỏi store khi ảnh được thêm lại.
+#
+# Index (SQLite/WAL, dùng chung giữa các process) giữ reference count theo "holder":
+#   - "config:<danh sách>"        ảnh đã lưu trong config (mỗi workspace một danh sách)
+#   - "session:<pid>:<widget>"    ảnh đang đính kèm trong một dialog
+# Blob không còn reference nào quá IMAGE_STORE_GC_GRACE giây thì bị collect_garbage() xóa.
+# Ảnh vừa thêm chưa có holder nào cũng được giữ trong khoảng grace đó, đủ để
+# dialog nhận nó vào danh sách đính kèm.
+#
+# Mỗi blob có mốc last_access (thêm/dùng lại/đính kèm/lưu vào config). Khi store
+# vượt giới hạn dung lượng, số file hoặc tuổi, enforce_retention() xóa các blob
+# lâu không dùng nhất (LRU) - kể cả ảnh chỉ còn được config giữ, trừ ảnh đang đính kèm.
+
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from ..constants import (
+    IMAGE_STORE_DIRNAME, IMAGE_STORE_LINK_FILES, IMAGE_STORE_GC_GRACE, IMAGE_STORE_SESSION_TTL,
+    IMAGE_STORE_MAX_BYTES_ENV_VAR, IMAGE_STORE_MAX_AGE_DAYS_ENV_VAR, IMAGE_STORE_MAX_FILES_ENV_VAR,
+    DEFAULT_IMAGE_STORE_MAX_BYTES, DEFAULT_IMAGE_STORE_MAX_AGE_DAYS, DEFAULT_IMAGE_STORE_MAX_FILES,
+    IMAGE_STORE_EVICT_BATCH, IMAGE_INGEST_CHUNK_SIZE, CONFIG_DB_BUSY_TIMEOUT, IMAGES_DIR_ENV_VAR
+)
+from ..utils import metrics
+
+
+def _pid_alive(pid):
+    """True nếu process còn chạy (Windows không kiểm tra được rẻ - coi như còn, dựa vào TTL)"""
+    if os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # PermissionError: process tồn tại nhưng thuộc user khác
+        return True
+    return True
+
+
+def get_retention_limits():
+    """
+    Giới hạn của image store, từ environment hoặc mặc định trong constants.py
+
+    Returns:
+        tuple: (max_bytes, max_age giây, max_files), 0 = không giới hạn
+    """
+    limits = []
+    for env_var, default in (
+        (IMAGE_STORE_MAX_BYTES_ENV_VAR, DEFAULT_IMAGE_STORE_MAX_BYTES),
+        (IMAGE_STORE_MAX_AGE_DAYS_ENV_VAR, DEFAULT_IMAGE_STORE_MAX_AGE_DAYS),
+        (IMAGE_STORE_MAX_FILES_ENV_VAR, DEFAULT_IMAGE_STORE_MAX_FILES),
+    ):
+        value = os.environ.get(env_var)
+        try:
+            limits.append(max(0, int(value)) if value else default)
+        except ValueError:
+            print(f"[ImageStore] Invalid {env_var}={value!r}, using {default}", file=sys.stderr)
+            limits.append(default)
+    max_bytes, max_age_days, max_files = limits
+    return max_bytes, max_age_days * 24 * 3600, max_files
+
+
+def _remove_quietly(path):
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class ImageStore:
+    """Blob ảnh theo SHA-256 với reference count và garbage collection"""
+
+    def __init__(self, images_dir):
+        self.images_dir = images_dir
+        self.root = os.path.join(images_dir, IMAGE_STORE_DIRNAME)
+        self.index_path = os.path.join(self.root, "index.db")
+        self._lock = threading.Lock()
+        self._connection = None
+
+    # ------------------------------------------------------------------ index
+
+    def _connect(self):
+        """Connection dùng chung cho mọi thread (gọi dưới self._lock)"""
+        if self._connection is None:
+            os.makedirs(self.root, exist_ok=True)
+            connection = sqlite3.connect(
+                self.index_path, timeout=CONFIG_DB_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS blobs ("
+                " sha256 TEXT PRIMARY KEY, ext TEXT NOT NULL, size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL, linked INTEGER NOT NULL, created REAL NOT NULL,"
+                " unreferenced_since REAL, last_access REAL)"
+            )
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(blobs)")}
+            if "last_access" not in columns:
+                # Index tạo trước khi có retention
+                connection.execute("ALTER TABLE blobs ADD COLUMN last_access REAL")
+                connection.execute("UPDATE blobs SET last_access = created")
+            connection.execute("CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs (last_access)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS refs ("
+                " holder TEXT NOT NULL, sha256 TEXT NOT NULL, count INTEGER NOT NULL,"
+                " updated REAL NOT NULL, PRIMARY KEY (holder, sha256))"
+            )
+            self._connection = connection
+        return self._connection
+
+    def _transaction(self, work):
+        """Chạy work(connection) trong một transaction ghi"""
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(connection)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            return result
+
+    @staticmethod
+    def _refresh_unreferenced(connection, shas, now):
+        """Cập nhật mốc "hết reference" của các blob vừa đổi số reference"""
+        for sha in shas:
+            referenced = connection.execute(
+                "SELECT 1 FROM refs WHERE sha256 = ? AND count > 0 LIMIT 1", (sha,)
+            ).fetchone() is not None
+            if referenced:
+                connection.execute("UPDATE blobs SET unreferenced_since = NULL WHERE sha256 = ?", (sha,))
+            else:
+                connection.execute(
+                    "UPDATE blobs SET unreferenced_since = ? WHERE sha256 = ? AND unreferenced_since IS NULL",
+                    (now, sha)
+                )
+
+    # ------------------------------------------------------------------ paths
+
+    def blob_path(self, sha256, ext):
+        return os.path.join(self.root, sha256[:2], sha256 + ext)
+
+    def sha_from_path(self, path):
+        """
+        SHA-256 của blob nếu path nằm trong store
+
+        Returns:
+            str hoặc None (ảnh cũ ngoài store, hoặc path lạ)
+        """
+        if not path:
+            return None
+        path = os.path.abspath(path)
+        if os.path.dirname(os.path.dirname(path)) != os.path.abspath(self.root):
+            return None
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if len(stem) != 64 or any(c not in "0123456789abcdef" for c in stem):
+            return None
+        return stem
+
+    def relative_path(self, path):
+        """Path tương đối với user_images (được lưu vào config thay cho path tuyệt đối)"""
+        return os.path.relpath(path, self.images_dir).replace(os.sep, "/")
+
+    @staticmethod
+    def _stat_key(path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _intact(self, row):
+        """Blob còn trên đĩa và chưa bị sửa (qua file gốc được hardlink)"""
+        sha, ext, size, mtime_ns = row
+        try:
+            return self._stat_key(self.blob_path(sha, ext)) == (size, mtime_ns)
+        except OSError:
+            return False
+
+    def verify(self, path):
+        """
+        Ảnh có thể gửi đi: blob còn đúng size/mtime đã ghi trong index
+
+        Returns:
+            bool: False nếu blob đã bị sửa (qua file gốc được hardlink) hoặc đã mất;
+            ảnh ngoài store luôn True
+        """
+        sha = self.sha_from_path(path)
+        if sha is None or not os.path.exists(self.index_path):
+            return True
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT sha256, ext, size, mtime_ns FROM blobs WHERE sha256 = ?", (sha,)
+            ).fetchone()
+        if row is None:
+            return os.path.exists(path)
+        return self._intact(row)
+
+    # ------------------------------------------------------------------ put
+
+    @staticmethod
+    def hash_file(path, on_progress=None):
+        """
+        SHA-256 của file, đọc từng chunk
+
+        Args:
+            on_progress: callable(bytes_done, total), có thể raise để hủy
+
+        Returns:
+            tuple: (sha256 hex, size)
+        """
+        total = os.path.getsize(path)
+        digest = hashlib.sha256()
+        done = 0
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(IMAGE_INGEST_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                done += len(chunk)
+                if on_progress:
+                    on_progress(done, total)
+        return digest.hexdigest(), done
+
+    def put_file(self, source_path, holder=None, on_progress=None, ext=None):
+        """
+        Thêm ảnh vào store (hoặc dùng lại blob sẵn có) và tăng reference của holder
+
+        Args:
+            source_path (str): Ảnh gốc
+            holder (str): Holder giữ reference tới ảnh, None = chưa ai giữ (được giữ trong grace period)
+            on_progress: callable(fraction 0..1), có thể raise để hủy
+            ext (str): Phần mở rộng của blob (theo định dạng thật), None = lấy từ source_path
+
+        Returns:
+            dict: sha256, path, size_bytes, deduplicated, linked
+        """
+        ext = (ext or os.path.splitext(source_path)[1]).lower()
+        # Hash chiếm 60% tiến độ, copy (nếu cần) phần còn lại
+        hash_progress = (lambda done, total: on_progress(0.6 * done / total if total else 0.6)) if on_progress else None
+        sha, size = self.hash_file(source_path, hash_progress)
+        if size == 0:
+            raise ValueError("empty file")
+
+        existing = self._acquire_existing(sha, holder)
+        if existing:
+            metrics.increment("images.store_dedup_hits")
+            metrics.increment("images.store_bytes_deduplicated", size)
+            return {"sha256": sha, "path": existing, "size_bytes": size, "deduplicated": True, "linked": False}
+
+        temp_path = self.blob_path(sha, ext) + f".{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+        try:
+            linked = False
+            if IMAGE_STORE_LINK_FILES:
+                try:
+                    os.link(source_path, temp_path)
+                    linked = True
+                except OSError:
+                    # Khác filesystem/ổ đĩa hoặc filesystem không hỗ trợ hardlink
+                    pass
+            if linked:
+                # File gốc có thể đã đổi từ lúc hash
+                if self._stat_key(temp_path)[0] != size:
+                    raise ValueError("file changed while it was being added")
+            else:
+                self._copy_verified(source_path, temp_path, sha, on_progress)
+            path = self._commit_blob(sha, ext, temp_path, linked, holder)
+        finally:
+            _remove_quietly(temp_path)
+
+        metrics.increment("images.store_links" if linked else "images.store_copies")
+        if on_progress:
+            on_progress(1.0)
+        return {"sha256": sha, "path": path, "size_bytes": size, "deduplicated": False, "linked": linked}
+
+    def put_bytes(self, data, ext, holder=None):
+        """
+        Thêm ảnh đã encode trong bộ nhớ (ảnh paste từ clipboard)
+
+        Returns:
+            dict: sha256, path, size_bytes, deduplicated, linked
+        """
+        sha = hashlib.sha256(data).hexdigest()
+        existing = self._acquire_existing(sha, holder)
+        if existing:
+            metrics.increment("images.store_dedup_hits")
+            metrics.increment("images.store_bytes_deduplicated", len(data))
+            return {"sha256": sha, "path": existing, "size_bytes": len(data), "deduplicated": True, "linked": False}
+
+        ext = ext.lower()
+        temp_path = self.blob_path(sha, ext) + f".{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(os.path.dirname(temp_path), exist_ok=True)
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            path = self._commit_blob(sha, ext, temp_path, False, holder)
+        finally:
+            _remove_quietly(temp_path)
+        metrics.increment("images.store_copies")
+        return {"sha256": sha, "path": path, "size_bytes": len(data), "deduplicated": False, "linked": False}
+
+    def _copy_verified(self, source_path, temp_path, sha, on_progress):
+        """Copy từng chunk, hash lại trong lúc copy để chắc blob đúng với key"""
+        total = os.path.getsize(source_path)
+        digest = hashlib.sha256()
+        done = 0
+        with open(source_path, 'rb') as source, open(temp_path, 'wb') as target:
+            while True:
+                chunk = source.read(IMAGE_INGEST_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                target.write(chunk)
+                done += len(chunk)
+                if on_progress:
+                    on_progress(0.6 + 0.4 * done / total if total else 1.0)
+        if digest.hexdigest() != sha:
+            raise ValueError("file changed while it was being added")
+
+    def _acquire_existing(self, sha, holder):
+        """Tăng reference nếu blob đã có và còn nguyên vẹn; trả về path của nó"""
+        def work(connection):
+            row = connection.execute(
+                "SELECT sha256, ext, size, mtime_ns FROM blobs WHERE sha256 = ?", (sha,)
+            ).fetchone()
+            if row is None:
+                return None
+            if not self._intact(row):
+                # Hardlink bị sửa qua file gốc (hoặc blob đã mất) - bỏ, thêm lại từ đầu
+                print(f"[ImageStore] Blob {sha[:12]} changed or missing on disk, re-adding", file=sys.stderr)
+                connection.execute("DELETE FROM blobs WHERE sha256 = ?", (sha,))
+                _remove_quietly(self.blob_path(row[0], row[1]))
+                return None
+            self._touch(connection, holder, sha)
+            return self.blob_path(row[0], row[1])
+        return self._transaction(work)
+
+    def _commit_blob(self, sha, ext, temp_path, linked, holder):
+        """Đưa file tạm vào vị trí blob và ghi index (process khác có thể vừa thêm cùng ảnh)"""
+        def work(connection):
+            row = connection.execute(
+                "SELECT sha256, ext, size, mtime_ns FROM blobs WHERE sha256 = ?", (sha,)
+            ).fetchone()
+            if row is not None and self._intact(row):
+                path = self.blob_path(row[0], row[1])
+            else:
+                path = self.blob_path(sha, ext)
+                os.replace(temp_path, path)
+                size, mtime_ns = self._stat_key(path)
+                now = time.time()
+                connection.execute(
+                    "INSERT OR REPLACE INTO blobs"
+                    " (sha256, ext, size, mtime_ns, linked, created, unreferenced_since, last_access)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (sha, ext, size, mtime_ns, int(linked), now, now, now)
+                )
+            self._touch(connection, holder, sha)
+            return path
+        return self._transaction(work)
+
+    # ------------------------------------------------------------------ refs
+
+    def _touch(self, connection, holder, sha):
+        """Ảnh vừa được thêm/dùng lại: tăng reference, hoặc bắt đầu lại grace period nếu chưa có holder"""
+        connection.execute("UPDATE blobs SET last_access = ? WHERE sha256 = ?", (time.time(), sha))
+        if holder:
+            self._add_ref(connection, holder, sha, 1)
+        else:
+            connection.execute(
+                "UPDATE blobs SET unreferenced_since = ? WHERE sha256 = ? AND unreferenced_since IS NOT NULL",
+                (time.time(), sha)
+            )
+
+    def _add_ref(self, connection, holder, sha, delta):
+        now = time.time()
+        connection.execute(
+            "INSERT INTO refs (holder, sha256, count, updated) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (holder, sha256) DO UPDATE SET count = count + excluded.count, updated = excluded.updated",
+            (holder, sha, delta, now)
+        )
+        connection.execute("DELETE FROM refs WHERE holder = ? AND sha256 = ? AND count <= 0", (holder, sha))
+        self._refresh_unreferenced(connection, [sha], now)
+
+    def acquire(self, sha256, holder):
+        self._transaction(lambda connection: self._add_ref(connection, holder, sha256, 1))
+
+    def release(self, sha256, holder):
+        self._transaction(lambda connection: self._add_ref(connection, holder, sha256, -1))
+
+    def set_holder_refs(self, holder, shas):
+        """
+        Thay toàn bộ reference của holder bằng danh sách mới (mỗi lần xuất hiện một reference)
+
+        Args:
+            holder (str): Holder
+            shas (list): SHA-256 của các ảnh holder đang giữ, None được bỏ qua
+        """
+        counts = {}
+        for sha in shas:
+            if sha:
+                counts[sha] = counts.get(sha, 0) + 1
+
+        def work(connection):
+            now = time.time()
+            # Ảnh được đính kèm/lưu lại tính là vừa được dùng (LRU của enforce_retention)
+            connection.executemany(
+                "UPDATE blobs SET last_access = ? WHERE sha256 = ?", [(now, sha) for sha in counts]
+            )
+            current = dict(connection.execute(
+                "SELECT sha256, count FROM refs WHERE holder = ?", (holder,)
+            ).fetchall())
+            if current == counts:
+                # Vẫn làm mới mốc updated để TTL của session không hết hạn khi dialog còn mở
+                connection.execute("UPDATE refs SET updated = ? WHERE holder = ?", (now, holder))
+                return
+            connection.execute("DELETE FROM refs WHERE holder = ?", (holder,))
+            connection.executemany(
+                "INSERT INTO refs (holder, sha256, count, updated) VALUES (?, ?, ?, ?)",
+                [(holder, sha, count, now) for sha, count in counts.items()]
+            )
+            self._refresh_unreferenced(connection, set(current) | set(counts), now)
+        self._transaction(work)
+
+    def drop_holder(self, holder):
+        self.set_holder_refs(holder, [])
+
+    def known_shas(self):
+        """SHA-256 của mọi blob đang có trong store"""
+        if not os.path.exists(self.index_path):
+            return set()
+        with self._lock:
+            return {row[0] for row in self._connect().execute("SELECT sha256 FROM blobs")}
+
+    def ref_counts(self):
+        """{sha256: tổng reference} - dùng cho metrics/debug"""
+        with self._lock:
+            return dict(self._connect().execute(
+                "SELECT sha256, SUM(count) FROM refs GROUP BY sha256"
+            ).fetchall())
+
+    # ------------------------------------------------------------------ gc
+
+    def collect_garbage(self, grace=IMAGE_STORE_GC_GRACE):
+        """
+        Xóa blob không còn reference quá grace giây
+
+        Reference của session thuộc process đã chết (hoặc quá IMAGE_STORE_SESSION_TTL
+        không được làm mới) bị bỏ trước. File lạ/file tạm sót lại trong store cũng
+        bị xóa khi đã cũ hơn grace.
+
+        Returns:
+            int: Số blob đã xóa
+        """
+        now = time.time()
+
+        def work(connection):
+            stale = []
+            for holder, updated in connection.execute(
+                "SELECT holder, MAX(updated) FROM refs WHERE holder LIKE 'session:%' GROUP BY holder"
+            ).fetchall():
+                try:
+                    pid = int(holder.split(':')[1])
+                except (IndexError, ValueError):
+                    pid = None
+                if now - updated > IMAGE_STORE_SESSION_TTL or (pid is not None and pid != os.getpid() and not _pid_alive(pid)):
+                    stale.append(holder)
+            if stale:
+                touched = [row[0] for row in connection.execute(
+                    f"SELECT DISTINCT sha256 FROM refs WHERE holder IN ({','.join('?' * len(stale))})", stale
+                ).fetchall()]
+                connection.executemany("DELETE FROM refs WHERE holder = ?", [(holder,) for holder in stale])
+                self._refresh_unreferenced(connection, touched, now)
+
+            rows = connection.execute(
+                "SELECT sha256, ext FROM blobs WHERE unreferenced_since IS NOT NULL AND unreferenced_since <= ?",
+                (now - grace,)
+            ).fetchall()
+            for sha, ext in rows:
+                _remove_quietly(self.blob_path(sha, ext))
+            connection.executemany("DELETE FROM blobs WHERE sha256 = ?", [(sha,) for sha, _ in rows])
+            known = {self.blob_path(sha, ext) for sha, ext in connection.execute("SELECT sha256, ext FROM blobs")}
+            return len(rows), known
+
+        if not os.path.exists(self.index_path):
+            return 0
+        removed, known = self._transaction(work)
+        removed += self._sweep_orphans(known, now - grace)
+        if removed:
+            metrics.increment("images.store_gc_removed", removed)
+            print(f"[ImageStore] Removed {removed} unreferenced image(s)", file=sys.stderr)
+        return removed
+
+    def enforce_retention(self, limits=None, grace=IMAGE_STORE_GC_GRACE):
+        """
+        Xóa blob lâu không dùng nhất (theo last_access) cho tới khi store nằm trong giới hạn
+
+        Blob quá max_age bị xóa trước, rồi tới blob cũ nhất khi tổng dung lượng hoặc
+        số file còn vượt. Ảnh đang đính kèm trong một dialog (holder session) và ảnh
+        vừa thêm còn trong grace period không bao giờ bị xóa; ảnh chỉ còn được config
+        giữ thì có - danh sách đã lưu bỏ qua file đã mất khi restore. Blob hardlink
+        được tính đủ dung lượng dù không tốn thêm chỗ trên đĩa.
+
+        Args:
+            limits (tuple): (max_bytes, max_age giây, max_files); None = get_retention_limits()
+
+        Returns:
+            tuple: (số blob đã xóa, số byte đã xóa)
+        """
+        if not os.path.exists(self.index_path):
+            return 0, 0
+        max_bytes, max_age, max_files = limits or get_retention_limits()
+        now = time.time()
+
+        with self._lock:
+            connection = self._connect()
+            total_files, total_bytes = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            over_age = bool(max_age) and connection.execute(
+                "SELECT 1 FROM blobs WHERE last_access < ? LIMIT 1", (now - max_age,)
+            ).fetchone() is not None
+            over_size = (max_bytes and total_bytes > max_bytes) or (max_files and total_files > max_files)
+            candidates = []
+            if over_age or over_size:
+                candidates = connection.execute(
+                    "SELECT sha256, ext, size, last_access FROM blobs"
+                    " WHERE NOT EXISTS (SELECT 1 FROM refs WHERE refs.sha256 = blobs.sha256"
+                    "                   AND refs.holder LIKE 'session:%' AND refs.count > 0)"
+                    " AND (unreferenced_since IS NULL OR unreferenced_since <= ?)"
+                    " ORDER BY last_access",
+                    (now - grace,)
+                ).fetchall()
+
+        victims = []
+        for sha, ext, size, last_access in candidates:
+            expired = bool(max_age) and last_access < now - max_age
+            if not expired and not ((max_bytes and total_bytes > max_bytes) or (max_files and total_files > max_files)):
+                break
+            victims.append((sha, ext, size, last_access))
+            total_bytes -= size
+            total_files -= 1
+
+        evicted = bytes_evicted = 0
+        # Xóa từng nhóm nhỏ để dialog/process khác không phải chờ index lâu
+        for start in range(0, len(victims), IMAGE_STORE_EVICT_BATCH):
+            count, size = self._transaction(
+                lambda connection: self._evict(connection, victims[start:start + IMAGE_STORE_EVICT_BATCH])
+            )
+            evicted += count
+            bytes_evicted += size
+
+        with self._lock:
+            total_files, total_bytes = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()
+        metrics.set_gauge("images.store_files", total_files)
+        metrics.set_gauge("images.store_bytes", total_bytes)
+        if evicted:
+            metrics.increment("images.store_evicted", evicted)
+            metrics.increment("images.store_bytes_evicted", bytes_evicted)
+            print(
+                f"[ImageStore] Evicted {evicted} least recently used image(s), {bytes_evicted / (1024 * 1024):.1f} MB;"
+                f" store now {total_files} image(s), {total_bytes / (1024 * 1024):.1f} MB",
+                file=sys.stderr
+            )
+        return evicted, bytes_evicted
+
+    def _evict(self, connection, victims):
+        """Xóa các blob đã chọn, trừ blob vừa được dùng lại/đính kèm từ lúc chọn"""
+        count = size_total = 0
+        for sha, ext, size, last_access in victims:
+            row = connection.execute("SELECT last_access FROM blobs WHERE sha256 = ?", (sha,)).fetchone()
+            if row is None or row[0] != last_access:
+                continue
+            if connection.execute(
+                "SELECT 1 FROM refs WHERE sha256 = ? AND holder LIKE 'session:%' AND count > 0 LIMIT 1", (sha,)
+            ).fetchone() is not None:
+                continue
+            connection.execute("DELETE FROM refs WHERE sha256 = ?", (sha,))
+            connection.execute("DELETE FROM blobs WHERE sha256 = ?", (sha,))
+            _remove_quietly(self.blob_path(sha, ext))
+            count += 1
+            size_total += size
+        return count, size_total
+
+    def _sweep_orphans(self, known, cutoff):
+        """File trong store không có trong index (process chết giữa chừng) và đã cũ"""
+        removed = 0
+        for entry in os.scandir(self.root):
+            if not entry.is_dir():
+                continue
+            for blob in os.scandir(entry.path):
+                if blob.path in known:
+                    continue
+                try:
+                    if blob.stat().st_mtime < cutoff:
+                        os.remove(blob.path)
+                        removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def remove_legacy_images(images_dir, keep_names=()):
+    """
+    Xóa ảnh kiểu cũ (trước image store) nằm thẳng trong user_images khi không lưu ảnh nữa
+
+    Args:
+        images_dir (str): Thư mục user_images
+        keep_names (iterable): Tên file còn đang đính kèm
+
+    Returns:
+        int: Số file đã xóa
+    """
+    keep_names = set(keep_names)
+    removed = 0
+    try:
+        entries = list(os.scandir(images_dir))
+    except OSError:
+        return 0
+    for entry in entries:
+        if entry.name.startswith(("pasted_", "attached_", "dropped_")) and entry.name not in keep_names:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def get_user_images_dir():
+    """Thư mục user_images ở project root, hoặc theo AI_INTERACTION_IMAGES_DIR (tạo nếu chưa có)"""
+    user_images_dir = os.environ.get(IMAGES_DIR_ENV_VAR)
+    if not user_images_dir:
+        current_file = os.path.abspath(__file__)
+        project_root = os.path.dirname(os.path.dirname(os.path.dirname(current_file)))
+        user_images_dir = os.path.join(project_root, "user_images")
+    os.makedirs(user_images_dir, exist_ok=True)
+    return user_images_dir
+
+
+_image_store = None
+_image_store_lock = threading.Lock()
+
+
+def get_image_store():
+    """ImageStore dùng chung cả process"""
+    global _image_store
+    with _image_store_lock:
+        if _image_store is None:
+            _image_store = ImageStore(get_user_images_dir())
+        return _image_store
+
+
+def session_holder(owner):
+    """Tên holder cho ảnh đang đính kèm trong một widget của process này"""
+    return f"session:{os.getpid()}:{id(owner):x}"
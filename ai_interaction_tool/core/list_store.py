@@ -0,0 +1,375 @@
+# Append-only side stores cho các danh sách lớn của ConfigManager
+# (attached files, metadata ảnh đính kèm của từng workspace).
+#
+# Mỗi danh sách là một file JSONL, mỗi dòng một thao tác:
+#   {"op": "set", "items": [...]}      thay toàn bộ danh sách
+#   {"op": "add", "items": [...]}      thêm vào cuối
+#   {"op": "remove", "index": [...]}   xóa theo vị trí (tính trên danh sách trước thao tác)
+# Thêm/xóa vài phần tử chỉ append một dòng nhỏ thay vì ghi lại cả danh sách.
+# Sau LIST_STORE_COMPACT_OPS thao tác file được ghi gọn lại thành một dòng "set".
+# File chỉ được đọc khi danh sách thật sự cần tới (lazy).
+#
+# Nhiều process (mỗi cửa sổ IDE một mcp_server.py) có thể cùng ghi một danh sách:
+# thay đổi được giữ theo giá trị (thêm/xóa phần tử nào) và chỉ khi flush, dưới
+# file lock, mới được áp lên nội dung đọc lại từ file rồi mới tính vị trí cần xóa.
+# Cùng một file/ảnh có thể được đính kèm nhiều lần, nên phần tử được thêm chỉ bị
+# bỏ khi chính process khác đã thêm nó sau lúc thay đổi được ghi nhận.
+# Với backend SQLite (config_store.py) danh sách nằm trong database (SqliteListStore).
+
+import contextlib
+import json
+from collections import Counter
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from ..constants import LIST_STORE_COMPACT_OPS, CONFIG_DB_BUSY_TIMEOUT
+from ..utils import metrics
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+
+@contextlib.contextmanager
+def _file_lock(lock_path):
+    """Khóa độc quyền giữa các process (lock file cạnh danh sách)"""
+    with open(lock_path, 'a+b') as lock_file:
+        if os.name == 'nt':
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK chỉ thử lại ~10 giây rồi bỏ cuộc
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class ListStore:
+    """Một danh sách JSON lưu dạng log append-only, đọc lười và ghi gọn định kỳ"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._items = None
+        # Thay đổi chưa ghi, theo giá trị: {"op": "add"|"remove"|"set", "items": [...]},
+        # "add" kèm "base" là danh sách lúc thay đổi được ghi nhận
+        self._pending = []
+        self._log_ops = 0
+        self._needs_compact = False
+
+    def _read(self):
+        """
+        Replay file log
+
+        Returns:
+            tuple: (items, số thao tác trong log, True nếu có dòng hỏng)
+        """
+        items = []
+        log_ops = 0
+        corrupt = False
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Dòng cuối bị cắt dở (process chết giữa lúc append) - ghi gọn lại ở lần flush sau
+                        print(f"[ListStore] Bỏ qua dòng hỏng trong {self.path}", file=sys.stderr)
+                        corrupt = True
+                        continue
+                    items = self._apply(items, entry)
+                    log_ops += 1
+        return items, log_ops, corrupt
+
+    def _load(self):
+        """Danh sách trong bộ nhớ, đọc file ở lần đầu (gọi dưới self._lock)"""
+        if self._items is not None:
+            return self._items
+
+        items, self._log_ops, corrupt = self._read()
+        # Thay đổi chưa ghi vẫn phải thấy được sau invalidate()
+        fresh = items
+        for entry in self._pending:
+            items = self._merge(items, entry, fresh)
+        self._items = items
+        if corrupt or self._log_ops > LIST_STORE_COMPACT_OPS:
+            self._needs_compact = True
+        return items
+
+    @staticmethod
+    def _apply(items, entry):
+        """Áp một dòng của log (xóa theo vị trí)"""
+        op = entry.get('op')
+        if op == 'set':
+            return list(entry.get('items', []))
+        if op == 'add':
+            return items + list(entry.get('items', []))
+        if op == 'remove':
+            removed = set(entry.get('index', []))
+            return [item for index, item in enumerate(items) if index not in removed]
+        return items
+
+    @staticmethod
+    def _key(item):
+        return json.dumps(item, ensure_ascii=False, sort_keys=True)
+
+    @classmethod
+    def _merge(cls, items, entry, fresh):
+        """
+        Áp một thay đổi đang chờ (theo giá trị) lên danh sách có thể đã được process khác đổi
+
+        Args:
+            items (list): Danh sách đã áp các thay đổi đang chờ trước entry
+            entry (dict): Thay đổi đang chờ
+            fresh (list): Danh sách vừa đọc lại từ file/database
+
+        Phần tử mà process khác cũng vừa thêm (có trong fresh nhưng không có trong
+        "base" của entry) không bị nhân đôi; phần tử đã có từ trước vẫn được thêm
+        lần nữa như _apply. Phần tử đã bị xóa ở nơi khác thì bỏ qua.
+        """
+        op = entry['op']
+        if op == 'set':
+            return list(entry['items'])
+        items = list(items)
+        if op == 'add':
+            added_elsewhere = Counter(map(cls._key, fresh))
+            added_elsewhere.subtract(map(cls._key, entry['base']))
+            for item in entry['items']:
+                key = cls._key(item)
+                if added_elsewhere[key] > 0:
+                    added_elsewhere[key] -= 1
+                else:
+                    items.append(item)
+        elif op == 'remove':
+            for item in entry['items']:
+                if item in items:
+                    items.remove(item)
+        return items
+
+    def items(self):
+        """
+        Danh sách hiện tại (bản copy), đọc file ở lần gọi đầu tiên
+
+        Returns:
+            list
+        """
+        with self._lock:
+            return json.loads(json.dumps(self._load()))
+
+    def replace(self, new_items):
+        """
+        Đặt danh sách mới, ghi nhận dưới dạng thay đổi nhỏ nhất có thể
+
+        Args:
+            new_items (list): Danh sách mới
+
+        Returns:
+            bool: True nếu danh sách thay đổi (cần flush)
+        """
+        # Chuẩn hóa qua JSON: so sánh và lưu đúng như khi đọc lại từ file
+        new_items = json.loads(json.dumps(list(new_items or []), ensure_ascii=False))
+        with self._lock:
+            old_items = self._load()
+            if new_items == old_items:
+                return False
+            change = self._diff(old_items, new_items)
+            if change['op'] == 'remove':
+                # Vị trí chỉ đúng với bản trong bộ nhớ - giữ giá trị, vị trí được tính lại khi flush
+                change = {'op': 'remove', 'items': [old_items[index] for index in change['index']]}
+            elif change['op'] == 'add':
+                change['base'] = old_items
+            self._pending.append(change)
+            self._items = new_items
+            return True
+
+    @staticmethod
+    def _diff(old_items, new_items):
+        """Thao tác biến old_items thành new_items: add, remove (theo vị trí) hoặc set"""
+        if len(new_items) > len(old_items) and new_items[:len(old_items)] == old_items:
+            return {'op': 'add', 'items': new_items[len(old_items):]}
+
+        if len(new_items) < len(old_items):
+            # new_items là dãy con của old_items: chỉ cần ghi vị trí bị xóa
+            removed = []
+            position = 0
+            for index, item in enumerate(old_items):
+                if position < len(new_items) and new_items[position] == item:
+                    position += 1
+                else:
+                    removed.append(index)
+            if position == len(new_items):
+                return {'op': 'remove', 'index': removed}
+
+        return {'op': 'set', 'items': new_items}
+
+    def has_pending(self):
+        """True nếu còn thay đổi chưa ghi hoặc file cần ghi gọn"""
+        return bool(self._pending) or self._needs_compact
+
+    def flush(self):
+        """
+        Ghi các thay đổi đang chờ
+
+        Dưới file lock: đọc lại log, áp thay đổi lên nội dung mới nhất, rồi append
+        đúng một dòng (hoặc ghi lại cả file khi cần "set" hay log đã quá dài).
+        """
+        with self._lock:
+            if not self._pending and not self._needs_compact:
+                return
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with _file_lock(self.path + '.lock'):
+                current, log_ops, corrupt = self._read()
+                merged = current
+                for entry in self._pending:
+                    merged = self._merge(merged, entry, current)
+
+                change = self._diff(current, merged) if merged != current else None
+                rewrite = (
+                    corrupt
+                    or (change is not None and change['op'] == 'set')
+                    or log_ops + (change is not None) > LIST_STORE_COMPACT_OPS
+                )
+                if rewrite:
+                    self._rewrite([{'op': 'set', 'items': merged}])
+                    self._log_ops = 1
+                    metrics.increment("config.list_compactions")
+                else:
+                    if change is not None:
+                        with open(self.path, 'a', encoding='utf-8') as f:
+                            f.write(self._encode(change))
+                        metrics.increment("config.list_appends")
+                    self._log_ops = log_ops + (change is not None)
+            # Bản trong bộ nhớ gồm cả thay đổi process khác vừa ghi
+            self._items = merged
+            self._pending = []
+            self._needs_compact = False
+
+    @staticmethod
+    def _encode(entry):
+        return json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+    def _rewrite(self, entries):
+        # Tên file tạm riêng cho từng process/thread
+        temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(''.join(self._encode(entry) for entry in entries))
+            os.replace(temp_path, self.path)
+        except Exception:
+            if os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+            raise
+
+    def invalidate(self):
+        """Bỏ bản trong bộ nhớ để lần đọc sau lấy lại từ file (process khác có thể đã ghi)"""
+        with self._lock:
+            self._items = None
+
+    def delete(self):
+        """Xóa danh sách cùng file của nó"""
+        with self._lock:
+            self._items = []
+            self._pending = []
+            self._needs_compact = False
+            self._log_ops = 0
+            if os.path.exists(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with _file_lock(self.path + '.lock'):
+                    if os.path.exists(self.path):
+                        os.remove(self.path)
+                try:
+                    os.remove(self.path + '.lock')
+                except OSError:
+                    pass
+
+
+class SqliteListStore(ListStore):
+    """
+    Cùng giao diện với ListStore nhưng danh sách là một record trong database
+    SQLite của config (bảng lists), dùng khi AI_INTERACTION_CONFIG_BACKEND=sqlite
+
+    Mỗi lần flush đọc lại record và ghi kết quả đã merge trong một transaction
+    BEGIN IMMEDIATE, nên process ghi cùng lúc không làm mất thay đổi của nhau.
+    """
+
+    def __init__(self, db_path, name, legacy_path=None):
+        super().__init__(f"{db_path}#{name}")
+        self.db_path = db_path
+        self.name = name
+        # File JSONL của backend json, được import một lần khi database chưa có danh sách này
+        self.legacy_path = legacy_path
+        self._connection = None
+
+    def _connect(self):
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.db_path, timeout=CONFIG_DB_BUSY_TIMEOUT, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS lists (name TEXT PRIMARY KEY, items TEXT NOT NULL)"
+            )
+            self._connection = connection
+        return self._connection
+
+    def _read(self):
+        row = self._connect().execute("SELECT items FROM lists WHERE name = ?", (self.name,)).fetchone()
+        if row is not None:
+            return json.loads(row[0]), 0, False
+        if self.legacy_path and os.path.exists(self.legacy_path):
+            return ListStore(self.legacy_path).items(), 0, False
+        return [], 0, False
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                current, _, _ = self._read()
+                merged = current
+                for entry in self._pending:
+                    merged = self._merge(merged, entry, current)
+                connection.execute(
+                    "INSERT OR REPLACE INTO lists (name, items) VALUES (?, ?)",
+                    (self.name, json.dumps(merged, ensure_ascii=False))
+                )
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            metrics.increment("config.list_appends")
+            self._items = merged
+            self._pending = []
+
+    def delete(self):
+        with self._lock:
+            self._items = []
+            self._pending = []
+            self._connect().execute("DELETE FROM lists WHERE name = ?", (self.name,))
+            if self.legacy_path and os.path.exists(self.legacy_path):
+                os.remove(self.legacy_path)
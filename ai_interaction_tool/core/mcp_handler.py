@@ -3,17 +3,32 @@ MCP handler utilities for AI Interaction Tool
 Contains the main MCP tool function logic
 """
 
+import asyncio
+import re
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional
-from ..engine import run_ui
+from .ui_host import get_ui_host, UIHostError
+from .scheduler import InteractionScheduler
+from .responders import get_responder
+from ..utils import metrics
 from .response_formatter import (
+    build_ui_result,
     format_mixed_response, 
     format_text_only_response, 
     build_error_response,
     validate_response_data
 )
 
+# Dedicated thread for the in-process fallback dialog. All Qt objects must live
+# on one thread, so this executor never runs more than one worker.
+_ui_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-interaction-ui")
+_fallback_scheduler = InteractionScheduler(name="fallback_scheduler")
 
-def ai_interaction_tool(prompt: Optional[str] = None) -> List:
+
+async def ai_interaction_tool(prompt: Optional[str] = None, timeout: Optional[float] = None) -> List:
     """
     Main AI Interaction tool function with image support
     Returns mixed content using modular response formatting
@@ -24,31 +39,169 @@ def ai_interaction_tool(prompt: Optional[str] = None) -> List:
     - Formatting mixed (text + images) or text-only responses
     - Error handling
     
+    The dialog never runs on the asyncio loop, so the server keeps answering
+    pings, list_tools and cancellations while the user is typing.
+    When the timeout expires or the client cancels the request, the dialog
+    closes cleanly and its draft is returned with <AI_INTERACTION_STATUS>.
+    
     Args:
         prompt: Optional prompt/question/summary to display at the top of UI
+        timeout: Optional seconds to wait for the user before returning the draft
     
     Returns:
-        List containing TextContent and/or MCPImage objects
+        List containing TextContent and/or ImageContent objects
     """
     try:
-        result = run_ui(prompt=prompt)
+        result = await _run_interaction(prompt, timeout)
         
-        # Validate response data
-        is_valid, error_msg = validate_response_data(result)
-        if not is_valid:
-            return build_error_response(error_msg)
-        
-        # Check if result has images (structured data)
-        if isinstance(result, dict) and 'attached_images' in result:
-            return format_mixed_response(result)
-        else:
-            # Standard text-only response
-            return format_text_only_response(result)
+        # Image encoding can be heavy, keep it off the event loop as well
+        return await asyncio.to_thread(_format_result, result)
             
     except Exception as e:
         return build_error_response(str(e))
 
 
+def _format_result(result) -> List:
+    """
+    Validate and format the interaction result
+    
+    Args:
+        result: Value returned by engine.run_ui or the UI host
+    
+    Returns:
+        List containing TextContent and/or ImageContent objects
+    """
+    # Validate response data
+    is_valid, error_msg = validate_response_data(result)
+    if not is_valid:
+        return build_error_response(error_msg)
+    
+    # Check if result has images (structured data)
+    if isinstance(result, dict) and 'attached_images' in result:
+        return format_mixed_response(result)
+    else:
+        # Standard text-only response
+        return format_text_only_response(result)
+
+
+async def _run_interaction(prompt: Optional[str] = None, timeout: Optional[float] = None):
+    """
+    Run the interaction in the pre-warmed UI host when available,
+    in a worker thread for headless responders, or falling back to an
+    in-process dialog on the dedicated UI thread
+    
+    Args:
+        prompt: Optional prompt/question/summary to display at the top of UI
+        timeout: Optional seconds to wait for the user before returning the draft
+    
+    Returns:
+        Same value as engine.run_ui (tagged string or structured dict)
+    """
+    ui_host = get_ui_host()
+    if ui_host is not None:
+        try:
+            return await ui_host.request_async(prompt=prompt, timeout=timeout)
+        except UIHostError as e:
+            print(f"[MCPHandler] UI host unavailable, using in-process dialog: {str(e)}", file=sys.stderr)
+    
+    if get_responder().headless:
+        # Headless responders need no UI thread, concurrent calls run in parallel
+        from ..engine import run_ui
+        return await asyncio.to_thread(run_ui, prompt=prompt, timeout=timeout)
+    
+    # Fallback dialogs run one at a time; the scheduler keeps the queued calls visible in metrics
+    request_id = uuid.uuid4().hex
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    _fallback_scheduler.add(request_id, prompt, timeout)
+    future = _ui_executor.submit(_run_queued_ui, prompt, deadline, request_id)
+    status = None
+    try:
+        result = await asyncio.shield(asyncio.wrap_future(future))
+        status = _result_status(result)
+        return result
+    except asyncio.CancelledError:
+        status = "cancelled"
+        # Still queued: just drop it. Already showing: close that dialog on its own thread.
+        # Already finished: the UI thread may be showing the next call, leave it alone
+        if not future.done() and not future.cancel():
+            from ..engine import interrupt_ui
+            interrupt_ui("cancelled", request_id=request_id)
+        raise
+    finally:
+        _fallback_scheduler.complete(request_id, status)
+
+
+def _result_status(result):
+    """Read the close status ("timeout"/"cancelled") of a run_ui result, None if answered"""
+    if isinstance(result, dict):
+        return result.get('status')
+    match = re.search(r"<AI_INTERACTION_STATUS>(\w+)</AI_INTERACTION_STATUS>", result or "")
+    return match.group(1) if match else None
+
+
+def _run_queued_ui(prompt, deadline, request_id=None):
+    """
+    Run the in-process dialog once its turn comes, with the time left until the deadline
+    
+    Args:
+        prompt: Optional prompt/question/summary to display at the top of UI
+        deadline: time.monotonic() deadline or None
+        request_id: Id of the call, so a late cancel cannot close another call's dialog
+    
+    Returns:
+        Same value as engine.run_ui
+    """
+    # engine imports this package, import it on use to avoid a cycle
+    from ..engine import run_ui
+    
+    if deadline is None:
+        return run_ui(prompt=prompt, request_id=request_id)
+    
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        # Expired while queued behind another dialog - nothing was typed for it
+        return build_ui_result("", False, False, "timeout")
+    return run_ui(prompt=prompt, timeout=remaining, request_id=request_id)
+
+
+def warm_up():
+    """
+    Load PyQt5 and the dialog modules in the background so the first
+    in-process call does not pay for them. Only the fallback path needs this:
+    the UI host warms itself in its own process and headless responders never use Qt.
+    
+    Returns:
+        concurrent.futures.Future or None when there is nothing to warm
+    """
+    if get_ui_host() is not None or get_responder().headless:
+        return None
+    # QApplication must live on the UI thread, so warm on that same thread
+    return _ui_executor.submit(_warm_ui)
+
+
+def _warm_ui():
+    started = time.perf_counter()
+    from ..engine import get_application
+    from .dialog import InputDialog
+    get_application()
+    print(f"[MCPHandler] UI modules warmed up in {(time.perf_counter() - started) * 1000:.0f} ms", file=sys.stderr)
+
+
+def get_interaction_metrics() -> dict:
+    """
+    Metrics of pending interactions: queue depth and per-request wait time
+    from the UI host (if running) and from the in-process fallback
+    
+    Returns:
+        dict: {"server": ..., "ui_host": ... or None}
+    """
+    ui_host = get_ui_host()
+    return {
+        "server": metrics.snapshot(),
+        "ui_host": ui_host.get_metrics() if ui_host is not None else None
+    }
+
+
 def get_tool_description() -> str:
     """
     Get the AI Interaction tool description for MCP registration
@@ -57,4 +210,4 @@ def get_tool_description() -> str:
         String containing the tool description
     """
     from ..description import AI_INTERACTION_DESCRIPTION
-    return AI_INTERACTION_DESCRIPTION 
\ No newline at end of file
+    return AI_INTERACTION_DESCRIPTION 
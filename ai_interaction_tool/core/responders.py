@@ -0,0 +1,292 @@
+"""
+Responder backends for AI Interaction Tool
+A responder answers one interaction: the Qt dialog for a human, or a headless
+backend (replay file, stdin) for CI and throughput benchmarks without a display.
+Every backend returns the same raw tuple as InputDialog.getTextWithStatus, so
+the tagged output and image payloads go through exactly the same pipeline.
+
+Select the backend with the AI_INTERACTION_RESPONDER environment variable:
+- "qt" (default): the interaction dialog
+- "replay:<path.jsonl>" or "replay-loop:<path.jsonl>": scripted answers
+- "stdin" or "stdin:<path>": one answer per line from stdin or a file/named pipe
+
+Answer lines (replay and stdin) are JSON objects, stdin also accepts plain text:
+{"text": "...", "continue_chat": true, "attached_files": [...],
+ "images": ["path/to/image.png"], "attached_images": [{"path" or "base64_data", "media_type", "filename"}],
+ "status": null, "delay": 0.0, "language": "en"}
+"""
+
+import abc
+import json
+import os
+import sys
+import threading
+import time
+
+from ..constants import DEFAULT_LANGUAGE, RESPONDER_ENV_VAR, DEFAULT_RESPONDER
+from ..utils.image_processing import image_file_reference
+from .response_formatter import build_dialog_payload
+
+
+class ResponderError(RuntimeError):
+    """Raised when a responder cannot be configured or runs out of answers"""
+
+
+class Responder(abc.ABC):
+    """
+    Base class of responder backends
+
+    respond() blocks until the interaction is answered and returns
+    (text, continue_chat, ok, status) like InputDialog.getTextWithStatus.
+    request_id identifies the call, so interrupt() only closes the interaction
+    it was meant for.
+    """
+
+    # False for backends that need a display (the UI host only serves Qt)
+    headless = True
+
+    @abc.abstractmethod
+    def respond(self, prompt=None, timeout=None, request_id=None):
+        """Answer one interaction: (text, continue_chat, ok, status)"""
+
+    def interrupt(self, status="cancelled", request_id=None):
+        """Close the pending interaction early (headless answers are immediate, nothing to do)"""
+
+
+class QtDialogResponder(Responder):
+    """The interaction dialog shown to a human"""
+
+    headless = False
+
+    def __init__(self):
+        # Hủy đến khi dialog còn đang được dựng (QApplication, DialogPool.acquire)
+        # chưa có dialog để đóng - được ghi lại và áp dụng ngay khi dialog dựng xong
+        self._lock = threading.Lock()
+        self._waiting = False
+        self._pending_status = None
+        self._request_id = None
+
+    def respond(self, prompt=None, timeout=None, request_id=None):
+        with self._lock:
+            self._waiting = True
+            self._pending_status = None
+            self._request_id = request_id
+        try:
+            # Qt is imported only when a dialog is really needed
+            from ..engine import get_application
+            from .dialog import InputDialog
+
+            get_application()
+            return InputDialog.getTextWithStatus(
+                prompt=prompt, timeout=timeout, pending_interrupt=self._pending_interrupt,
+                request_id=request_id
+            )
+        finally:
+            with self._lock:
+                self._waiting = False
+                self._pending_status = None
+                self._request_id = None
+
+    def _pending_interrupt(self):
+        with self._lock:
+            return self._pending_status
+
+    def interrupt(self, status="cancelled", request_id=None):
+        """
+        Đóng dialog đang mở từ thread khác (hủy request từ MCP client).
+        Dialog giữ lại bản nháp và đóng sạch trên UI thread của nó.
+
+        Với request_id, dialog đang phục vụ request khác (request này đã xong,
+        dialog đã được dùng lại cho lần gọi kế tiếp) không bị đóng.
+        """
+        with self._lock:
+            if not self._waiting:
+                return
+            if request_id is not None and request_id != self._request_id:
+                return
+            from .dialog import InputDialog
+
+            dialog = InputDialog.active_dialog
+            if dialog is None:
+                # Dialog chưa dựng xong: getTextWithStatus đóng nó ngay sau khi dựng
+                self._pending_status = status
+                return
+
+        from PyQt5 import QtCore
+        if request_id is None:
+            QtCore.QMetaObject.invokeMethod(
+                dialog, "interrupt", QtCore.Qt.QueuedConnection, QtCore.Q_ARG(str, status)
+            )
+        else:
+            # Chạy trên UI thread, lúc đó dialog có thể đã chuyển sang request khác
+            QtCore.QMetaObject.invokeMethod(
+                dialog, "interrupt_request", QtCore.Qt.QueuedConnection,
+                QtCore.Q_ARG(str, request_id), QtCore.Q_ARG(str, status)
+            )
+
+
+def answer_to_raw(answer, base_dir=None):
+    """
+    Convert one scripted answer into the raw dialog tuple
+
+    Args:
+        answer (dict hoặc str): Answer object (see module docstring) or plain text
+        base_dir (str): Directory used to resolve relative image paths
+
+    Returns:
+        tuple: (text, continue_chat, ok, status)
+    """
+    if isinstance(answer, str):
+        answer = {"text": answer}
+
+    attached_images = list(answer.get("attached_images", []))
+    for image_path in answer.get("images", []):
+        if base_dir and not os.path.isabs(image_path):
+            image_path = os.path.join(base_dir, image_path)
+        attached_images.append(image_file_reference(image_path))
+
+    payload = build_dialog_payload(
+        answer.get("text", ""),
+        answer.get("language", DEFAULT_LANGUAGE),
+        answer.get("attached_files", []),
+        attached_images
+    )
+    status = answer.get("status")
+    if payload is None:
+        return "", False, False, status
+    return json.dumps(payload, ensure_ascii=False), answer.get("continue_chat", True), True, status
+
+
+class ReplayResponder(Responder):
+    """
+    Scripted answers from a JSONL file, one answer per call in file order
+
+    Thread-safe, so concurrent tool calls each get the next answer.
+    """
+
+    def __init__(self, path, loop=False):
+        self.path = os.path.abspath(path)
+        self.loop = loop
+        self._lock = threading.Lock()
+        self._index = 0
+
+        base_dir = os.path.dirname(self.path)
+        self._answers = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    answer = json.loads(line)
+                except ValueError as e:
+                    raise ResponderError(f"{self.path}:{line_number}: {str(e)}")
+                # Images stay file references, they are encoded when the response is built
+                self._answers.append((answer.get("delay", 0), answer_to_raw(answer, base_dir)))
+
+        if not self._answers:
+            raise ResponderError(f"Replay file has no answers: {self.path}")
+
+    def respond(self, prompt=None, timeout=None, request_id=None):
+        with self._lock:
+            if self._index >= len(self._answers):
+                if not self.loop:
+                    raise ResponderError(f"Replay file exhausted after {len(self._answers)} answers")
+                self._index = 0
+            delay, raw = self._answers[self._index]
+            self._index += 1
+
+        if delay:
+            if timeout is not None and delay >= timeout:
+                # Simulated user is slower than the deadline - return the (empty) draft
+                time.sleep(timeout)
+                return "", False, False, "timeout"
+            time.sleep(delay)
+        return raw
+
+
+class StdinResponder(Responder):
+    """
+    One answer per line from stdin (or a file / named pipe)
+
+    Under the MCP stdio transport stdin carries the protocol, so give the
+    server a path ("stdin:/tmp/answers.fifo") instead of plain "stdin".
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._stream = None
+        self._lock = threading.Lock()
+
+    def _get_stream(self):
+        if self._stream is None:
+            self._stream = open(self.path, "r", encoding="utf-8") if self.path else sys.stdin
+        return self._stream
+
+    def respond(self, prompt=None, timeout=None, request_id=None):
+        with self._lock:
+            if prompt:
+                print(f"[Responder] {prompt}", file=sys.stderr)
+            line = self._get_stream().readline()
+
+        if not line:
+            raise ResponderError("No more answers on input")
+        line = line.rstrip("\n")
+        try:
+            answer = json.loads(line)
+        except ValueError:
+            answer = line
+        if not isinstance(answer, (dict, str)):
+            answer = line
+        return answer_to_raw(answer, os.getcwd())
+
+
+def create_responder(spec):
+    """
+    Build a responder from a spec string ("qt", "replay:<path>", "stdin[:<path>]")
+
+    Args:
+        spec (str): Backend specification
+
+    Returns:
+        Responder
+    """
+    name, _, arg = (spec or DEFAULT_RESPONDER).partition(":")
+    name = name.strip().lower()
+
+    if name == "qt":
+        return QtDialogResponder()
+    if name in ("replay", "replay-loop"):
+        if not arg:
+            raise ResponderError("Replay responder needs a file: replay:<path.jsonl>")
+        return ReplayResponder(arg, loop=name == "replay-loop")
+    if name == "stdin":
+        return StdinResponder(arg or None)
+    raise ResponderError(f"Unknown responder: {spec}")
+
+
+_responder = None
+_responder_lock = threading.Lock()
+
+
+def get_responder():
+    """
+    Get the process-wide responder, created from AI_INTERACTION_RESPONDER on first use
+
+    Returns:
+        Responder
+    """
+    global _responder
+    with _responder_lock:
+        if _responder is None:
+            _responder = create_responder(os.environ.get(RESPONDER_ENV_VAR, DEFAULT_RESPONDER))
+            if _responder.headless:
+                print(f"[Responder] Using headless responder: {type(_responder).__name__}", file=sys.stderr)
+        return _responder
+
+
+def set_responder(responder):
+    """Replace the process-wide responder (benchmarks, tests); None resets to the env default"""
+    global _responder
+    with _responder_lock:
+        _responder = responder
@@ -3,9 +3,13 @@ Response formatting utilities for AI Interaction Tool
 Handles mixed content responses with text, images, and control tags
 """
 
+import json
+import sys
 from mcp.types import TextContent
-from typing import List, Dict, Any, Union
-from ..utils.image_processing import process_images
+from typing import List, Dict, Any, Optional, Union
+from ..utils import metrics
+from ..utils.image_processing import process_images_with_report
+from .image_store import get_image_store
 
 
 def format_mixed_response(result: Dict[str, Any]) -> List:
@@ -16,7 +20,7 @@ def format_mixed_response(result: Dict[str, Any]) -> List:
         result: Dictionary containing text_content, attached_images, attached_files, etc.
         
     Returns:
-        List containing TextContent and MCPImage objects
+        List containing TextContent and ImageContent objects
     """
     response_items = []
     
@@ -25,24 +29,43 @@ def format_mixed_response(result: Dict[str, Any]) -> List:
     attached_files = result.get('attached_files', [])
     attached_images = result.get('attached_images', [])
     continue_chat = result.get('continue_chat', False)
-
+    status = result.get('status')
+    
+    # Images as MCP image content (encoded from file here, once), within the
+    # per-response image budget - the text reports what had to be changed
+    attached_images = _verified_images(attached_images)
+    mcp_images, image_report = process_images_with_report(attached_images) if attached_images else ([], [])
     
     # Build complete text content with all tags
     full_text_content = _build_text_content_with_tags(
-        user_text, attached_files, continue_chat
+        user_text, attached_files, continue_chat, status, image_report
     )
     
     # Add text content with ALL tags
     response_items.append(TextContent(type="text", text=full_text_content))
-    
-    # Add images as MCPImage objects if any
-    if attached_images:
-        mcp_images = process_images(attached_images)
-        response_items.extend(mcp_images)  # Direct extend like mcp-feedback-enhanced
+    response_items.extend(mcp_images)  # Direct extend like mcp-feedback-enhanced
     
     return response_items
 
 
+def _verified_images(attached_images: List[Dict]) -> List[Dict]:
+    """
+    Drop stored images whose blob no longer matches the image store index
+    (a hard-linked original rewritten in place after it was attached)
+    """
+    if not attached_images:
+        return attached_images
+    store = get_image_store()
+    verified = []
+    for img in attached_images:
+        if img.get("path") and not store.verify(img["path"]):
+            print(f"[ResponseFormatter] Image {img.get('filename', img['path'])} changed on disk since it was attached, not sent", file=sys.stderr)
+            metrics.increment("images.store_verify_failures")
+            continue
+        verified.append(img)
+    return verified
+
+
 def format_text_only_response(result: Union[str, Dict[str, Any]]) -> List[TextContent]:
     """
     Format simple text-only response
@@ -59,7 +82,9 @@ def format_text_only_response(result: Union[str, Dict[str, Any]]) -> List[TextCo
 def _build_text_content_with_tags(
     user_text: str, 
     attached_files: List[Dict], 
-    continue_chat: bool
+    continue_chat: bool,
+    status: Optional[str] = None,
+    image_report: Optional[List[Dict]] = None
 ) -> str:
     """
     Build complete text content with attached files and control tags
@@ -68,6 +93,8 @@ def _build_text_content_with_tags(
         user_text: Main user message text
         attached_files: List of attached file information
         continue_chat: Whether to continue chat
+        status: "timeout"/"cancelled" when the dialog was closed by the server
+        image_report: Images resized/dropped to fit the image budget
         
     Returns:
         String containing formatted text with all tags
@@ -124,12 +151,177 @@ def _build_text_content_with_tags(
         if workspace_name:
             full_text_content += f"\n<AI_INTERACTION_WORKSPACE>{workspace_name}</AI_INTERACTION_WORKSPACE>"
     
+    if image_report:
+        full_text_content += "\n\n" + build_image_budget_tag(image_report)
+    
     # Add control tags at the end (CRITICAL for agent behavior)
-    full_text_content += f"\n\n<AI_INTERACTION_CONTINUE_CHAT>{str(continue_chat).lower()}</AI_INTERACTION_CONTINUE_CHAT>"
+    full_text_content += "\n\n" + build_control_tags(continue_chat, status)
     
     return full_text_content
 
 
+def _describe_image(size, size_bytes: int) -> str:
+    dimensions = f"{size[0]}x{size[1]}" if size else "?"
+    return f"{dimensions} {size_bytes / 1024:.0f} KB"
+
+
+def build_image_budget_tag(image_report: List[Dict]) -> str:
+    """
+    Report of images changed to keep the response within the image budget
+    
+    Args:
+        image_report: Entries from apply_image_budget (action "resized" or "dropped")
+        
+    Returns:
+        String with the AI_INTERACTION_IMAGES_ADJUSTED section
+    """
+    resized = [entry for entry in image_report if entry["action"] == "resized"]
+    dropped = [entry for entry in image_report if entry["action"] == "dropped"]
+    
+    tag = "<AI_INTERACTION_IMAGES_ADJUSTED>\n"
+    if resized:
+        tag += "RESIZED:\n"
+        for entry in resized:
+            tag += (
+                f"- {entry['filename']}: {_describe_image(entry['original_size'], entry['original_bytes'])}"
+                f" -> {_describe_image(entry['size'], entry['bytes'])} {entry['format'].upper()}\n"
+            )
+        tag += "\n"
+    if dropped:
+        tag += "DROPPED (over the image budget, not sent):\n"
+        for entry in dropped:
+            tag += f"- {entry['filename']}: {_describe_image(entry['original_size'], entry['original_bytes'])}\n"
+        tag += "\n"
+    tag += "</AI_INTERACTION_IMAGES_ADJUSTED>"
+    return tag
+
+
+def build_control_tags(continue_chat: bool, status: Optional[str] = None) -> str:
+    """
+    Build the closing control tags of a response
+    
+    Args:
+        continue_chat: Whether to continue chat
+        status: "timeout"/"cancelled" when the dialog was closed before the user
+            sent it - the content above is then the unsent draft
+        
+    Returns:
+        String with AI_INTERACTION_STATUS (only when set) and AI_INTERACTION_CONTINUE_CHAT
+    """
+    tags = ""
+    if status:
+        tags += f"<AI_INTERACTION_STATUS>{status}</AI_INTERACTION_STATUS>\n"
+    tags += f"<AI_INTERACTION_CONTINUE_CHAT>{str(continue_chat).lower()}</AI_INTERACTION_CONTINUE_CHAT>"
+    return tags
+
+
+def build_dialog_payload(
+    text: str,
+    language: str,
+    attached_files: List[Dict],
+    attached_images: List[Dict]
+) -> Optional[Dict[str, Any]]:
+    """
+    Build the JSON payload a responder submits (same shape as InputDialog.submit_text)
+    
+    Args:
+        text: Message typed by the user
+        language: UI language code
+        attached_files: File/folder entries with relative_path, workspace_name, name, type
+        attached_images: Image entries with path (or base64_data), media_type, filename
+        
+    Returns:
+        Dictionary ready for json.dumps, or None when there is no content at all
+    """
+    if not (text.strip() or attached_files or attached_images):
+        return None
+    
+    payload = {
+        "text": text,
+        "language": language
+    }
+    
+    # Only metadata for files, content is never read here
+    if attached_files:
+        payload["attached_files"] = []
+        for item_info in attached_files:
+            try:
+                payload["attached_files"].append({
+                    "relative_path": item_info["relative_path"],
+                    "workspace_name": item_info["workspace_name"],
+                    "name": item_info["name"],
+                    "type": item_info["type"]
+                })
+            except Exception as e:
+                payload["attached_files"].append({
+                    "relative_path": item_info.get("relative_path", "unknown"),
+                    "workspace_name": item_info.get("workspace_name", ""),
+                    "name": item_info.get("name", "unknown"),
+                    "type": item_info.get("type", "unknown"),
+                    "error": str(e)
+                })
+    
+    if attached_images:
+        # Ảnh có file chỉ gửi đường dẫn: nội dung được đọc và encode một lần
+        # khi dựng response MCP, không đi qua json.dumps/json.loads
+        payload["attached_images"] = [
+            {
+                "path": img_info["path"],
+                "media_type": img_info["media_type"],
+                "filename": img_info["filename"]
+            } if img_info.get("path") else {
+                "base64_data": img_info["base64_data"],
+                "media_type": img_info["media_type"],
+                "filename": img_info["filename"]
+            }
+            for img_info in attached_images
+        ]
+    
+    return payload
+
+
+def build_ui_result(text: str, continue_chat: bool, ok: bool, status: Optional[str] = None) -> Union[str, Dict[str, Any]]:
+    """
+    Turn a responder's raw answer into the result handed to the MCP handler.
+    Shared by every responder backend and by the UI host process.
+    
+    Args:
+        text: JSON payload built by build_dialog_payload (or plain text)
+        continue_chat: State of the continue conversation checkbox
+        ok: True if the user sent something
+        status: None, "timeout" or "cancelled" when the dialog was closed by the server
+        
+    Returns:
+        Tagged string, or dict with attached_images for mixed responses
+    """
+    if not (ok and text):
+        # Empty case with clean tag format
+        return "\n" + build_control_tags(False, status)
+    
+    try:
+        result_dict = json.loads(text)
+    except json.JSONDecodeError:
+        # Handle non-JSON case with clean tag format
+        return text + "\n\n" + build_control_tags(continue_chat, status)
+    
+    user_text = result_dict.get("text", "")
+    attached_files = result_dict.get("attached_files", [])
+    attached_images = result_dict.get("attached_images", [])
+    
+    # Images need MCP processing - return structured data
+    if attached_images:
+        return {
+            'text_content': user_text,
+            'attached_files': attached_files,
+            'attached_images': attached_images,
+            'continue_chat': continue_chat,
+            'language': result_dict.get("language", "vi"),  # Mặc định tiếng Việt
+            'status': status
+        }
+    
+    return _build_text_content_with_tags(user_text, attached_files, continue_chat, status)
+
+
 def build_error_response(error_message: str) -> List[TextContent]:
     """
     Build standardized error response
@@ -170,8 +362,8 @@ def validate_response_data(result: Any) -> tuple[bool, str]:
             for img in result['attached_images']:
                 if not isinstance(img, dict):
                     return False, "Each image must be a dictionary"
-                if 'base64_data' not in img:
-                    return False, "Image missing base64_data field"
+                if 'base64_data' not in img and 'path' not in img:
+                    return False, "Image missing path or base64_data field"
         
         return True, ""
     
@@ -0,0 +1,134 @@
+"""
+Interaction scheduler for AI Interaction Tool
+Tracks every pending interaction by id so concurrent agent requests can be
+shown together (tabs in the UI host) and each answer goes back to its caller.
+Exposes queue depth and per-request wait time through utils.metrics.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from ..constants import SESSION_PROMPT_PREVIEW_LENGTH
+from ..utils import metrics
+
+
+class InteractionScheduler:
+    """
+    Bookkeeping for pending interactions (no Qt dependency)
+
+    Entries are kept in arrival order; wait time counts from arrival until the
+    interaction is answered, timed out or cancelled.
+    """
+
+    def __init__(self, name="scheduler"):
+        self._lock = threading.Lock()
+        self._pending = OrderedDict()
+        self._sequence = 0
+        self.name = name
+        metrics.register_provider(name, self.stats)
+
+    def add(self, request_id, prompt=None, timeout=None):
+        """
+        Register a new pending interaction
+
+        Args:
+            request_id: Id of the caller's request
+            prompt: Optional prompt shown for this request
+            timeout: Optional seconds before the interaction is closed with its draft
+
+        Returns:
+            int: Sequence number of the request (1-based, used for tab titles)
+        """
+        with self._lock:
+            self._sequence += 1
+            number = self._sequence
+            self._pending[request_id] = {
+                "id": request_id,
+                "number": number,
+                "prompt": prompt,
+                "timeout": timeout,
+                "enqueued_at": time.monotonic()
+            }
+            depth = len(self._pending)
+
+        metrics.increment(f"{self.name}.requests")
+        metrics.set_gauge(f"{self.name}.queue_depth", depth)
+        return number
+
+    def complete(self, request_id, status=None):
+        """
+        Remove an interaction once its answer has been sent back
+
+        Args:
+            request_id: Id passed to add()
+            status: None when the user answered, "timeout" or "cancelled" otherwise
+
+        Returns:
+            float hoặc None: Wait time in seconds, None if the id was unknown
+        """
+        with self._lock:
+            entry = self._pending.pop(request_id, None)
+            depth = len(self._pending)
+        if entry is None:
+            return None
+
+        wait = time.monotonic() - entry["enqueued_at"]
+        metrics.record_timing(f"{self.name}.wait", wait)
+        metrics.increment(f"{self.name}.{status or 'answered'}")
+        metrics.set_gauge(f"{self.name}.queue_depth", depth)
+        return wait
+
+    def get(self, request_id):
+        """Get a copy of a pending entry, or None"""
+        with self._lock:
+            entry = self._pending.get(request_id)
+            return dict(entry) if entry is not None else None
+
+    def wait_time(self, request_id):
+        """Seconds the request has been waiting, or None if it is not pending"""
+        with self._lock:
+            entry = self._pending.get(request_id)
+            if entry is None:
+                return None
+            return time.monotonic() - entry["enqueued_at"]
+
+    def queue_depth(self):
+        """Number of interactions still waiting for an answer"""
+        with self._lock:
+            return len(self._pending)
+
+    def stats(self):
+        """
+        Snapshot of the queue
+
+        Returns:
+            dict: queue_depth, oldest_wait_seconds and per-request wait times
+        """
+        now = time.monotonic()
+        with self._lock:
+            pending = [
+                {
+                    "id": entry["id"],
+                    "number": entry["number"],
+                    "prompt": preview_prompt(entry["prompt"]),
+                    "wait_seconds": round(now - entry["enqueued_at"], 3)
+                }
+                for entry in self._pending.values()
+            ]
+
+        return {
+            "queue_depth": len(pending),
+            "oldest_wait_seconds": pending[0]["wait_seconds"] if pending else 0.0,
+            "pending": pending
+        }
+
+
+def preview_prompt(prompt, length=SESSION_PROMPT_PREVIEW_LENGTH):
+    """Shorten a prompt to one line for stats and tab titles"""
+    if not prompt:
+        return ""
+    prompt = " ".join(prompt.split())
+    if len(prompt) > length:
+        return prompt[:length - 1] + "…"
+    return prompt
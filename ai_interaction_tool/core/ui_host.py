@@ -0,0 +1,433 @@
+"""
+Persistent UI host process for AI Interaction Tool
+Keeps QApplication, stylesheets and a pre-built InputDialog warm in a separate
+process so each tool call only has to show an already-built window.
+Concurrent calls are shown together as tabs of one window, see core.scheduler.
+
+Protocol: one JSON object per line over the host's stdin/stdout pipes
+- host -> server: {"op": "ready"} once warm-up is done
+- server -> host: {"op": "show", "id": ..., "prompt": ..., "timeout": ...}
+- server -> host: {"op": "cancel", "id": ..., "status": "cancelled"}
+- host -> server: {"op": "result", "id": ..., "result": ...}
+- server -> host: {"op": "metrics", "id": ...}
+- host -> server: {"op": "metrics", "id": ..., "metrics": ...}
+- server -> host: {"op": "shutdown"}
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import Future, InvalidStateError
+
+from .responders import get_responder
+from ..constants import (
+    UI_HOST_ENABLED,
+    UI_HOST_START_TIMEOUT,
+    UI_HOST_MAX_RESTARTS,
+    UI_HOST_RESTART_WINDOW
+)
+
+
+class UIHostError(RuntimeError):
+    """Raised when the UI host process cannot be started or dies mid-call"""
+
+
+class UIHostClient:
+    """
+    Server-side handle of the UI host process
+
+    Spawns the host, dispatches its replies to per-request futures from a
+    reader thread and restarts the host automatically when Qt crashes.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._send_lock = threading.Lock()
+        self._process = None
+        self._ready_event = threading.Event()
+        self._pending = {}
+        self._shutting_down = False
+        self._restart_times = []
+
+    def start(self):
+        """
+        Spawn the host process (non-blocking). Warm-up continues in the host
+        while the MCP server finishes its own startup.
+        """
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                return
+
+            project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            # stdin/stdout are the IPC channel - the host must never touch the MCP stdio streams
+            self._process = subprocess.Popen(
+                [sys.executable, "-c", "from ai_interaction_tool.core.ui_host import run_host; run_host()"],
+                cwd=project_root,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=None,
+                encoding="utf-8",
+                bufsize=1,
+                creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0)
+            )
+            self._ready_event = threading.Event()
+
+            reader = threading.Thread(
+                target=self._read_channel,
+                args=(self._process, self._ready_event),
+                name="ai-interaction-ui-host-reader",
+                daemon=True
+            )
+            reader.start()
+            print(f"[UIHost] Started UI host process (pid {self._process.pid})", file=sys.stderr)
+
+    def _read_channel(self, process, ready_event):
+        """Dispatch host messages to waiting futures until the host exits"""
+        try:
+            for line in process.stdout:
+                try:
+                    message = json.loads(line)
+                except ValueError as e:
+                    print(f"[UIHost] Invalid message from host: {str(e)}", file=sys.stderr)
+                    continue
+
+                op = message.get("op")
+                if op == "ready":
+                    ready_event.set()
+                elif op in ("result", "metrics"):
+                    with self._lock:
+                        entry = self._pending.pop(message.get("id"), None)
+                    if entry is not None:
+                        self._resolve(entry[0], result=message.get(op))
+        except (OSError, ValueError):
+            pass
+
+        return_code = process.wait()
+        # Wake up callers still waiting for warm-up so they fail fast
+        ready_event.set()
+        self._handle_exit(process, return_code)
+
+    def _resolve(self, future, result=None, error=None):
+        """Complete a future unless its caller already gave up on it"""
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def _handle_exit(self, process, return_code):
+        """Fail calls owned by a dead host and restart it (e.g. after a Qt crash)"""
+        with self._lock:
+            orphaned = [request_id for request_id, entry in self._pending.items() if entry[1] is process]
+            for request_id in orphaned:
+                future, _ = self._pending.pop(request_id)
+                self._resolve(future, error=UIHostError(f"UI host exited with code {return_code}"))
+
+            if self._shutting_down or process is not self._process:
+                return
+
+            print(f"[UIHost] UI host exited with code {return_code}, restarting", file=sys.stderr)
+
+            # Avoid a restart storm when Qt cannot start at all (no display, missing plugin...)
+            now = time.monotonic()
+            self._restart_times = [t for t in self._restart_times if now - t < UI_HOST_RESTART_WINDOW]
+            if len(self._restart_times) >= UI_HOST_MAX_RESTARTS:
+                print(f"[UIHost] Too many restarts, giving up until next call", file=sys.stderr)
+                self._process = None
+                return
+
+            self._restart_times.append(now)
+            self._process = None
+            self.start()
+
+    def _send(self, process, message):
+        with self._send_lock:
+            process.stdin.write(json.dumps(message, ensure_ascii=False) + "\n")
+            process.stdin.flush()
+
+    def submit(self, prompt=None, timeout=None):
+        """
+        Ask the host to show the interaction dialog without waiting for the answer
+
+        Args:
+            prompt: Optional prompt/question/summary to display at the top of UI
+            timeout: Optional seconds before the host closes the dialog with its draft
+
+        Returns:
+            tuple: (request_id, concurrent.futures.Future resolved with the same value as engine.run_ui)
+        """
+        self.start()
+        with self._lock:
+            process = self._process
+            ready_event = self._ready_event
+
+        if not ready_event.wait(UI_HOST_START_TIMEOUT) or process.poll() is not None:
+            raise UIHostError("UI host did not become ready")
+
+        request_id = uuid.uuid4().hex
+        future = Future()
+        with self._lock:
+            self._pending[request_id] = (future, process)
+
+        try:
+            self._send(process, {"op": "show", "id": request_id, "prompt": prompt, "timeout": timeout})
+        except (OSError, ValueError) as e:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            raise UIHostError(f"Cannot reach UI host: {str(e)}")
+
+        return request_id, future
+
+    def cancel(self, request_id, status="cancelled"):
+        """
+        Close the dialog of a pending call; the host replies with the draft
+
+        Args:
+            request_id: Id returned by submit()
+            status: "cancelled" or "timeout"
+        """
+        with self._lock:
+            entry = self._pending.get(request_id)
+        if entry is None:
+            return
+        try:
+            self._send(entry[1], {"op": "cancel", "id": request_id, "status": status})
+        except (OSError, ValueError):
+            pass
+
+    def get_metrics(self, timeout=2):
+        """
+        Fetch the host's metrics snapshot (scheduler queue depth, wait times...)
+
+        Args:
+            timeout: Seconds to wait for the host to answer
+
+        Returns:
+            dict hoặc None nếu host chưa sẵn sàng hoặc không trả lời kịp
+        """
+        with self._lock:
+            process = self._process
+            ready = self._ready_event.is_set()
+        if process is None or not ready or process.poll() is not None:
+            return None
+
+        request_id = uuid.uuid4().hex
+        future = Future()
+        with self._lock:
+            self._pending[request_id] = (future, process)
+        try:
+            self._send(process, {"op": "metrics", "id": request_id})
+            return future.result(timeout)
+        except Exception as e:
+            print(f"[UIHost] Cannot read host metrics: {str(e)}", file=sys.stderr)
+            return None
+        finally:
+            with self._lock:
+                self._pending.pop(request_id, None)
+
+    async def request_async(self, prompt=None, timeout=None):
+        """
+        Show the interaction dialog in the host and wait for the answer. The
+        event loop keeps serving protocol traffic while the dialog is open.
+        Cancelling the awaiting task (MCP cancellation) closes the dialog in the host.
+        A host that dies mid-call is retried once on a fresh host.
+
+        Args:
+            prompt: Optional prompt/question/summary to display at the top of UI
+            timeout: Optional seconds before the dialog closes with its draft
+
+        Returns:
+            Same value as engine.run_ui (tagged string or structured dict)
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        for attempt in range(2):
+            try:
+                # submit() may wait for warm-up, keep that off the event loop too
+                request_id, future = await asyncio.to_thread(self.submit, prompt, _remaining(deadline))
+            except UIHostError as e:
+                print(f"[UIHost] Call failed on attempt {attempt + 1}: {str(e)}", file=sys.stderr)
+                continue
+
+            try:
+                # shield: cancelling the task must not cancel the future before the host is told
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except asyncio.CancelledError:
+                self.cancel(request_id, "cancelled")
+                raise
+            except UIHostError as e:
+                print(f"[UIHost] Call failed on attempt {attempt + 1}: {str(e)}", file=sys.stderr)
+
+        raise UIHostError("UI host is unavailable")
+
+    def shutdown(self):
+        """Stop the host process (called when the MCP server exits)"""
+        with self._lock:
+            self._shutting_down = True
+            process = self._process
+            self._process = None
+
+        if process is None:
+            return
+        try:
+            self._send(process, {"op": "shutdown"})
+            process.wait(timeout=5)
+        except Exception:
+            process.kill()
+
+
+def _remaining(deadline):
+    """Seconds left until deadline (never negative), or None without deadline"""
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_ui_host():
+    """
+    Get the process-wide UI host client, or None when the host is disabled
+
+    Returns:
+        UIHostClient or None
+    """
+    global _client
+    # The host only serves the Qt dialog; headless responders answer in-process
+    if not UI_HOST_ENABLED or get_responder().headless:
+        return None
+
+    with _client_lock:
+        if _client is None:
+            _client = UIHostClient()
+        return _client
+
+
+def start_ui_host():
+    """Start and pre-warm the UI host (called once when mcp_server.py starts)"""
+    client = get_ui_host()
+    if client is not None:
+        client.start()
+    return client
+
+
+# ============================================================================
+# Host side - runs inside the UI host process
+# ============================================================================
+
+def run_host():
+    """Main loop of the UI host process"""
+    # Keep a private copy of stdout for the channel, redirect fd 1 to stderr so
+    # stray prints from Qt or libraries can never corrupt the protocol
+    channel = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    from PyQt5 import QtCore
+    from ..engine import get_application
+    from .response_formatter import build_ui_result
+    from .dialog_pool import get_dialog_pool
+    from .scheduler import InteractionScheduler
+    from ..ui.session_window import InteractionSessionWindow
+    from ..utils import metrics
+
+    app = get_application()
+    app.setQuitOnLastWindowClosed(False)
+
+    class HostBridge(QtCore.QObject):
+        """Delivers channel messages from the reader thread to the Qt main thread"""
+
+        messageReceived = QtCore.pyqtSignal(dict)
+
+        def __init__(self):
+            super().__init__()
+            self.pool = get_dialog_pool()
+            # request_id -> finished handler, disconnected before the dialog goes back to the pool
+            self.handlers = {}
+            self.scheduler = InteractionScheduler()
+            self.window = InteractionSessionWindow(self.scheduler)
+            self.messageReceived.connect(self.handle_message)
+
+        def write(self, message):
+            channel.write(json.dumps(message, ensure_ascii=False) + "\n")
+            channel.flush()
+
+        def prepare_spare(self):
+            """Build the next dialog while idle so the next call only has to reset and show it"""
+            self.pool.prewarm()
+
+        def handle_message(self, message):
+            op = message.get("op")
+            if op == "show":
+                self.show(message)
+            elif op == "cancel":
+                self.cancel(message.get("id"), message.get("status") or "cancelled")
+            elif op == "metrics":
+                self.write({"op": "metrics", "id": message.get("id"), "metrics": metrics.snapshot()})
+            elif op == "shutdown":
+                app.quit()
+
+        def cancel(self, request_id, status):
+            dialog = self.window.sessions.get(request_id)
+            if dialog is not None:
+                dialog.interrupt(status)
+
+        def show(self, message):
+            """Open the request in its own tab right away - concurrent calls never wait for each other"""
+            request_id = message.get("id")
+            self.scheduler.add(request_id, message.get("prompt"), message.get("timeout"))
+
+            dialog = self.pool.acquire(message.get("prompt"))
+            dialog.start_deadline(message.get("timeout"))
+            handler = lambda _result: self.dialog_finished(request_id, dialog)
+            self.handlers[request_id] = handler
+            dialog.finished.connect(handler)
+            self.window.add_session(request_id, dialog)
+
+        def dialog_finished(self, request_id, dialog):
+            if dialog.result_ready:
+                result = build_ui_result(dialog.result_text, dialog.result_continue, True, dialog.result_status)
+            else:
+                result = build_ui_result("", False, False, dialog.result_status)
+            self.write({"op": "result", "id": request_id, "result": result})
+
+            self.scheduler.complete(request_id, dialog.result_status)
+            self.window.remove_session(request_id)
+
+            handler = self.handlers.pop(request_id, None)
+            if handler is not None:
+                dialog.finished.disconnect(handler)
+            if not self.pool.release(dialog):
+                # Pool đầy hoặc dialog đã hỏng - dựng lại khi rảnh nếu pool còn trống
+                QtCore.QTimer.singleShot(0, self.prepare_spare)
+
+    bridge = HostBridge()
+
+    def read_channel():
+        for line in sys.stdin:
+            line = line.strip()
+            if line:
+                try:
+                    bridge.messageReceived.emit(json.loads(line))
+                except ValueError as e:
+                    print(f"[UIHost] Invalid message: {str(e)}", file=sys.stderr)
+        # Server went away - nothing left to serve
+        bridge.messageReceived.emit({"op": "shutdown"})
+
+    # Warm up before announcing readiness
+    bridge.prepare_spare()
+    bridge.write({"op": "ready"})
+
+    reader = threading.Thread(target=read_channel, name="ai-interaction-ui-host-reader", daemon=True)
+    reader.start()
+
+    app.exec_()
+
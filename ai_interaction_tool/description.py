@@ -30,6 +30,17 @@ FILES:
 </AI_INTERACTION_ATTACHED_FILES>
 
 <AI_INTERACTION_WORKSPACE>workspace_name</AI_INTERACTION_WORKSPACE>
+
+<AI_INTERACTION_IMAGES_ADJUSTED>
+RESIZED:
+- screenshot.png: 3840x2160 1549 KB -> 1333x750 99 KB JPEG
+
+DROPPED (over the image budget, not sent):
+- screenshot_12.png: 3840x2160 1502 KB
+
+</AI_INTERACTION_IMAGES_ADJUSTED>
+
+<AI_INTERACTION_STATUS>timeout/cancelled</AI_INTERACTION_STATUS>
 <AI_INTERACTION_CONTINUE_CHAT>true/false</AI_INTERACTION_CONTINUE_CHAT>
 
 🔧 WORKSPACE PATH PROCESSING:
@@ -48,6 +59,10 @@ FILES:
 - **<AI_INTERACTION_CONTINUE_CHAT>**: true = MANDATORY recall ai_interaction tool
 - **<AI_INTERACTION_ATTACHED_FILES>**: Present only when files/folders attached
 - **<AI_INTERACTION_WORKSPACE>**: Present only when files/folders attached
+- **<AI_INTERACTION_IMAGES_ADJUSTED>**: Present only when the attached images went over the
+  per-response image budget - lists images sent at lower resolution/quality and images not sent
+- **<AI_INTERACTION_STATUS>**: Present only when the dialog closed without the user sending
+  (timeout = hết thời gian chờ, cancelled = request bị hủy); nội dung phía trên là bản nháp chưa gửi
 
 🚨 INTEGRATION WITH SYSTEM PROMPT RULES:
 1. **Tag Reading**: Agent MUST read all control tags from output
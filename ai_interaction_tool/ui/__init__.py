@@ -1,9 +1,10 @@
 # UI module for AI Interaction Tool
-# Contains file dialogs and tree views
+# Contains file dialogs, tree views and the multi-session window
 
 from .file_dialog import FileAttachDialog
 from .file_tree import FileTreeView, FileSystemModel, FileTreeDelegate
 from .image_attachment import ImageAttachmentWidget, DragDropImageWidget
+from .session_window import InteractionSessionWindow
 from .styles import get_main_stylesheet, get_file_dialog_stylesheet
 
 __all__ = [
@@ -13,6 +14,7 @@ __all__ = [
     'FileTreeDelegate',
     'ImageAttachmentWidget',
     'DragDropImageWidget',
+    'InteractionSessionWindow',
     'get_main_stylesheet',
     'get_file_dialog_stylesheet'
 ] 
\ No newline at end of file
@@ -4,7 +4,8 @@ import os
 from .file_tree import FileTreeView, FileTreeDelegate
 from .styles import get_file_dialog_stylesheet, get_context_menu_stylesheet, ModernTheme
 from ..utils.translations import get_translation
-from ..constants import DEFAULT_PATH
+from ..constants import DEFAULT_PATH, WORKSPACE_EXPANDED_PATHS_LIMIT
+from ..core.config import get_config_manager
 from ..utils.file_utils import (
     validate_workspace_path, 
     validate_file_path_in_workspace,
@@ -27,6 +28,9 @@ class FileAttachDialog(QtWidgets.QDialog):
         # Workspace root path
         self.workspace_path = ""
         
+        # Thư mục đang mở trong tree, được nhớ theo từng workspace
+        self.expanded_paths = set()
+        
         # Khởi tạo UI
         self.init_ui()
         
@@ -120,6 +124,8 @@ class FileAttachDialog(QtWidgets.QDialog):
         self.file_tree = FileTreeView(self)
         self.file_tree.setItemDelegate(FileTreeDelegate(self))
         self.file_tree.itemSelected.connect(self.update_selected_items)
+        self.file_tree.expanded.connect(self._on_tree_expanded)
+        self.file_tree.collapsed.connect(self._on_tree_collapsed)
         
         # Thiết lập đường dẫn mặc định
         default_path = DEFAULT_PATH
@@ -241,6 +247,8 @@ class FileAttachDialog(QtWidgets.QDialog):
             
             # Auto-expand workspace root để show immediate subdirectories
             self._expand_workspace_root()
+            self._restore_expanded_paths()
+            self._restore_saved_selection()
             
             # Update workspace input field với current workspace
             self.workspace_input.setText(self.workspace_path)
@@ -296,6 +304,8 @@ class FileAttachDialog(QtWidgets.QDialog):
         
         # Auto-expand workspace root để show immediate subdirectories
         self._expand_workspace_root()
+        self._restore_expanded_paths()
+        self._restore_saved_selection()
         
         # Update workspace input với final normalized path
         self.workspace_input.setText(self.workspace_path)
@@ -657,42 +667,52 @@ class FileAttachDialog(QtWidgets.QDialog):
             
             # Auto-expand workspace root để show immediate subdirectories
             self._expand_workspace_root()
+            self._restore_expanded_paths()
             
             # Khôi phục selected items
-            for item_info in current_attached_files:
-                try:
-                    relative_path = item_info["relative_path"]
-                    if relative_path not in self.selected_items:
-                        self.selected_items.append(relative_path)
-                        
-                        # Thêm vào UI list
-                        item_type = item_info.get("type", "unknown").upper()
-                        basename = item_info.get("name", "unknown")
-                        display_name = f"[{item_type}] {basename}"
-                        
-                        if len(relative_path) > 60:
-                            short_path = "..." + relative_path[-57:]
-                            display_name += f" ({short_path})"
-                        else:
-                            display_name += f" ({relative_path})"
-                        
-                        list_item = QtWidgets.QListWidgetItem(display_name)
-                        list_item.setToolTip(self._get_translation("file_item_tooltip").format(path=relative_path))
-                        self.selected_list.addItem(list_item)
+            self._restore_selected_items(current_attached_files)
+    
+    def _restore_saved_selection(self):
+        """Nạp các file đã chọn được lưu trong profile của workspace vừa chọn"""
+        self._restore_selected_items(get_config_manager().get_workspace_attached_files(self.workspace_path))
+    
+    def _restore_selected_items(self, attached_files):
+        """Thêm các file đã đính kèm vào danh sách chọn và highlight chúng trong tree"""
+        workspace_name = os.path.basename(self.workspace_path)
+        for item_info in attached_files:
+            try:
+                relative_path = item_info["relative_path"]
+                if relative_path not in self.selected_items:
+                    self.selected_items.append(relative_path)
+                    
+                    # Thêm vào UI list
+                    item_type = item_info.get("type", "unknown").upper()
+                    basename = item_info.get("name", "unknown")
+                    display_name = f"[{item_type}] {basename}"
+                    
+                    if len(relative_path) > 60:
+                        short_path = "..." + relative_path[-57:]
+                        display_name += f" ({short_path})"
+                    else:
+                        display_name += f" ({relative_path})"
+                    
+                    list_item = QtWidgets.QListWidgetItem(display_name)
+                    list_item.setToolTip(self._get_translation("file_item_tooltip").format(path=relative_path))
+                    self.selected_list.addItem(list_item)
+                    
+                    # Highlight và auto-expand trong tree nếu tìm thấy
+                    workspace_name_prefix = f"{workspace_name}/"
+                    if relative_path.startswith(workspace_name_prefix):
+                        path_without_workspace = relative_path[len(workspace_name_prefix):]
+                        full_path = os.path.join(self.workspace_path, path_without_workspace.replace('/', os.sep))
+                        # Use delayed method để ensure proper expand timing
+                        self._auto_expand_and_highlight_delayed(full_path)
                         
-                        # Highlight và auto-expand trong tree nếu tìm thấy
-                        workspace_name_prefix = f"{workspace_name}/"
-                        if relative_path.startswith(workspace_name_prefix):
-                            path_without_workspace = relative_path[len(workspace_name_prefix):]
-                            full_path = os.path.join(self.workspace_path, path_without_workspace.replace('/', os.sep))
-                            # Use delayed method để ensure proper expand timing
-                            self._auto_expand_and_highlight_delayed(full_path)
-                            
-                except Exception:
-                    continue
-            
-            # Update button state after restore
-            self.update_selected_button_state()
+            except Exception:
+                continue
+        
+        # Update button state after restore
+        self.update_selected_button_state()
     
     def _highlight_item_in_tree(self, full_path):
         """Highlight một item trong tree view"""
@@ -777,6 +797,43 @@ class FileAttachDialog(QtWidgets.QDialog):
             button.style().polish(button)
             button.update() 
 
+    def _on_tree_expanded(self, index):
+        self.expanded_paths.add(normalize_path_unicode(self.file_tree.model.filePath(index)))
+    
+    def _on_tree_collapsed(self, index):
+        self.expanded_paths.discard(normalize_path_unicode(self.file_tree.model.filePath(index)))
+    
+    def _restore_expanded_paths(self):
+        """Mở lại các thư mục đã mở lần trước trong workspace hiện tại"""
+        profile = get_config_manager().get_workspace_profile(self.workspace_path)
+        if not profile:
+            return
+        # Thư mục cha trước để thư mục con hiện ra khi được expand
+        for relative_path in sorted(profile.get('expanded_paths', []), key=lambda p: p.count('/')):
+            full_path = os.path.join(self.workspace_path, relative_path.replace('/', os.sep))
+            if os.path.isdir(full_path):
+                index = self.file_tree.model.index(normalize_path_unicode(full_path))
+                if index.isValid():
+                    self.file_tree.expand(index)
+    
+    def _save_expanded_paths(self):
+        """Lưu các thư mục đang mở (tương đối với workspace) vào workspace profile"""
+        if not self.workspace_path:
+            return
+        relative_paths = []
+        for path in self.expanded_paths:
+            relative_path = os.path.relpath(path, self.workspace_path)
+            if relative_path != '.' and not relative_path.startswith('..'):
+                relative_paths.append(relative_path.replace(os.sep, '/'))
+        relative_paths.sort(key=lambda p: (p.count('/'), p))
+        get_config_manager().update_workspace_profile(
+            self.workspace_path, expanded_paths=relative_paths[:WORKSPACE_EXPANDED_PATHS_LIMIT]
+        )
+    
+    def done(self, result):
+        self._save_expanded_paths()
+        super().done(result)
+    
     def _expand_workspace_root(self):
         """Auto-expand workspace root để show immediate subdirectories"""
         try:
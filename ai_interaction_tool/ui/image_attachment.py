@@ -1,9 +1,7 @@
 # Image attachment widget for AI Interaction Tool
 import os
-import base64
+import sys
 import mimetypes
-import uuid
-import shutil
 from pathlib import Path
 from PyQt5 import QtWidgets, QtCore, QtGui
 from .styles import (
@@ -15,9 +13,15 @@ from .styles import (
     get_image_filename_label_stylesheet,
     get_image_size_label_stylesheet,
     get_image_remove_button_stylesheet,
+    get_image_progress_bar_stylesheet,
 )
+from ..constants import IMAGE_INGEST_SUBMIT_TIMEOUT, IMAGE_RESTORE_BATCH_SIZE
+from ..core.image_store import get_image_store, get_user_images_dir, session_holder
 from ..utils.translations import get_translation
+from ..utils.image_format import sniff_file, media_type_for
 from .image_viewer import ImageViewerDialog
+from .image_ingest import ImageIngestor, ThumbnailLoader, collect_garbage_in_background
+from .thumbnail_cache import get_thumbnail
 
 class DragDropImageWidget(QtWidgets.QWidget):
     """Widget với chức năng drag & drop cho hình ảnh"""
@@ -89,7 +93,7 @@ class DragDropImageWidget(QtWidgets.QWidget):
         if event.mimeData().hasUrls():
             # Kiểm tra nếu có ít nhất một file là hình ảnh
             urls = event.mimeData().urls()
-            image_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp', '.ico'}
+            image_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp', '.ico', '.tif', '.tiff'}
             
             has_image = False
             for url in urls:
@@ -118,7 +122,7 @@ class DragDropImageWidget(QtWidgets.QWidget):
         
         if event.mimeData().hasUrls():
             urls = event.mimeData().urls()
-            image_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp', '.ico'}
+            image_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp', '.ico', '.tif', '.tiff'}
             image_paths = []
             
             for url in urls:
@@ -140,6 +144,9 @@ class DragDropImageWidget(QtWidgets.QWidget):
 class ImageAttachmentWidget(QtWidgets.QWidget):
     """Widget đính kèm hình ảnh với đầy đủ chức năng"""
     
+    # Thay đổi config từ widget khác (tab khác), xử lý trên UI thread
+    configChanged = QtCore.pyqtSignal(str, object)
+    
     def __init__(self, parent=None, language="en", translations=None, config_manager=None):
         super().__init__(parent)
         self.language = language
@@ -148,12 +155,35 @@ class ImageAttachmentWidget(QtWidgets.QWidget):
         
         # Danh sách hình ảnh đính kèm
         self.attached_images = []
+        self.restore_done = False  # True sau lần restore_images_from_config đầu tiên
+        
+        # Ảnh đang được xử lý nền: task_id -> thẻ tiến độ / thống kê của lần thêm ảnh
+        self.ingestor = ImageIngestor(self)
+        self.ingestor.progress.connect(self._on_ingest_progress)
+        self.ingestor.finished.connect(self._on_ingest_finished)
+        self.ingestor.failed.connect(self._on_ingest_failed)
+        self._progress_cards = {}
+        self._ingest_batches = {}
+        
+        # Ảnh restore từ config: thumbnail được nạp ở background, path -> QLabel hiển thị
+        self.thumbnail_loader = ThumbnailLoader(self)
+        self.thumbnail_loader.loaded.connect(self._on_thumbnail_loaded)
+        self._pending_thumbnails = {}
+        self._restore_queue = []  # Ảnh đã restore nhưng chưa dựng thẻ preview
+        
+        # Reference của widget tới các blob trong image store (ảnh đang đính kèm)
+        self._ref_holder = session_holder(self)
+        self._synced_refs = None
         
         # Setup UI
         self.init_ui()
         
+        if self.config_manager:
+            self.configChanged.connect(self._on_config_changed)
+            self.config_manager.subscribe(self._forward_config_change)
+        
         # Restore images from config after UI is ready
-        QtCore.QTimer.singleShot(100, self.restore_images_from_config)
+        QtCore.QTimer.singleShot(100, self.ensure_restored)
     
     def _get_translation(self, key):
         """Lấy bản dịch cho key dựa trên ngôn ngữ hiện tại"""
@@ -243,7 +273,7 @@ class ImageAttachmentWidget(QtWidgets.QWidget):
         file_dialog = QtWidgets.QFileDialog(self)
         file_dialog.setWindowTitle("Select Images")
         file_dialog.setFileMode(QtWidgets.QFileDialog.ExistingFiles)
-        file_dialog.setNameFilter("Images (*.png *.jpg *.jpeg *.gif *.bmp *.webp)")
+        file_dialog.setNameFilter("Images (*.png *.jpg *.jpeg *.gif *.bmp *.webp *.tif *.tiff)")
         
         if file_dialog.exec_():
             selected_files = file_dialog.selectedFiles()
@@ -252,49 +282,227 @@ class ImageAttachmentWidget(QtWidgets.QWidget):
     
     def handle_attached_images(self, image_paths):
         """Xử lý khi có hình ảnh được attach từ file dialog với detailed feedback"""
-        successful_adds = 0
-        duplicate_count = 0
-        invalid_count = 0
+        self._start_ingestion(image_paths, "attached")
+    
+    def _start_ingestion(self, image_paths, source_type):
+        """
+        Thêm ảnh ở background: mỗi ảnh một thẻ tiến độ, thẻ được thay bằng
+        preview khi xử lý xong. Thông báo kết quả hiện khi cả lượt đã xong.
         
-        for image_path in image_paths:
-            try:
-                # Check if already exists (duplicate)
-                source_filename = Path(image_path).name
-                if any(img.get('filename') == source_filename for img in self.attached_images):
-                    duplicate_count += 1
-                    continue
-                
-                # Try to add to database
-                if self._add_image_to_database(image_path, "attached"):
-                    successful_adds += 1
-                else:
-                    invalid_count += 1
-                
-            except Exception as e:
-                invalid_count += 1
+        Args:
+            image_paths (list): Đường dẫn ảnh gốc
+            source_type (str): "attached" hoặc "dropped"
+        """
+        if self._restore_queue:
+            # Thẻ tiến độ phải đứng sau thẻ của ảnh restore
+            self._build_restored_previews(len(self._restore_queue))
         
-        # Update UI if any successful adds
-        if successful_adds > 0:
+        batch = {"successful": 0, "duplicates": 0, "invalid": 0, "pending": 0}
+        pending_sources = {card.property("source_path") for card in self._progress_cards.values()}
+        
+        for image_path in image_paths:
+            # Cùng file đang được xử lý; trùng nội dung với ảnh đã đính kèm được phát hiện
+            # theo SHA-256 khi task xong (_on_ingest_finished)
+            source_path = os.path.abspath(image_path)
+            if source_path in pending_sources:
+                batch["duplicates"] += 1
+                continue
+            pending_sources.add(source_path)
+            
+            task_id = self.ingestor.submit(image_path, source_type)
+            card = self._create_progress_card(task_id, Path(image_path).name)
+            card.setProperty("source_path", source_path)
+            self.image_preview_layout.addWidget(card)
+            self._progress_cards[task_id] = card
+            self._ingest_batches[task_id] = batch
+            batch["pending"] += 1
+        
+        if batch["pending"]:
             self.update_image_ui(auto_scroll=True)
+        else:
+            self._show_attachment_result_message(0, batch["duplicates"], 0)
+    
+    def ingest_pasted_image(self, image):
+        """
+        Encode và lưu ảnh paste ở background, thẻ preview hiện khi encode xong
+
+        Paste lại ảnh đã đính kèm được bỏ qua không thông báo, như trước đây.
+
+        Args:
+            image (QtGui.QImage): Ảnh từ clipboard
+        """
+        if self._restore_queue:
+            self._build_restored_previews(len(self._restore_queue))
+        
+        batch = {"successful": 0, "duplicates": 0, "invalid": 0, "pending": 1, "quiet_duplicates": True}
+        # QImage chia sẻ dữ liệu với refcount atomic: worker chỉ đọc nên không cần copy sâu
+        # (ảnh 4K là ~33 MB), clipboard có đổi thì Qt tự detach bản của nó
+        task_id = self.ingestor.submit_image(QtGui.QImage(image))
+        card = self._create_progress_card(task_id, self._get_translation("image_ingest_pasted"))
+        self.image_preview_layout.addWidget(card)
+        self._progress_cards[task_id] = card
+        self._ingest_batches[task_id] = batch
+        self.update_image_ui(auto_scroll=True)
+    
+    def _create_progress_card(self, task_id, filename):
+        """Thẻ giữ chỗ cho ảnh đang xử lý: tên file, thanh tiến độ và nút hủy"""
+        card = QtWidgets.QFrame()
+        card.setFixedSize(150, 170)
+        card.setFrameStyle(QtWidgets.QFrame.NoFrame)
+        card.setStyleSheet(get_image_preview_card_stylesheet())
+        card.setProperty("filename", filename)
+        
+        card_layout = QtWidgets.QVBoxLayout(card)
+        card_layout.setContentsMargins(8, 8, 8, 8)
+        card_layout.setSpacing(6)
+        
+        status_label = QtWidgets.QLabel("⏳\n" + self._get_translation("image_ingest_processing"))
+        status_label.setFixedSize(126, 96)
+        status_label.setAlignment(QtCore.Qt.AlignCenter)
+        status_label.setStyleSheet(get_image_preview_label_stylesheet())
+        card_layout.addWidget(status_label)
+        
+        progress_bar = QtWidgets.QProgressBar()
+        progress_bar.setObjectName("ingestProgress")
+        progress_bar.setRange(0, 100)
+        progress_bar.setValue(0)
+        progress_bar.setTextVisible(False)
+        progress_bar.setFixedHeight(6)
+        progress_bar.setStyleSheet(get_image_progress_bar_stylesheet())
+        card_layout.addWidget(progress_bar)
+        
+        filename_row = QtWidgets.QHBoxLayout()
+        filename_row.setContentsMargins(0, 0, 0, 0)
+        filename_row.setSpacing(4)
+        
+        filename_label = QtWidgets.QLabel(filename if len(filename) <= 16 else filename[:13] + "...")
+        filename_label.setStyleSheet(get_image_filename_label_stylesheet())
+        filename_label.setToolTip(filename)
+        
+        cancel_btn = QtWidgets.QPushButton("X")
+        cancel_btn.setStyleSheet(get_image_remove_button_stylesheet())
+        cancel_btn.setToolTip(self._get_translation("image_ingest_cancel_tooltip"))
+        cancel_btn.setProperty("task_id", task_id)
+        cancel_btn.clicked.connect(self._handle_cancel_button_click)
         
-        # Show detailed feedback message
-        self._show_attachment_result_message(successful_adds, duplicate_count, invalid_count)
+        filename_row.addWidget(filename_label)
+        filename_row.addStretch()
+        filename_row.addWidget(cancel_btn)
+        card_layout.addLayout(filename_row)
+        
+        return card
     
-    def image_to_base64(self, image_path):
-        """Convert image file to base64 string"""
-        try:
-            with open(image_path, 'rb') as img_file:
-                return base64.b64encode(img_file.read()).decode('utf-8')
-        except Exception as e:
-            return None
+    def _handle_cancel_button_click(self):
+        """Hủy một ảnh đang xử lý, thẻ của nó biến mất ngay"""
+        sender = self.sender()
+        if sender:
+            task_id = sender.property("task_id")
+            self.ingestor.cancel(task_id)
+            self._remove_progress_card(task_id)
+            self.update_image_ui()
+    
+    def _remove_progress_card(self, task_id):
+        card = self._progress_cards.pop(task_id, None)
+        if card is not None:
+            card.setParent(None)
+            card.deleteLater()
+        return card
+    
+    def _on_ingest_progress(self, task_id, percent):
+        card = self._progress_cards.get(task_id)
+        if card is not None:
+            card.findChild(QtWidgets.QProgressBar, "ingestProgress").setValue(percent)
+    
+    def _on_ingest_finished(self, task_id, result):
+        """Ảnh đã vào database: thay thẻ tiến độ bằng preview ở đúng vị trí"""
+        card = self._progress_cards.get(task_id)
+        if card is None:
+            # Thẻ đã bị gỡ (reset/clear) mà task không kịp hủy - blob không ai giữ, GC sẽ dọn
+            self._finish_ingest_item(task_id, None)
+            return
+        
+        if any(img.get("sha256") == result["sha256"] for img in self.attached_images):
+            # Cùng nội dung với ảnh đã đính kèm (có thể khác tên file)
+            self._remove_progress_card(task_id)
+            self._finish_ingest_item(task_id, "duplicates")
+            return
+        
+        # Giữ attached_images cùng thứ tự với các thẻ preview
+        index = self.image_preview_layout.indexOf(card)
+        progress_cards = set(self._progress_cards.values())
+        attached_index = sum(
+            1 for i in range(index) if self.image_preview_layout.itemAt(i).widget() not in progress_cards
+        )
+        
+        thumbnail = result.pop("thumbnail")
+        self.attached_images.insert(attached_index, result)
+        self._remove_progress_card(task_id)
+        self.add_image_preview(result["path"], thumbnail=thumbnail, index=index)
+        self._finish_ingest_item(task_id, "successful")
+    
+    def _on_ingest_failed(self, task_id, error):
+        self._remove_progress_card(task_id)
+        self._finish_ingest_item(task_id, "invalid" if error else None)
+    
+    def _finish_ingest_item(self, task_id, outcome):
+        batch = self._ingest_batches.pop(task_id, None)
+        if batch is None:
+            return
+        if outcome:
+            batch[outcome] += 1
+        batch["pending"] -= 1
+        if batch["pending"] == 0:
+            self.update_image_ui(auto_scroll=batch["successful"] > 0)
+            if batch["successful"]:
+                # Store vừa lớn thêm - sweeper kiểm tra giới hạn dung lượng (có throttle)
+                self._collect_image_garbage()
+            duplicates = 0 if batch.get("quiet_duplicates") else batch["duplicates"]
+            self._show_attachment_result_message(batch["successful"], duplicates, batch["invalid"])
+    
+    def finish_ingestion(self, timeout=IMAGE_INGEST_SUBMIT_TIMEOUT):
+        """
+        Chờ ảnh đang xử lý xong (khi gửi) để chúng có trong kết quả
+        
+        Returns:
+            bool: True nếu không còn ảnh nào đang xử lý
+        """
+        if not self.ingestor.pending_count():
+            return True
+        return self.ingestor.wait(timeout)
+    
+    def cancel_ingestion(self):
+        """Hủy mọi ảnh đang xử lý và gỡ thẻ tiến độ (đóng dialog, xóa hết ảnh)"""
+        self._restore_queue = []
+        self._cancel_thumbnail_loads()
+        self.ingestor.cancel_all()
+        for task_id in list(self._progress_cards):
+            self._remove_progress_card(task_id)
+        self._ingest_batches.clear()
     
     def get_image_media_type(self, image_path):
-        """Get MIME type for image file"""
+        """Get MIME type for image file (from its header, not its extension)"""
+        image_format = sniff_file(image_path)
+        if image_format:
+            return media_type_for(image_format)
         mime_type, _ = mimetypes.guess_type(image_path)
         return mime_type or 'image/png'
     
-    def add_image_preview(self, image_path):
-        """Add simple, robust image preview"""
+    def add_image_preview(self, image_path, thumbnail=None, index=None, lazy=False, size_bytes=None, update_ui=True):
+        """
+        Add simple, robust image preview
+        
+        Args:
+            image_path: Database path of the image
+            thumbnail: QImage đã thu nhỏ sẵn (từ ImageIngestor), None thì lấy từ thumbnail cache
+            index: Vị trí trong hàng preview, None = cuối
+            lazy: Không đọc file: hiện placeholder, thumbnail do ThumbnailLoader nạp sau
+            size_bytes: Dung lượng file nếu đã biết (không cần stat)
+            update_ui: False khi dựng nhiều thẻ liên tiếp (gọi update_image_ui một lần ở cuối)
+        """
+        if self._restore_queue and not lazy:
+            # Thẻ của ảnh restore phải đứng trước ảnh mới thêm
+            self._build_restored_previews(len(self._restore_queue))
+        
         # Create taller preview card with more info space
         preview_card = QtWidgets.QFrame()
         preview_card.setFixedSize(150, 170)
@@ -328,16 +536,21 @@ class ImageAttachmentWidget(QtWidgets.QWidget):
         
         # Load and display image với better scaling
         try:
-            pixmap = QtGui.QPixmap(image_path)
-            if not pixmap.isNull():
-                # Scale to fit larger display area với high quality
-                scaled_pixmap = pixmap.scaled(122, 92, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
-                image_display.setPixmap(scaled_pixmap)
+            if lazy:
+                image_display.setText("🖼️")
+                self._pending_thumbnails[image_path] = image_display
             else:
-                image_display.setText("🖼️\nInvalid")
-                image_display.setStyleSheet(image_display.styleSheet() + """
-                    QLabel { color: #999; font-size: 11px; }
-                """)
+                if thumbnail is None:
+                    # Decode ở kích thước thumbnail (không decode cả ảnh), có cache trên đĩa
+                    sha256 = next((img.get("sha256") for img in self.attached_images if img.get("path") == image_path), None)
+                    thumbnail = get_thumbnail(image_path, sha256)
+                if not thumbnail.isNull():
+                    image_display.setPixmap(QtGui.QPixmap.fromImage(thumbnail))
+                else:
+                    image_display.setText("🖼️\nInvalid")
+                    image_display.setStyleSheet(image_display.styleSheet() + """
+                        QLabel { color: #999; font-size: 11px; }
+                    """)
         except Exception as e:
             image_display.setText("⚠️\nError")
             image_display.setStyleSheet(image_display.styleSheet() + """
@@ -357,8 +570,11 @@ class ImageAttachmentWidget(QtWidgets.QWidget):
         filename_row.setContentsMargins(0, 0, 0, 0)
         filename_row.setSpacing(4)
         
-        # Filename với bold styling - always use database filename
-        filename = Path(image_path).name
+        # Filename với bold styling - tên gốc của ảnh (blob trong store được đặt tên theo hash)
+        filename = next(
+            (img.get("filename") for img in self.attached_images if img.get("path") == image_path and img.get("filename")),
+            Path(image_path).name
+        )
         if len(filename) > 16:
             filename = filename[:13] + "..."
         
@@ -381,18 +597,14 @@ class ImageAttachmentWidget(QtWidgets.QWidget):
         filename_row.addWidget(remove_btn)
         
         # Add image size info
-        try:
-            file_size = os.path.getsize(image_path)
-            if file_size < 1024:
-                size_text = f"{file_size} B"
-            elif file_size < 1024 * 1024:
-                size_text = f"{file_size // 1024} KB"
-            else:
-                size_text = f"{file_size // (1024 * 1024)} MB"
-        except:
-            size_text = "Unknown size"
+        if size_bytes is None and not lazy:
+            try:
+                size_bytes = os.path.getsize(image_path)
+            except OSError:
+                pass
         
-        size_label = QtWidgets.QLabel(size_text)
+        size_label = QtWidgets.QLabel(self._format_size(size_bytes) if size_bytes is not None else "")
+        size_label.setObjectName("imageSizeLabel")
         size_label.setStyleSheet(get_image_size_label_stylesheet())
         
         # Add all info to layout
@@ -402,10 +614,54 @@ class ImageAttachmentWidget(QtWidgets.QWidget):
         card_layout.addLayout(info_layout)
         
         # Add to preview layout
-        self.image_preview_layout.addWidget(preview_card)
+        if index is None:
+            self.image_preview_layout.addWidget(preview_card)
+        else:
+            self.image_preview_layout.insertWidget(index, preview_card)
         
         # Update UI with auto-scroll for new images (this will handle placeholder hide/show)
-        self.update_image_ui(auto_scroll=True)
+        if update_ui:
+            self.update_image_ui(auto_scroll=True)
+    
+    @staticmethod
+    def _format_size(file_size):
+        if file_size < 1024:
+            return f"{file_size} B"
+        if file_size < 1024 * 1024:
+            return f"{file_size // 1024} KB"
+        return f"{file_size // (1024 * 1024)} MB"
+    
+    def _on_thumbnail_loaded(self, image_path, thumbnail, size_bytes):
+        """Thumbnail của ảnh restore đã sẵn sàng (hoặc file không còn)"""
+        image_display = self._pending_thumbnails.pop(image_path, None)
+        if image_display is None:
+            # Ảnh đã bị gỡ/danh sách đã dựng lại trước khi thumbnail tới
+            return
+        
+        try:
+            if size_bytes is None:
+                # File đã mất khỏi database: bỏ ảnh như khi restore trước đây
+                self.attached_images = [img for img in self.attached_images if img.get("path") != image_path]
+                card = image_display.parentWidget().parentWidget()
+                card.setParent(None)
+                card.deleteLater()
+                self.update_image_ui()
+                return
+            
+            if thumbnail is not None and not thumbnail.isNull():
+                image_display.setPixmap(QtGui.QPixmap.fromImage(thumbnail))
+            else:
+                image_display.setText("🖼️\nInvalid")
+            size_label = image_display.parentWidget().parentWidget().findChild(QtWidgets.QLabel, "imageSizeLabel")
+            if size_label is not None:
+                size_label.setText(self._format_size(size_bytes))
+        except RuntimeError:
+            # Thẻ preview đã bị xóa
+            pass
+    
+    def _cancel_thumbnail_loads(self):
+        self.thumbnail_loader.cancel_all()
+        self._pending_thumbnails.clear()
     
     def _handle_remove_button_click(self):
         """Safe handler for remove button clicks"""
@@ -459,6 +715,8 @@ class ImageAttachmentWidget(QtWidgets.QWidget):
         )
         
         if reply == QtWidgets.QMessageBox.Yes:
+            self.cancel_ingestion()
+            
             # Show loading for bulk operation
             self._show_loading_state("Clearing all images...")
             
@@ -492,34 +750,7 @@ class ImageAttachmentWidget(QtWidgets.QWidget):
     
     def handle_dropped_images(self, image_paths):
         """Xử lý khi có hình ảnh được drop vào widget với detailed feedback"""
-        successful_adds = 0
-        failed_adds = 0
-        duplicate_count = 0
-        invalid_count = 0
-        
-        for image_path in image_paths:
-            try:
-                # Check if already exists (duplicate)
-                source_filename = Path(image_path).name
-                if any(img.get('filename') == source_filename for img in self.attached_images):
-                    duplicate_count += 1
-                    continue
-                
-                # Try to add to database
-                if self._add_image_to_database(image_path, "dropped"):
-                    successful_adds += 1
-                else:
-                    invalid_count += 1
-                
-            except Exception as e:
-                invalid_count += 1
-        
-        # Update UI if any successful adds
-        if successful_adds > 0:
-            self.update_image_ui(auto_scroll=True)
-        
-        # Show detailed feedback message
-        self._show_attachment_result_message(successful_adds, duplicate_count, invalid_count)
+        self._start_ingestion(image_paths, "dropped")
     
     def _show_attachment_result_message(self, successful, duplicates, invalid):
         """Show detailed result message only when there are problems"""
@@ -585,7 +816,8 @@ class ImageAttachmentWidget(QtWidgets.QWidget):
 
     def update_image_ui(self, auto_scroll=False):
         """Update image slider UI and button text - container always visible"""
-        has_images = len(self.attached_images) > 0
+        # Thẻ tiến độ của ảnh đang xử lý cũng cần hàng preview hiện ra
+        has_images = len(self.attached_images) > 0 or bool(self._progress_cards)
         
         # Update button states
         self.clear_images_btn.setEnabled(has_images)
@@ -606,6 +838,8 @@ class ImageAttachmentWidget(QtWidgets.QWidget):
             placeholder_text = "📷 " + self._get_translation("image_placeholder")
             self.image_placeholder.setText(placeholder_text)
         
+        self._sync_image_refs()
+        
         # Auto-scroll to show newest image only when adding new images
         if has_images and auto_scroll:
             QtCore.QTimer.singleShot(100, lambda: self.image_scroll_area.horizontalScrollBar().setValue(
@@ -613,8 +847,30 @@ class ImageAttachmentWidget(QtWidgets.QWidget):
             ))
     
     def get_attached_images(self):
-        """Return list of attached images"""
-        return self.attached_images
+        """
+        Return list of attached images
+        
+        Ảnh restore có thể đã mất file mà thumbnail loader chưa kịp báo - bỏ qua ở đây.
+        """
+        return [img for img in self.attached_images if not img.get("path") or os.path.exists(img["path"])]
+    
+    def _image_sha(self, img):
+        return img.get("sha256") or get_image_store().sha_from_path(img.get("path"))
+    
+    def _sync_image_refs(self):
+        """Giữ reference trong image store đúng bằng các ảnh đang đính kèm (chỉ ghi khi đổi)"""
+        shas = [self._image_sha(img) for img in self.attached_images]
+        if shas == self._synced_refs:
+            return
+        try:
+            get_image_store().set_holder_refs(self._ref_holder, shas)
+            self._synced_refs = shas
+        except Exception as e:
+            print(f"[ImageAttachment] Could not update image references: {str(e)}", file=sys.stderr)
+    
+    def _collect_image_garbage(self):
+        """Xóa blob không còn được dialog hay config nào dùng (sau grace period), ở background"""
+        collect_garbage_in_background()
     
     def save_images_to_config(self):
         """Save attached images to config if checkbox is checked"""
@@ -626,6 +882,8 @@ class ImageAttachmentWidget(QtWidgets.QWidget):
                     # SECURITY: Only store database-relative information, no external paths
                     image_data.append({
                         "db_path": img.get("path"),
+                        "sha256": self._image_sha(img),
+                        "size_bytes": img.get("size_bytes"),
                         "filename": img.get("filename"),
                         "media_type": img.get("media_type", "image/png"),
                         "source_type": img.get("source_type", "attached"),
@@ -633,133 +891,25 @@ class ImageAttachmentWidget(QtWidgets.QWidget):
                         "relative_db_path": img.get("relative_db_path", os.path.basename(img.get("path", "")))
                     })
                 
-                self.config_manager.set('last_attached_images', image_data)
+                self.config_manager.set_last_attached_images(image_data)
             else:
                 # Clear saved images if checkbox unchecked and clean database
-                self.config_manager.set('last_attached_images', [])
+                self.config_manager.set_last_attached_images([])
                 self._cleanup_all_database_images()
                 
             self.config_manager.save_config()
     
     def _cleanup_all_database_images(self):
-        """Clean up all images in database when save is disabled"""
-        try:
-            user_images_dir = self._get_user_images_dir()
-            if os.path.exists(user_images_dir):
-                for filename in os.listdir(user_images_dir):
-                    if filename.startswith(("pasted_", "attached_", "dropped_")):
-                        file_path = os.path.join(user_images_dir, filename)
-                        os.remove(file_path)
-                        pass
-        except Exception as e:
-            pass
+        """Clean up all images in database when save is disabled (background sweeper)"""
+        # Ảnh đang đính kèm chỉ là tham chiếu file: giữ lại cho tới khi response
+        # được dựng, lần cleanup sau (khi chúng không còn đính kèm) sẽ xóa
+        collect_garbage_in_background(
+            legacy_keep=[os.path.basename(img.get("path", "")) for img in self.attached_images]
+        )
     
     def _get_user_images_dir(self):
         """Get or create user_images directory"""
-        # Get absolute path to this file
-        current_file = os.path.abspath(__file__)
-        # Go up 3 levels to project root
-        project_root = os.path.dirname(os.path.dirname(os.path.dirname(current_file)))
-        
-        # Create user_images directory in project root
-        user_images_dir = os.path.join(project_root, "user_images")
-        
-        # Create directory if it doesn't exist
-        os.makedirs(user_images_dir, exist_ok=True)
-        
-        return user_images_dir
-    
-    def _cleanup_permanent_copies(self):
-        """Clean up permanent copies of images"""
-        try:
-            user_images_dir = self._get_user_images_dir()
-            if os.path.exists(user_images_dir):
-                # Only remove pasted image files, not all files
-                for filename in os.listdir(user_images_dir):
-                    if filename.startswith("pasted_"):
-                        file_path = os.path.join(user_images_dir, filename)
-                        os.remove(file_path)
-                        pass
-        except Exception as e:
-            pass
-    
-    def _add_image_to_database(self, source_path, source_type="attached"):
-        """
-        Unified method to add image to database (user_images directory)
-        Args:
-            source_path: Path to source image file
-            source_type: "attached", "dropped", or "pasted"
-        Returns:
-            bool: True if successfully added, False otherwise
-        """
-        try:
-            # Check for duplicates using filename only (security: no full paths stored)
-            source_filename = Path(source_path).name
-            if any(img.get('filename') == source_filename for img in self.attached_images):
-                return False
-            
-            # Show loading state
-            self._show_loading_state(f"Adding {source_type} image...")
-            
-            # Get user_images directory
-            user_images_dir = self._get_user_images_dir()
-            
-            # Generate unique filename
-            original_filename = Path(source_path).name
-            file_ext = Path(source_path).suffix
-            unique_id = str(uuid.uuid4())[:8]
-            
-            # Create database filename based on source type
-            if source_type == "pasted":
-                db_filename = f"pasted_{unique_id}{file_ext}"
-            elif source_type == "dropped":
-                db_filename = f"dropped_{unique_id}_{original_filename}"
-            else:  # attached
-                db_filename = f"attached_{unique_id}_{original_filename}"
-            
-            db_path = os.path.join(user_images_dir, db_filename)
-            
-            # Copy image to database with original quality
-            shutil.copy2(source_path, db_path)
-            
-            # Verify database file exists before proceeding
-            if not os.path.exists(db_path):
-                self._hide_loading_state()
-                return False
-            
-            # Convert to base64 from database copy
-            base64_data = self.image_to_base64(db_path)
-            if not base64_data:
-                # Clean up failed copy
-                if os.path.exists(db_path):
-                    os.remove(db_path)
-                self._hide_loading_state()
-                return False
-            
-            # Add to attached_images list - SECURITY: Only store relative paths in user_images
-            image_info = {
-                "path": db_path,  # Database path (only within user_images)
-                "filename": original_filename,  # Original filename for display
-                "base64_data": base64_data,
-                "media_type": self.get_image_media_type(db_path),
-                "source_type": source_type,
-                "db_filename": db_filename,  # For database management (relative)
-                "relative_db_path": os.path.basename(db_path)  # SECURITY: Only relative path stored
-            }
-            
-            self.attached_images.append(image_info)
-            
-            # Add to UI only after database operation is complete
-            self.add_image_preview(db_path)
-            
-            # Hide loading state
-            self._hide_loading_state()
-            
-            return True
-            
-        except Exception as e:
-            self._hide_loading_state()
-            return False
+        return get_user_images_dir()
     
     def _remove_image_from_database(self, db_path):
         """Remove image from database and storage"""
@@ -776,8 +926,10 @@ class ImageAttachmentWidget(QtWidgets.QWidget):
                 self._hide_loading_state()
                 return False
             
-            # Remove physical file from database
-            if os.path.exists(db_path) and "user_images" in db_path:
+            # Blob trong image store chỉ mất reference (update_image_ui), GC xóa khi không
+            # còn ai dùng. File cũ (trước image store) thì xóa luôn như trước.
+            if (get_image_store().sha_from_path(db_path) is None and os.path.exists(db_path)
+                    and os.path.abspath(db_path).startswith(os.path.join(get_user_images_dir(), ''))):
                 os.remove(db_path)
                 
                 # Verify file is actually removed
@@ -834,10 +986,13 @@ class ImageAttachmentWidget(QtWidgets.QWidget):
 
     def restore_images_from_config(self):
         """Restore images from config"""
+        self.restore_done = True
+        # Mỗi dialog dọn image store một lần khi mở
+        self._collect_image_garbage()
         if not self.config_manager:
             return
             
-        saved_images = self.config_manager.get('last_attached_images', [])
+        saved_images = self.config_manager.get_last_attached_images()
         
         if not saved_images:
             return
@@ -852,42 +1007,90 @@ class ImageAttachmentWidget(QtWidgets.QWidget):
         if not save_enabled:
             return
             
-        # Show loading for restore operation
-        self._show_loading_state(f"Restoring {len(saved_images)} images...")
-        
-        # Debug disabled
-        
-        restored_count = 0
-        for i, img_data in enumerate(saved_images):
+        # Ảnh đã lưu chỉ được dựng thành tham chiếu: không stat/đọc file ở đây.
+        # Thẻ preview được dựng dần trên event loop, thumbnail (đọc từ cache) và
+        # dung lượng file được nạp ở background; nội dung ảnh chỉ được đọc khi gửi,
+        # ảnh bị gỡ trước đó thì không bao giờ.
+        image_store = get_image_store()
+        for img_data in saved_images:
             db_path = img_data.get("db_path")
+            if not db_path:
+                continue
             
-            if db_path and os.path.exists(db_path):
-                try:
-                    # Convert to base64 from database
-                    base64_data = self.image_to_base64(db_path)
-                    if base64_data:
-                        # Restore full image info - SECURITY: No external paths stored
-                        image_info = {
-                            "path": db_path,
-                            "filename": img_data.get("filename", Path(db_path).name),
-                            "base64_data": base64_data,
-                            "media_type": img_data.get("media_type", "image/png"),
-                            "source_type": img_data.get("source_type", "attached"),
-                            "db_filename": img_data.get("db_filename"),
-                            "relative_db_path": img_data.get("relative_db_path", os.path.basename(db_path))
-                        }
-                        
-                        self.attached_images.append(image_info)
-                        self.add_image_preview(db_path)
-                        restored_count += 1
-                except Exception as e:
-                    pass
-        
-        # Hide loading state
-        self._hide_loading_state()
-                    
-        if restored_count > 0:
-            self.update_image_ui()
+            # Restore full image info - SECURITY: No external paths stored
+            image_info = {
+                "path": db_path,
+                "sha256": img_data.get("sha256") or image_store.sha_from_path(db_path),
+                "filename": img_data.get("filename", Path(db_path).name),
+                "media_type": img_data.get("media_type", "image/png"),
+                "source_type": img_data.get("source_type", "attached"),
+                "db_filename": img_data.get("db_filename"),
+                "relative_db_path": img_data.get("relative_db_path", os.path.basename(db_path))
+            }
+            if img_data.get("size_bytes") is not None:
+                image_info["size_bytes"] = img_data["size_bytes"]
+            
+            self.attached_images.append(image_info)
+            self._restore_queue.append(image_info)
+        
+        if self._restore_queue:
+            self._build_restored_previews()
+    
+    def _build_restored_previews(self, count=IMAGE_RESTORE_BATCH_SIZE):
+        """Dựng thẻ preview cho count ảnh restore tiếp theo, phần còn lại để lượt event loop sau"""
+        batch = self._restore_queue[:count]
+        del self._restore_queue[:count]
+        for image_info in batch:
+            self.add_image_preview(
+                image_info["path"], lazy=True, size_bytes=image_info.get("size_bytes"), update_ui=False
+            )
+        self.thumbnail_loader.request([(image_info["path"], image_info["sha256"]) for image_info in batch])
+        self.update_image_ui()
+        if self._restore_queue:
+            QtCore.QTimer.singleShot(0, self._build_restored_previews)
+    
+    def ensure_restored(self):
+        """Restore ảnh đã lưu nếu lần restore đầu tiên chưa chạy (timer chưa tới hoặc cần ngay)"""
+        if not self.restore_done:
+            self.restore_images_from_config()
+    
+    def sync_with_config(self):
+        """
+        Đồng bộ ảnh với config khi dialog được dùng lại (DialogPool).
+        Chỉ dựng lại preview khi danh sách ảnh trong config khác với hiện tại,
+        không xóa file nào trong database.
+        
+        Returns:
+            bool: True nếu đã dựng lại danh sách ảnh
+        """
+        if not self.config_manager or not self.restore_done:
+            # Restore lần đầu vẫn đang chờ timer, nó sẽ đọc config mới nhất
+            return False
+        
+        save_enabled = self.config_manager.get('ui_preferences.save_images_enabled', True)
+        if self.save_images_checkbox.isChecked() != save_enabled:
+            # Chặn signal để không chạy lại cleanup database của _on_save_checkbox_changed
+            self.save_images_checkbox.blockSignals(True)
+            self.save_images_checkbox.setChecked(save_enabled)
+            self.save_images_checkbox.blockSignals(False)
+        
+        saved_images = self.config_manager.get_last_attached_images() if save_enabled else []
+        saved_paths = [img.get("db_path") for img in saved_images]
+        current_paths = [img.get("path") for img in self.attached_images]
+        if saved_paths == current_paths:
+            return False
+        
+        self.cancel_ingestion()
+        self.attached_images = []
+        while self.image_preview_layout.count() > 0:
+            item = self.image_preview_layout.takeAt(0)
+            if item.widget():
+                item.widget().setParent(None)
+                item.widget().deleteLater()
+        
+        self.restore_images_from_config()
+        self.update_image_ui()
+        return True
     
     def _show_debug_message(self, title, message):
         """Show debug message in a dialog"""
@@ -916,6 +1119,18 @@ class ImageAttachmentWidget(QtWidgets.QWidget):
         except Exception as e:
             pass
 
+    def _forward_config_change(self, key, value):
+        """Subscriber của ConfigManager - chuyển về UI thread qua signal"""
+        self.configChanged.emit(key, value)
+    
+    def _on_config_changed(self, key, value):
+        """Giữ checkbox lưu ảnh giống nhau giữa các tab"""
+        if key == 'ui_preferences.save_images_enabled' and self.save_images_checkbox.isChecked() != value:
+            # Chặn signal: cleanup database đã chạy ở widget gốc
+            self.save_images_checkbox.blockSignals(True)
+            self.save_images_checkbox.setChecked(bool(value))
+            self.save_images_checkbox.blockSignals(False)
+
     def set_language(self, language):
         """Update language and refresh UI text"""
         self.language = language
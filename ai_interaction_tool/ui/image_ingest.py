@@ -0,0 +1,507 @@
+# Background image ingestion for ImageAttachmentWidget
+# Hash SHA-256, đưa vào image store (link/copy) và decode thumbnail chạy trên
+# QThreadPool; UI thread chỉ nhận kết quả đã xong và dựng thẻ preview.
+# QImage/QImageReader dùng được ngoài UI thread, QPixmap thì chỉ tạo trên UI thread.
+# Ảnh paste từ clipboard cũng được encode (PNG/WebP/JPEG) ở đây thay vì trên UI thread.
+# Định dạng ảnh được nhận ra theo magic bytes; BMP/TIFF/... (client không decode được)
+# được chuyển sang PNG trước khi vào store.
+
+import math
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from PyQt5 import QtCore, QtGui
+
+from ..constants import (
+    IMAGE_INGEST_WORKERS, IMAGE_STORE_GC_INTERVAL, IMAGE_JPEG_QUALITY,
+    PASTE_FORMAT_ENV_VAR, DEFAULT_PASTE_FORMAT
+)
+from ..core.image_store import get_image_store, remove_legacy_images
+from ..utils import metrics
+from ..utils.image_format import sniff_file, is_client_format, media_type_for, extension_for
+from .thumbnail_cache import get_thumbnail, thumbnail_from_image, prune_thumbnails
+
+# Định dạng paste -> (tên writer của Qt, phần mở rộng của blob)
+_PASTE_FORMATS = {
+    "png": ("png", ".png"),
+    "webp": ("webp", ".webp"),
+    "jpeg": ("jpg", ".jpg"),
+    "jpg": ("jpg", ".jpg"),
+}
+
+
+def _parse_paste_format(spec):
+    """
+    "png:1" -> ("png", quality của Qt, ".png"); None nếu spec không hợp lệ
+
+    Với PNG, QImageWriter map quality sang mức nén zlib theo (100 - quality) * 9 / 91,
+    nên mức L được đổi ngược lại thành quality 100 - ceil(L * 91 / 9).
+    """
+    name, _, level = spec.strip().lower().partition(":")
+    if name not in _PASTE_FORMATS:
+        return None
+    qt_format, ext = _PASTE_FORMATS[name]
+    try:
+        level = int(level) if level else None
+    except ValueError:
+        return None
+
+    if qt_format == "png":
+        if level is None:
+            return qt_format, -1, ext
+        if not 0 <= level <= 9:
+            return None
+        return qt_format, 100 - math.ceil(level * 91 / 9), ext
+    if level is not None and not 0 <= level <= 100:
+        return None
+    if qt_format == "webp":
+        # Không có quality (hoặc 100) là lossless
+        return qt_format, 100 if level is None else level, ext
+    return qt_format, IMAGE_JPEG_QUALITY if level is None else level, ext
+
+
+def get_paste_encoding():
+    """
+    Định dạng encode ảnh paste, từ PASTE_FORMAT_ENV_VAR hoặc DEFAULT_PASTE_FORMAT
+
+    Định dạng mà bản Qt đang dùng không có writer (thường là WebP khi thiếu
+    plugin qwebp) thì quay về PNG mặc định.
+
+    Returns:
+        tuple: (qt_format, quality, ext)
+    """
+    spec = os.environ.get(PASTE_FORMAT_ENV_VAR) or DEFAULT_PASTE_FORMAT
+    encoding = _parse_paste_format(spec)
+    if encoding is None:
+        print(f"[ImageIngest] Invalid {PASTE_FORMAT_ENV_VAR}={spec!r}, using {DEFAULT_PASTE_FORMAT}", file=sys.stderr)
+        return _parse_paste_format(DEFAULT_PASTE_FORMAT)
+    if encoding[0].encode() not in QtGui.QImageWriter.supportedImageFormats():
+        print(f"[ImageIngest] No {encoding[0]} writer available, pasting as {DEFAULT_PASTE_FORMAT}", file=sys.stderr)
+        return _parse_paste_format(DEFAULT_PASTE_FORMAT)
+    return encoding
+
+
+def encode_qimage(image, qt_format, quality):
+    """
+    Encode QImage thành bytes (gọi được từ thread bất kỳ)
+
+    Returns:
+        bytes
+    """
+    if qt_format == "jpg" and image.hasAlphaChannel():
+        # JPEG không có alpha - nền trong suốt thành trắng thay vì đen
+        flattened = QtGui.QImage(image.size(), QtGui.QImage.Format_RGB32)
+        flattened.fill(QtCore.Qt.white)
+        painter = QtGui.QPainter(flattened)
+        painter.drawImage(0, 0, image)
+        painter.end()
+        image = flattened
+    buffer = QtCore.QBuffer()
+    buffer.open(QtCore.QIODevice.WriteOnly)
+    writer = QtGui.QImageWriter(buffer, qt_format.encode())
+    writer.setQuality(quality)
+    if not writer.write(image):
+        raise ValueError(f"could not encode image as {qt_format}: {writer.errorString()}")
+    return bytes(buffer.data())
+
+
+class IngestCancelled(Exception):
+    """Raised inside a task once cancel() was called"""
+
+
+class ImageIngestTask(QtCore.QRunnable):
+    """
+    Thêm một ảnh vào image store (hash + link/copy từng chunk), rồi decode thumbnail
+
+    Với ảnh paste (image là QImage, source_path None) thì encode ảnh trước,
+    thumbnail được thu nhỏ thẳng từ ảnh trong bộ nhớ. File ở định dạng client
+    không nhận (BMP, TIFF...) cũng được decode rồi lưu thành PNG.
+    """
+
+    def __init__(self, ingestor, source_path, source_type, image=None):
+        super().__init__()
+        # ImageIngestor giữ reference tới task cho tới khi kết quả được giao
+        self.setAutoDelete(False)
+        self.task_id = uuid.uuid4().hex
+        self.ingestor = ingestor
+        self.source_path = source_path
+        self.source_type = source_type
+        self.image = image
+        self.done = threading.Event()
+        self._cancelled = threading.Event()
+        self._last_percent = -1
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def _check_cancelled(self):
+        if self._cancelled.is_set():
+            raise IngestCancelled()
+
+    # Widget (và ingestor con của nó) có thể đã bị xóa khi worker báo về
+    def _report_progress(self, percent):
+        try:
+            self.ingestor.progress.emit(self.task_id, percent)
+        except RuntimeError:
+            self.cancel()
+
+    def _post(self, kind, value):
+        try:
+            self.ingestor._post(self, kind, value)
+        except RuntimeError:
+            self.done.set()
+
+    def run(self):
+        started = time.perf_counter()
+        try:
+            self._check_cancelled()
+            # Blob chưa có holder: store giữ nó trong grace period, widget nhận nó
+            # vào danh sách đính kèm (và giữ reference) khi kết quả được giao.
+            # Ảnh bị hủy/lỗi sau bước này không cần dọn - GC sẽ xóa nếu không ai dùng.
+            store = get_image_store()
+            if self.image is not None:
+                blob, thumbnail, filename, image_format = self._store_image(store)
+            else:
+                filename = Path(self.source_path).name
+                image_format = sniff_file(self.source_path)
+                if is_client_format(image_format):
+                    # Phần mở rộng theo định dạng thật (PNG đặt tên .jpg vẫn là .png trong store)
+                    blob = store.put_file(
+                        self.source_path, on_progress=self._on_store_progress, ext=extension_for(image_format)
+                    )
+                    self._check_cancelled()
+                    # Decode thumbnail ngay khi thêm để lần mở dialog sau đọc từ cache
+                    thumbnail = get_thumbnail(blob["path"], blob["sha256"])
+                else:
+                    blob, thumbnail = self._store_transcoded(store, image_format)
+                    image_format = "png"
+            if thumbnail.isNull():
+                raise ValueError("unsupported or corrupt image")
+            self._check_cancelled()
+
+            db_path = blob["path"]
+            result = {
+                "path": db_path,
+                "filename": filename,
+                "media_type": media_type_for(image_format),
+                "source_type": self.source_type,
+                "db_filename": os.path.basename(db_path),
+                "relative_db_path": store.relative_path(db_path),
+                "sha256": blob["sha256"],
+                "size_bytes": blob["size_bytes"],
+                "thumbnail": thumbnail
+            }
+        except IngestCancelled:
+            metrics.increment("images.ingest_cancelled")
+            self._post("failed", "")
+            return
+        except Exception as e:
+            metrics.increment("images.ingest_failed")
+            print(f"[ImageIngest] Could not add {self.source_path or 'pasted image'}: {str(e)}", file=sys.stderr)
+            self._post("failed", str(e) or type(e).__name__)
+            return
+
+        metrics.increment("images.ingested")
+        metrics.record_timing("images.ingest", time.perf_counter() - started)
+        self._report_progress(100)
+        self._post("finished", result)
+
+    def _store_image(self, store):
+        """
+        Encode ảnh paste theo định dạng cấu hình và thêm vào store
+
+        Returns:
+            tuple: (blob, thumbnail, filename, image_format) - image_format là định dạng
+            đã encode ("png", "jpeg" hoặc "webp")
+        """
+        qt_format, quality, ext = get_paste_encoding()
+        started = time.perf_counter()
+        data = encode_qimage(self.image, qt_format, quality)
+        metrics.record_timing("images.paste_encode", time.perf_counter() - started)
+        self._report_progress(70)
+        self._check_cancelled()
+
+        # Paste lại cùng một ảnh dùng lại blob sẵn có
+        blob = store.put_bytes(data, ext)
+        self._report_progress(90)
+        self._check_cancelled()
+        thumbnail = thumbnail_from_image(self.image, blob["sha256"])
+        return blob, thumbnail, f"pasted_{blob['sha256'][:8]}{ext}", "jpeg" if qt_format == "jpg" else qt_format
+
+    def _store_transcoded(self, store, source_format):
+        """
+        Decode file ở định dạng client không nhận (BMP, TIFF, ICO... hoặc không nhận ra
+        theo magic bytes nhưng Qt đọc được) và lưu thành PNG
+
+        Returns:
+            tuple: (blob, thumbnail) - blob luôn là PNG
+        """
+        started = time.perf_counter()
+        reader = QtGui.QImageReader(self.source_path)
+        reader.setAutoTransform(True)
+        image = reader.read()
+        if image.isNull():
+            raise ValueError(f"unsupported or corrupt image ({reader.errorString()})")
+        self._report_progress(40)
+        self._check_cancelled()
+
+        data = encode_qimage(image, "png", -1)
+        self._report_progress(70)
+        self._check_cancelled()
+        blob = store.put_bytes(data, ".png")
+        self._report_progress(90)
+        self._check_cancelled()
+
+        source_bytes = os.path.getsize(self.source_path)
+        metrics.increment("images.transcoded")
+        metrics.increment("images.transcode_bytes_saved", max(0, source_bytes - len(data)))
+        metrics.record_timing("images.transcode", time.perf_counter() - started)
+        print(
+            f"[ImageIngest] {Path(self.source_path).name}: {(source_format or 'unknown').upper()}"
+            f" {source_bytes / 1024:.0f} KB -> PNG {len(data) / 1024:.0f} KB",
+            file=sys.stderr
+        )
+        return blob, thumbnail_from_image(image, blob["sha256"])
+
+    def _on_store_progress(self, fraction):
+        """Hash/copy trong store chiếm 0-90%, còn lại là decode thumbnail"""
+        self._check_cancelled()
+        percent = int(fraction * 90)
+        if percent != self._last_percent:
+            self._last_percent = percent
+            self._report_progress(percent)
+
+
+class ImageIngestor(QtCore.QObject):
+    """
+    Chạy ImageIngestTask trên thread pool dùng chung và giao kết quả trên UI thread
+
+    progress(task_id, percent) đến theo queued signal; finished/failed được phát
+    từ _deliver_results() trên UI thread, theo thứ tự task xong.
+    """
+
+    progress = QtCore.pyqtSignal(str, int)
+    finished = QtCore.pyqtSignal(str, object)  # task_id, thông tin ảnh kèm "thumbnail" (QImage)
+    failed = QtCore.pyqtSignal(str, str)  # task_id, lỗi ("" khi bị hủy)
+    _resultReady = QtCore.pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._tasks = {}
+        self._results = queue.Queue()
+        self._resultReady.connect(self._deliver_results, QtCore.Qt.QueuedConnection)
+
+    def submit(self, source_path, source_type):
+        """
+        Bắt đầu xử lý một ảnh
+
+        Returns:
+            str: task_id dùng cho progress/finished/failed và cancel()
+        """
+        return self._start(ImageIngestTask(self, source_path, source_type))
+
+    def submit_image(self, image, source_type="pasted"):
+        """
+        Bắt đầu encode và lưu một ảnh trong bộ nhớ (ảnh paste từ clipboard)
+
+        Args:
+            image (QtGui.QImage): Bản copy riêng của ảnh, worker đọc nó từ thread khác
+
+        Returns:
+            str: task_id
+        """
+        return self._start(ImageIngestTask(self, None, source_type, image=image))
+
+    def _start(self, task):
+        self._tasks[task.task_id] = task
+        get_ingest_pool().start(task)
+        return task.task_id
+
+    def cancel(self, task_id):
+        task = self._tasks.get(task_id)
+        if task is not None:
+            task.cancel()
+
+    def cancel_all(self):
+        for task in self._tasks.values():
+            task.cancel()
+
+    def pending_count(self):
+        return len(self._tasks)
+
+    def wait(self, timeout):
+        """
+        Chờ các task đang chạy (tối đa timeout giây) rồi giao kết quả ngay
+
+        Returns:
+            bool: True nếu không còn task nào đang chờ
+        """
+        deadline = time.monotonic() + timeout
+        for task in list(self._tasks.values()):
+            if not task.done.wait(max(0.0, deadline - time.monotonic())):
+                break
+        self._deliver_results()
+        return not self._tasks
+
+    def _post(self, task, kind, value):
+        """Gọi từ worker thread khi task xong"""
+        self._results.put((task, kind, value))
+        task.done.set()
+        self._resultReady.emit()
+
+    def _deliver_results(self):
+        while True:
+            try:
+                task, kind, value = self._results.get_nowait()
+            except queue.Empty:
+                return
+            if self._tasks.pop(task.task_id, None) is None:
+                continue
+            if kind == "finished" and task.is_cancelled():
+                # Bị hủy sau khi worker đã xong - blob không có holder, GC sẽ dọn
+                kind, value = "failed", ""
+            if kind == "finished":
+                self.finished.emit(task.task_id, value)
+            else:
+                self.failed.emit(task.task_id, value)
+
+
+class ThumbnailTask(QtCore.QRunnable):
+    """Đọc thumbnail (từ cache) và kích thước file của các ảnh đã lưu, theo thứ tự"""
+
+    def __init__(self, loader, items):
+        super().__init__()
+        self.loader = loader
+        self.items = items
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+
+    def run(self):
+        try:
+            self._load_all()
+        finally:
+            self.done.set()
+
+    def _load_all(self):
+        for image_path, sha256 in self.items:
+            if self.cancelled.is_set():
+                return
+            try:
+                size_bytes = os.path.getsize(image_path)
+                thumbnail = get_thumbnail(image_path, sha256)
+            except OSError:
+                # File đã bị xóa khỏi database
+                size_bytes, thumbnail = None, None
+            try:
+                self.loader.loaded.emit(image_path, thumbnail, size_bytes)
+            except RuntimeError:
+                # Widget đã bị xóa
+                return
+
+
+class ThumbnailLoader(QtCore.QObject):
+    """
+    Nạp thumbnail cho ảnh được restore từ config trên thread pool dùng chung
+
+    loaded(path, thumbnail, size_bytes) đến trên UI thread; thumbnail và
+    size_bytes là None khi file không còn.
+    """
+
+    loaded = QtCore.pyqtSignal(str, object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._tasks = []
+
+    def request(self, items):
+        """
+        Args:
+            items (list): [(image_path, sha256 hoặc None)]
+        """
+        if not items:
+            return
+        self._tasks = [task for task in self._tasks if not task.done.is_set()]
+        task = ThumbnailTask(self, list(items))
+        self._tasks.append(task)
+        get_ingest_pool().start(task)
+
+    def cancel_all(self):
+        for task in self._tasks:
+            task.cancelled.set()
+        self._tasks = []
+
+
+class GarbageCollectTask(QtCore.QRunnable):
+    """
+    Sweeper của image store, chạy ngoài UI thread ở priority thấp nhất
+
+    Xóa blob hết reference (GC), rồi blob lâu không dùng nhất khi store vượt giới hạn
+    (enforce_retention), thumbnail mồ côi và - khi được yêu cầu - ảnh kiểu cũ
+    nằm thẳng trong user_images.
+    """
+
+    def __init__(self, legacy_keep=None):
+        super().__init__()
+        self.legacy_keep = legacy_keep
+
+    def run(self):
+        thread = QtCore.QThread.currentThread()
+        priority = thread.priority()
+        if priority == QtCore.QThread.InheritPriority:
+            priority = QtCore.QThread.NormalPriority
+        # Nhường CPU/đĩa cho ingest ảnh và UI, thread của pool được dùng lại nên trả priority sau khi xong
+        thread.setPriority(QtCore.QThread.LowestPriority)
+        started = time.perf_counter()
+        try:
+            store = get_image_store()
+            store.collect_garbage()
+            store.enforce_retention()
+            prune_thumbnails()
+            if self.legacy_keep is not None:
+                remove_legacy_images(store.images_dir, self.legacy_keep)
+        except Exception as e:
+            print(f"[ImageIngest] Image store cleanup failed: {str(e)}", file=sys.stderr)
+        finally:
+            metrics.record_timing("images.store_sweep", time.perf_counter() - started)
+            thread.setPriority(priority)
+
+
+_last_garbage_collect = None
+
+
+def collect_garbage_in_background(legacy_keep=None):
+    """
+    Chạy GarbageCollectTask, tối đa một lần mỗi IMAGE_STORE_GC_INTERVAL giây trong process
+
+    Args:
+        legacy_keep (iterable): Có thì chạy ngay (bỏ qua throttle) và xóa cả ảnh kiểu cũ
+            trong user_images, trừ các tên file này
+    """
+    global _last_garbage_collect
+    now = time.monotonic()
+    if legacy_keep is None and _last_garbage_collect is not None and now - _last_garbage_collect < IMAGE_STORE_GC_INTERVAL:
+        return
+    _last_garbage_collect = now
+    task = GarbageCollectTask(None if legacy_keep is None else set(legacy_keep))
+    # Priority thấp: task ingest/thumbnail đang chờ trong pool được chạy trước
+    get_ingest_pool().start(task, -1)
+
+
+_pool = None
+
+
+def get_ingest_pool():
+    """Thread pool dùng chung cho mọi ImageAttachmentWidget (tạo trên UI thread)"""
+    global _pool
+    if _pool is None:
+        _pool = QtCore.QThreadPool()
+        _pool.setMaxThreadCount(IMAGE_INGEST_WORKERS)
+    return _pool
@@ -6,6 +6,8 @@ import os
 from pathlib import Path
 from PyQt5 import QtWidgets, QtCore, QtGui
 
+from ..constants import IMAGE_VIEWER_REFINE_DELAY_MS
+
 from .styles import (
     get_image_viewer_dialog_stylesheet,
     get_image_viewer_header_stylesheet, 
@@ -24,6 +26,115 @@ from .styles import (
 )
 
 
+class ImageCanvas(QtWidgets.QWidget):
+    """
+    Vẽ ảnh ở mức zoom hiện tại, chỉ phần đang hiện trong viewport
+
+    Nguồn vẽ lấy từ resolution pyramid (mỗi mức nhỏ bằng một nửa mức trước, dựng
+    lười và cache lại): mức nhỏ nhất còn >= kích thước hiển thị. Trong lúc đang
+    zoom/kéo ảnh vẽ bằng transform nhanh; khi user dừng thì vẽ lại mượt.
+    """
+    
+    # Khoảng cách quanh ảnh (giống padding + margin của QLabel trước đây)
+    MARGIN = 30
+    
+    def __init__(self, pixmap, parent=None):
+        super().__init__(parent)
+        self._levels = [pixmap]
+        self.zoom = 1.0
+        self.smooth = True
+        self.setAttribute(QtCore.Qt.WA_OpaquePaintEvent, False)
+        
+        # Dừng zoom/kéo một lúc thì vẽ lại mượt
+        self._refine_timer = QtCore.QTimer(self)
+        self._refine_timer.setSingleShot(True)
+        self._refine_timer.setInterval(IMAGE_VIEWER_REFINE_DELAY_MS)
+        self._refine_timer.timeout.connect(self._refine)
+        self.set_zoom(1.0, interactive=False)
+    
+    def image_size(self):
+        return self._levels[0].size()
+    
+    def scaled_size(self):
+        size = self._levels[0].size()
+        return QtCore.QSize(max(1, round(size.width() * self.zoom)), max(1, round(size.height() * self.zoom)))
+    
+    def set_zoom(self, zoom, interactive=True):
+        """
+        Đổi mức zoom
+
+        Args:
+            zoom (float): Tỉ lệ so với ảnh gốc
+            interactive (bool): True khi đang zoom liên tục (vẽ nhanh, tinh chỉnh sau)
+        """
+        self.zoom = zoom
+        scaled = self.scaled_size()
+        self.setMinimumSize(scaled.width() + self.MARGIN * 2, scaled.height() + self.MARGIN * 2)
+        if interactive:
+            self.begin_interaction()
+        else:
+            self.smooth = True
+        self.update()
+    
+    def begin_interaction(self):
+        """Đang zoom/kéo: vẽ nhanh và hẹn vẽ lại mượt khi dừng"""
+        self.smooth = False
+        self._refine_timer.start()
+    
+    def _refine(self):
+        self.smooth = True
+        self.update()
+    
+    def _level_for(self, zoom):
+        """Mức pyramid nhỏ nhất vẫn không nhỏ hơn kích thước hiển thị, kèm tỉ lệ của nó"""
+        level = 0
+        scale = 1.0
+        while zoom <= scale / 2:
+            source = self._level(level)
+            if source.width() < 2 or source.height() < 2:
+                break
+            level += 1
+            scale /= 2
+        return self._level(level), scale
+    
+    def _level(self, index):
+        while len(self._levels) <= index:
+            previous = self._levels[-1]
+            self._levels.append(previous.scaled(
+                max(1, previous.width() // 2), max(1, previous.height() // 2),
+                QtCore.Qt.IgnoreAspectRatio, QtCore.Qt.SmoothTransformation
+            ))
+        return self._levels[index]
+    
+    def image_rect(self):
+        """Vị trí ảnh trong widget (ở giữa khi ảnh nhỏ hơn viewport)"""
+        scaled = self.scaled_size()
+        x = max(self.MARGIN, (self.width() - scaled.width()) // 2)
+        y = max(self.MARGIN, (self.height() - scaled.height()) // 2)
+        return QtCore.QRect(QtCore.QPoint(x, y), scaled)
+    
+    def paintEvent(self, event):
+        target = self.image_rect()
+        # Chỉ phần ảnh nằm trong vùng cần vẽ (viewport đang hiện)
+        visible = target.intersected(event.rect())
+        if visible.isEmpty():
+            return
+        
+        source_pixmap, scale = self._level_for(self.zoom)
+        factor = scale / self.zoom  # pixel nguồn trên mỗi pixel màn hình
+        source = QtCore.QRectF(
+            (visible.x() - target.x()) * factor,
+            (visible.y() - target.y()) * factor,
+            visible.width() * factor,
+            visible.height() * factor
+        )
+        
+        painter = QtGui.QPainter(self)
+        painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform, self.smooth)
+        painter.drawPixmap(QtCore.QRectF(visible), source_pixmap, source)
+        painter.end()
+
+
 class ImageViewerDialog(QtWidgets.QDialog):
     """Ultra-modern image viewer dialog with advanced zoom controls"""
     
@@ -152,10 +263,11 @@ class ImageViewerDialog(QtWidgets.QDialog):
         self.scroll_area.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAsNeeded)
         self.scroll_area.setStyleSheet(get_image_viewer_scroll_area_stylesheet())
         
-        # Ultra-modern image display
+        # Ultra-modern image display - QLabel cho tới khi ảnh được nạp (setup_image)
         self.image_label = QtWidgets.QLabel()
         self.image_label.setAlignment(QtCore.Qt.AlignCenter)
         self.image_label.setStyleSheet(get_image_viewer_image_label_stylesheet())
+        self.canvas = None
         
         self.scroll_area.setWidget(self.image_label)
         main_layout.addWidget(self.scroll_area)
@@ -201,6 +313,15 @@ class ImageViewerDialog(QtWidgets.QDialog):
             self.fit_btn.setEnabled(False)
             self.reset_btn.setEnabled(False)
         else:
+            # Ảnh được vẽ bởi ImageCanvas (chỉ vùng đang hiện, từ resolution pyramid)
+            self.canvas = ImageCanvas(self.original_pixmap)
+            # Kích thước canvas do _layout_canvas quản lý (để scrollbar cập nhật ngay khi zoom)
+            self.scroll_area.setWidgetResizable(False)
+            self.scroll_area.setWidget(self.canvas)
+            self.scroll_area.viewport().installEventFilter(self)
+            self.image_label = None
+            self._layout_canvas()
+            
             # Add image info to footer
             self.add_image_info()
             # Fit to window initially
@@ -243,23 +364,28 @@ class ImageViewerDialog(QtWidgets.QDialog):
         self.scroll_area.enterEvent = self.enter_event
         self.scroll_area.leaveEvent = self.leave_event
         
-    def update_image(self):
-        """Update image display with current zoom"""
-        if self.original_pixmap.isNull():
+    def update_image(self, interactive=True):
+        """
+        Update image display with current zoom
+        
+        Không scale cả ảnh: canvas chỉ đổi kích thước và vẽ lại phần đang hiện,
+        giữ điểm giữa viewport ở nguyên chỗ trên ảnh.
+        """
+        if self.canvas is None:
             return
-            
-        # Calculate new size
-        new_size = self.original_pixmap.size() * self.current_zoom
-        
-        # Scale image with high quality
-        scaled_pixmap = self.original_pixmap.scaled(
-            new_size,
-            QtCore.Qt.KeepAspectRatio,
-            QtCore.Qt.SmoothTransformation
-        )
         
-        self.image_label.setPixmap(scaled_pixmap)
-        self.image_label.resize(scaled_pixmap.size())
+        h_scroll = self.scroll_area.horizontalScrollBar()
+        v_scroll = self.scroll_area.verticalScrollBar()
+        viewport = self.scroll_area.viewport()
+        old_rect = self.canvas.image_rect()
+        center_x = (h_scroll.value() + viewport.width() / 2 - old_rect.x()) / max(1, old_rect.width())
+        center_y = (v_scroll.value() + viewport.height() / 2 - old_rect.y()) / max(1, old_rect.height())
+        
+        self.canvas.set_zoom(self.current_zoom, interactive)
+        self._layout_canvas()
+        new_rect = self.canvas.image_rect()
+        h_scroll.setValue(round(new_rect.x() + center_x * new_rect.width() - viewport.width() / 2))
+        v_scroll.setValue(round(new_rect.y() + center_y * new_rect.height() - viewport.height() / 2))
         
         # Update zoom label
         self.zoom_label.setText(f"{int(self.current_zoom * 100)}%")
@@ -268,6 +394,17 @@ class ImageViewerDialog(QtWidgets.QDialog):
         self.zoom_out_btn.setEnabled(self.current_zoom > 0.1)  # Min 10%
         self.zoom_in_btn.setEnabled(self.current_zoom < 20.0)   # Max 2000%
     
+    def _layout_canvas(self):
+        """Canvas phủ kín viewport, lớn hơn khi ảnh đã zoom vượt viewport"""
+        viewport = self.scroll_area.viewport().size()
+        needed = self.canvas.minimumSize()
+        self.canvas.resize(max(viewport.width(), needed.width()), max(viewport.height(), needed.height()))
+    
+    def eventFilter(self, obj, event):
+        if self.canvas is not None and event.type() == QtCore.QEvent.Resize and obj is self.scroll_area.viewport():
+            self._layout_canvas()
+        return super().eventFilter(obj, event)
+    
     def zoom_in(self):
         """Zoom in with smooth, gentle increments"""
         if self.current_zoom < 20.0:
@@ -282,7 +419,7 @@ class ImageViewerDialog(QtWidgets.QDialog):
     
     def fit_to_window(self):
         """Fit image to window size"""
-        if self.original_pixmap.isNull():
+        if self.canvas is None:
             return
             
         # Get available space (scroll area size minus margins)
@@ -293,12 +430,12 @@ class ImageViewerDialog(QtWidgets.QDialog):
         scale_y = available_size.height() / self.original_pixmap.height()
         self.current_zoom = min(scale_x, scale_y, 1.0)  # Don't enlarge beyond 100%
         
-        self.update_image()
+        self.update_image(interactive=False)
     
     def reset_zoom(self):
         """Reset to 100% zoom"""
         self.current_zoom = 1.0
-        self.update_image()
+        self.update_image(interactive=False)
     
     def wheel_event(self, event):
         """Handle wheel events for zoom with Ctrl"""
@@ -335,6 +472,8 @@ class ImageViewerDialog(QtWidgets.QDialog):
             h_scroll = self.scroll_area.horizontalScrollBar()
             v_scroll = self.scroll_area.verticalScrollBar()
             
+            if self.canvas is not None:
+                self.canvas.begin_interaction()
             h_scroll.setValue(h_scroll.value() - delta.x())
             v_scroll.setValue(v_scroll.value() - delta.y())
             
@@ -0,0 +1,170 @@
+# Multi-session window for AI Interaction Tool
+# Hiển thị mọi interaction đang chờ thành các tab trong một cửa sổ duy nhất
+
+from PyQt5 import QtWidgets, QtCore
+
+from ..constants import SESSION_TAB_TITLE_LENGTH, SESSION_STATUS_REFRESH_MS
+from ..core.config import get_config_manager
+from ..core.scheduler import preview_prompt
+from ..utils.translations import get_translation
+from .styles import get_session_window_stylesheet
+
+
+class InteractionSessionWindow(QtWidgets.QWidget):
+    """
+    Cửa sổ chứa các InputDialog đang chờ trả lời, mỗi request một tab
+
+    Khi chỉ có một request, thanh tab và dòng trạng thái được ẩn nên cửa sổ
+    trông giống hệt dialog đơn lẻ trước đây.
+    """
+
+    configChanged = QtCore.pyqtSignal(str, object)
+
+    def __init__(self, scheduler):
+        super().__init__()
+        self.scheduler = scheduler
+        self.config_manager = get_config_manager()
+        self.current_language = self.config_manager.get_language()
+        self.configChanged.connect(self._on_config_changed)
+        self.config_manager.subscribe(self._forward_config_change)
+
+        # request_id -> InputDialog
+        self.sessions = {}
+
+        self.setWindowTitle(get_translation(self.current_language, "window_title"))
+        self.setStyleSheet(get_session_window_stylesheet())
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.setSpacing(0)
+
+        self.status_label = QtWidgets.QLabel()
+        self.status_label.setObjectName("sessionStatusLabel")
+        self.status_label.setVisible(False)
+        layout.addWidget(self.status_label)
+
+        self.tabs = QtWidgets.QTabWidget()
+        self.tabs.setDocumentMode(True)
+        self.tabs.setTabBarAutoHide(True)
+        self.tabs.setMovable(True)
+        layout.addWidget(self.tabs)
+
+        # Cập nhật thời gian chờ định kỳ, chỉ chạy khi có nhiều hơn một request
+        self.refresh_timer = QtCore.QTimer(self)
+        self.refresh_timer.setInterval(SESSION_STATUS_REFRESH_MS)
+        self.refresh_timer.timeout.connect(self.refresh_status)
+
+    def add_session(self, request_id, dialog):
+        """
+        Nhúng dialog của một request vào tab mới
+
+        Args:
+            request_id: Id của request trong scheduler
+            dialog (InputDialog): Dialog đã dựng sẵn cho request này
+        """
+        first_session = not self.sessions
+        entry = self.scheduler.get(request_id) or {}
+
+        dialog.setWindowFlags(QtCore.Qt.Widget)
+        index = self.tabs.addTab(dialog, self._tab_title(entry))
+        self.tabs.setTabToolTip(index, preview_prompt(entry.get("prompt")))
+        self.sessions[request_id] = dialog
+
+        if first_session:
+            # Cửa sổ dùng kích thước đã lưu của dialog
+            width, height = self.config_manager.get_window_size()
+            self.resize(width, height)
+            self.tabs.setCurrentIndex(index)
+            self.show()
+            self.raise_()
+            self.activateWindow()
+        else:
+            # Không chuyển tab khi user đang gõ dở ở tab khác, chỉ báo hiệu trên taskbar
+            QtWidgets.QApplication.alert(self)
+
+        self.refresh_status()
+
+    def remove_session(self, request_id):
+        """Bỏ tab của request đã trả lời; ẩn cửa sổ khi không còn request nào"""
+        dialog = self.sessions.pop(request_id, None)
+        if dialog is None:
+            return
+
+        index = self.tabs.indexOf(dialog)
+        if index >= 0:
+            self.tabs.removeTab(index)
+
+        if not self.sessions:
+            self.hide()
+        self.refresh_status()
+
+    def refresh_status(self):
+        """Cập nhật số request đang chờ và thời gian chờ lâu nhất"""
+        count = len(self.sessions)
+        multi = count > 1
+        self.status_label.setVisible(multi)
+
+        if not multi:
+            self.refresh_timer.stop()
+            return
+        if not self.refresh_timer.isActive():
+            self.refresh_timer.start()
+
+        waits = {request_id: self.scheduler.wait_time(request_id) or 0.0 for request_id in self.sessions}
+        self.status_label.setText(
+            get_translation(self.current_language, "session_queue_status").format(
+                count=count, wait=format_wait(max(waits.values()))
+            )
+        )
+
+        for request_id, dialog in self.sessions.items():
+            index = self.tabs.indexOf(dialog)
+            entry = self.scheduler.get(request_id) or {}
+            tooltip = preview_prompt(entry.get("prompt"))
+            self.tabs.setTabToolTip(index, f"{tooltip}\n⏳ {format_wait(waits[request_id])}".strip())
+
+    def _forward_config_change(self, key, value):
+        self.configChanged.emit(key, value)
+
+    def _on_config_changed(self, key, value):
+        """Đổi ngôn ngữ ở một tab thì tiêu đề cửa sổ, tên tab và dòng trạng thái đổi theo"""
+        if key != 'language' or value == self.current_language:
+            return
+        self.current_language = value
+        self.setWindowTitle(get_translation(self.current_language, "window_title"))
+        for request_id, dialog in self.sessions.items():
+            index = self.tabs.indexOf(dialog)
+            self.tabs.setTabText(index, self._tab_title(self.scheduler.get(request_id) or {}))
+        self.refresh_status()
+
+    def _tab_title(self, entry):
+        """Tiêu đề tab: số thứ tự request và đoạn đầu của prompt"""
+        title = get_translation(self.current_language, "session_tab_title").format(number=entry.get("number", "?"))
+        prompt = preview_prompt(entry.get("prompt"), SESSION_TAB_TITLE_LENGTH)
+        return f"{title} · {prompt}" if prompt else title
+
+    def closeEvent(self, event):
+        """Đóng cửa sổ = đóng tất cả request đang chờ như khi user bấm Đóng từng dialog"""
+        for dialog in list(self.sessions.values()):
+            dialog.dismiss()
+        super().closeEvent(event)
+
+
+def format_wait(seconds):
+    """
+    Định dạng thời gian chờ ngắn gọn
+
+    Args:
+        seconds (float): Số giây
+
+    Returns:
+        str: Ví dụ "45s", "2m 05s", "1h 03m"
+    """
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m {seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m"
@@ -1247,6 +1247,20 @@ def get_image_remove_button_stylesheet():
     }
     """
 
+def get_image_progress_bar_stylesheet():
+    """Get stylesheet for the progress bar on images still being added"""
+    return """
+    QProgressBar {
+        background-color: #3a3a3a;
+        border: none;
+        border-radius: 3px;
+    }
+    QProgressBar::chunk {
+        background-color: #0078d4;
+        border-radius: 3px;
+    }
+    """
+
 def apply_semantic_button_color(button, button_type):
     """
     Apply semantic color to a QPushButton
@@ -1573,4 +1587,44 @@ def get_main_input_textedit_stylesheet():
         background-color: #2d3440;
         box-shadow: 0 0 10px rgba(74, 158, 255, 0.3);
     }
-    """ 
\ No newline at end of file
+    """ 
+def get_session_window_stylesheet():
+    """Stylesheet for the multi-session window (tabs of pending interactions)"""
+    return f"""
+    InteractionSessionWindow {{
+        background-color: {ModernTheme.COLORS['background'].name()};
+    }}
+    
+    QLabel#sessionStatusLabel {{
+        color: {ModernTheme.COLORS['text_secondary'].name()};
+        font-family: {ModernTheme.FONTS['family']};
+        font-size: {ModernTheme.FONTS['small_size']}px;
+        padding: {ModernTheme.SPACING['small']}px {ModernTheme.SPACING['large']}px;
+        background: transparent;
+    }}
+    
+    QTabWidget::pane {{
+        border: none;
+    }}
+    
+    QTabBar::tab {{
+        background-color: {ModernTheme.COLORS['surface0'].name()};
+        color: {ModernTheme.COLORS['text_secondary'].name()};
+        font-family: {ModernTheme.FONTS['family']};
+        font-size: {ModernTheme.FONTS['default_size']}px;
+        padding: {ModernTheme.SPACING['medium']}px {ModernTheme.SPACING['xlarge']}px;
+        border-top-left-radius: {ModernTheme.SPACING['border_radius']}px;
+        border-top-right-radius: {ModernTheme.SPACING['border_radius']}px;
+        margin-right: 2px;
+    }}
+    
+    QTabBar::tab:selected {{
+        background-color: {ModernTheme.COLORS['surface1'].name()};
+        color: {ModernTheme.COLORS['text'].name()};
+        border-bottom: 2px solid {ModernTheme.COLORS['accent_blue'].name()};
+    }}
+    
+    QTabBar::tab:hover:!selected {{
+        color: {ModernTheme.COLORS['text'].name()};
+    }}
+    """
@@ -0,0 +1,156 @@
+# On-disk thumbnail cache cho preview ảnh
+# Thumbnail được decode ở kích thước nhỏ (QImageReader.setScaledSize) và lưu thành
+# PNG nhỏ theo SHA-256 của ảnh + kích thước:
+#   user_images/thumbnails/<2 ký tự đầu>/<sha256>-<w>x<h>.png
+# Mở lại dialog có nhiều ảnh đã lưu chỉ đọc các file thumbnail vài KB thay vì
+# decode lại từng ảnh gốc. Mọi hàm ở đây gọi được từ thread bất kỳ (chỉ dùng QImage).
+
+import os
+import threading
+import time
+
+from PyQt5 import QtCore, QtGui
+
+from ..constants import IMAGE_PREVIEW_SIZE, IMAGE_THUMBNAIL_DIRNAME, IMAGE_STORE_GC_GRACE
+from ..core.image_store import get_image_store
+from ..utils import metrics
+
+
+def load_preview_image(image_path, size=IMAGE_PREVIEW_SIZE):
+    """
+    Decode ảnh ở kích thước thumbnail (gọi được từ thread bất kỳ)
+
+    Reader chỉ decode ở khoảng 2x kích thước thumbnail (JPEG decode thẳng ở
+    độ phân giải thấp), rồi thu nhỏ mượt về đúng kích thước.
+
+    Args:
+        image_path (str): Đường dẫn ảnh
+        size (tuple): (width, height) tối đa
+
+    Returns:
+        QtGui.QImage: Null nếu không đọc được ảnh
+    """
+    bounds = QtCore.QSize(*size)
+    reader = QtGui.QImageReader(image_path)
+    reader.setAutoTransform(True)
+    original = reader.size()
+    if original.isValid() and (original.width() > bounds.width() * 2 or original.height() > bounds.height() * 2):
+        reader.setScaledSize(original.scaled(bounds * 2, QtCore.Qt.KeepAspectRatio))
+    image = reader.read()
+    if not image.isNull() and (image.width() > bounds.width() or image.height() > bounds.height()):
+        image = image.scaled(bounds, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+    return image
+
+
+def thumbnail_cache_dir():
+    return os.path.join(get_image_store().images_dir, IMAGE_THUMBNAIL_DIRNAME)
+
+
+def thumbnail_path(sha256, size=IMAGE_PREVIEW_SIZE):
+    width, height = size
+    return os.path.join(thumbnail_cache_dir(), sha256[:2], f"{sha256}-{width}x{height}.png")
+
+
+def get_thumbnail(image_path, sha256=None, size=IMAGE_PREVIEW_SIZE):
+    """
+    Thumbnail của ảnh, đọc từ cache hoặc decode (ở kích thước nhỏ) rồi lưu vào cache
+
+    Args:
+        image_path (str): Đường dẫn ảnh
+        sha256 (str): Hash nội dung; None thì lấy từ tên blob trong image store.
+            Ảnh không có hash (ảnh cũ ngoài store) được decode mà không cache.
+        size (tuple): (width, height) tối đa
+
+    Returns:
+        QtGui.QImage: Null nếu không đọc được ảnh
+    """
+    sha256 = sha256 or get_image_store().sha_from_path(image_path)
+    if not sha256:
+        return load_preview_image(image_path, size)
+
+    cache_path = thumbnail_path(sha256, size)
+    if os.path.exists(cache_path):
+        cached = QtGui.QImage(cache_path)
+        if not cached.isNull():
+            metrics.increment("images.thumbnail_cache_hits")
+            return cached
+
+    started = time.perf_counter()
+    image = load_preview_image(image_path, size)
+    metrics.increment("images.thumbnail_cache_misses")
+    metrics.record_timing("images.thumbnail_decode", time.perf_counter() - started)
+    if not image.isNull():
+        _write_thumbnail(image, cache_path)
+    return image
+
+
+def thumbnail_from_image(image, sha256, size=IMAGE_PREVIEW_SIZE):
+    """
+    Thumbnail của ảnh đã decode sẵn trong bộ nhớ (ảnh paste), lưu vào cache
+
+    Args:
+        image (QtGui.QImage): Ảnh gốc
+        sha256 (str): Hash nội dung của blob đã encode
+        size (tuple): (width, height) tối đa
+
+    Returns:
+        QtGui.QImage: Null nếu ảnh rỗng
+    """
+    cache_path = thumbnail_path(sha256, size)
+    if os.path.exists(cache_path):
+        cached = QtGui.QImage(cache_path)
+        if not cached.isNull():
+            metrics.increment("images.thumbnail_cache_hits")
+            return cached
+
+    bounds = QtCore.QSize(*size)
+    thumbnail = image
+    if not image.isNull() and (image.width() > bounds.width() or image.height() > bounds.height()):
+        thumbnail = image.scaled(bounds, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+    if not thumbnail.isNull():
+        _write_thumbnail(thumbnail, cache_path)
+    return thumbnail
+
+
+def _write_thumbnail(image, cache_path):
+    """Ghi qua file tạm + rename để thread/process khác không đọc phải file dở"""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        if image.save(temp_path, "PNG"):
+            os.replace(temp_path, cache_path)
+    except OSError:
+        pass
+    finally:
+        if os.path.exists(temp_path):
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+
+def prune_thumbnails(grace=IMAGE_STORE_GC_GRACE):
+    """
+    Xóa thumbnail của ảnh không còn trong image store (đã bị GC)
+
+    Returns:
+        int: Số file đã xóa
+    """
+    cache_dir = thumbnail_cache_dir()
+    if not os.path.isdir(cache_dir):
+        return 0
+    known = get_image_store().known_shas()
+    cutoff = time.time() - grace
+    removed = 0
+    for entry in os.scandir(cache_dir):
+        if not entry.is_dir():
+            continue
+        for thumbnail in os.scandir(entry.path):
+            sha256 = thumbnail.name.split('-', 1)[0]
+            try:
+                if sha256 not in known and thumbnail.stat().st_mtime < cutoff:
+                    os.remove(thumbnail.path)
+                    removed += 1
+            except OSError:
+                pass
+    return removed
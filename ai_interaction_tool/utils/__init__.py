@@ -3,13 +3,14 @@
 
 from .translations import get_translations
 from .file_utils import read_file_content, validate_file_path
-from .image_processing import process_images, validate_image_data, get_image_info
+from .image_processing import process_images, process_images_with_report, validate_image_data, get_image_info
 
 __all__ = [
     'get_translations', 
     'read_file_content', 
     'validate_file_path',
     'process_images',
+    'process_images_with_report',
     'validate_image_data', 
     'get_image_info'
 ] 
\ No newline at end of file
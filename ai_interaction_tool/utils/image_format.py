@@ -0,0 +1,144 @@
+"""
+Image format detection for AI Interaction Tool
+Detects the real format of an image from its first bytes (magic numbers)
+instead of trusting the file extension or a stored media type.
+"""
+
+import base64
+import binascii
+import struct
+from typing import Optional, Tuple
+
+from ..constants import CLIENT_IMAGE_FORMATS
+
+# Số byte đầu file đủ để nhận ra mọi định dạng bên dưới
+SNIFF_BYTES = 16
+# Số byte đầu file để đọc kích thước ảnh (JPEG: frame header nằm sau EXIF/ICC)
+SIZE_SNIFF_BYTES = 64 * 1024
+
+# Marker SOF của JPEG (trừ DHT 0xC4, JPG 0xC8, DAC 0xCC)
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+_EXTENSIONS = {
+    "png": ".png",
+    "jpeg": ".jpg",
+    "gif": ".gif",
+    "webp": ".webp",
+    "bmp": ".bmp",
+    "tiff": ".tiff",
+    "ico": ".ico",
+}
+
+
+def sniff_image_format(header: bytes) -> Optional[str]:
+    """
+    Format of an image from its first SNIFF_BYTES bytes
+
+    Returns:
+        str: "png", "jpeg", "gif", "webp", "bmp", "tiff" or "ico"; None if unknown
+    """
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if header.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    if header.startswith(b"BM"):
+        return "bmp"
+    if header.startswith((b"II*\x00", b"MM\x00*")):
+        return "tiff"
+    if header.startswith(b"\x00\x00\x01\x00"):
+        return "ico"
+    return None
+
+
+def read_image_size(header: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Dimensions of an image from its first bytes, without decoding it
+
+    Args:
+        header: Start of the encoded image (SIZE_SNIFF_BYTES is enough for most JPEGs)
+
+    Returns:
+        tuple: (width, height), None if the format is unknown or the header is cut short
+    """
+    try:
+        image_format = sniff_image_format(header)
+        if image_format == "png":
+            return struct.unpack(">II", header[16:24])
+        if image_format == "gif":
+            return struct.unpack("<HH", header[6:10])
+        if image_format == "bmp":
+            width, height = struct.unpack("<ii", header[18:26])
+            return width, abs(height)
+        if image_format == "webp":
+            chunk = header[12:16]
+            if chunk == b"VP8 ":
+                width, height = struct.unpack("<HH", header[26:30])
+                return width & 0x3FFF, height & 0x3FFF
+            if chunk == b"VP8L":
+                bits = int.from_bytes(header[21:25], "little")
+                return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+            if chunk == b"VP8X":
+                return int.from_bytes(header[24:27], "little") + 1, int.from_bytes(header[27:30], "little") + 1
+            return None
+        if image_format == "jpeg":
+            i = 2
+            while i + 9 <= len(header):
+                if header[i] != 0xFF:
+                    i += 1
+                    continue
+                marker = header[i + 1]
+                if marker in _JPEG_SOF_MARKERS:
+                    height, width = struct.unpack(">HH", header[i + 5:i + 9])
+                    return width, height
+                if marker == 0xFF or 0xD0 <= marker <= 0xD9:
+                    # Fill byte / marker không có độ dài
+                    i += 1 if marker == 0xFF else 2
+                    continue
+                i += 2 + struct.unpack(">H", header[i + 2:i + 4])[0]
+    except struct.error:
+        pass
+    return None
+
+
+def sniff_file(path: str) -> Optional[str]:
+    """Format of an image file, None if unknown or unreadable"""
+    try:
+        with open(path, 'rb') as f:
+            return sniff_image_format(f.read(SNIFF_BYTES))
+    except OSError:
+        return None
+
+
+def read_file_header(path: str, size: int = SIZE_SNIFF_BYTES) -> bytes:
+    """First bytes of a file for sniff_image_format/read_image_size, b"" if unreadable"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(size)
+    except OSError:
+        return b""
+
+
+def sniff_base64(data: str) -> Optional[str]:
+    """Format of base64 image data, decoding only its first bytes"""
+    # 24 ký tự base64 = 18 byte
+    try:
+        return sniff_image_format(base64.b64decode(data[:24]))
+    except (binascii.Error, ValueError):
+        return None
+
+
+def is_client_format(image_format: Optional[str]) -> bool:
+    """True when MCP clients can decode this format as it is"""
+    return image_format in CLIENT_IMAGE_FORMATS
+
+
+def media_type_for(image_format: str) -> str:
+    return f"image/{image_format}"
+
+
+def extension_for(image_format: str) -> str:
+    return _EXTENSIONS.get(image_format, f".{image_format}")
@@ -0,0 +1,425 @@
+"""
+Adaptive image downscaling and recompression for AI Interaction Tool
+Shrinks images to the size the model actually looks at and re-encodes them
+(PNG or JPEG, whichever is smaller) before they are sent over stdio, and keeps
+all images of one response within a total byte/token budget.
+Needs Pillow - without it images are sent unchanged (over budget: dropped).
+"""
+
+import base64
+import io
+import math
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..constants import (
+    IMAGE_OPTIMIZE_ENABLED, IMAGE_MAX_DIMENSION_ENV_VAR, IMAGE_MAX_BYTES_ENV_VAR,
+    DEFAULT_IMAGE_MAX_DIMENSION, DEFAULT_IMAGE_MAX_BYTES, IMAGE_JPEG_QUALITY, IMAGE_MIN_JPEG_QUALITY,
+    IMAGE_BUDGET_BYTES_ENV_VAR, IMAGE_BUDGET_TOKENS_ENV_VAR, DEFAULT_IMAGE_BUDGET_BYTES,
+    DEFAULT_IMAGE_BUDGET_TOKENS, IMAGE_TOKEN_PIXELS, IMAGE_BUDGET_MIN_DIMENSION
+)
+from . import metrics
+from .image_format import read_image_size
+
+# Số lần thu nhỏ thêm 25% khi giảm chất lượng JPEG vẫn chưa đủ nhỏ
+_MAX_SHRINK_STEPS = 4
+
+# Pillow được import ở lần dùng đầu tiên, không làm chậm lúc khởi động MCP server
+PILImage = None
+ImageOps = None
+_pillow_checked = False
+
+# EXIF Orientation: 5-8 là ảnh xoay 90°, chiều rộng/cao hiển thị bị đổi chỗ
+_EXIF_ORIENTATION = 0x0112
+
+
+def _read_limit(env_var: str, default: int) -> int:
+    value = os.environ.get(env_var)
+    if not value:
+        return default
+    try:
+        return max(0, int(value))
+    except ValueError:
+        print(f"[ImageOptimizer] Invalid {env_var}={value!r}, using {default}", file=sys.stderr)
+        return default
+
+
+def get_image_limits() -> Tuple[int, int]:
+    """
+    Current limits, from the environment or the defaults in constants.py
+
+    Returns:
+        tuple: (max_dimension in px, max_bytes per image), 0 means unlimited
+    """
+    return (
+        _read_limit(IMAGE_MAX_DIMENSION_ENV_VAR, DEFAULT_IMAGE_MAX_DIMENSION),
+        _read_limit(IMAGE_MAX_BYTES_ENV_VAR, DEFAULT_IMAGE_MAX_BYTES)
+    )
+
+
+def get_image_budget() -> Tuple[int, int]:
+    """
+    Budget for all images of one response, from the environment or constants.py
+
+    Returns:
+        tuple: (max_bytes before base64, max estimated image tokens), 0 means unlimited
+    """
+    return (
+        _read_limit(IMAGE_BUDGET_BYTES_ENV_VAR, DEFAULT_IMAGE_BUDGET_BYTES),
+        _read_limit(IMAGE_BUDGET_TOKENS_ENV_VAR, DEFAULT_IMAGE_BUDGET_TOKENS)
+    )
+
+
+def estimate_image_tokens(size: Optional[Tuple[int, int]]) -> int:
+    """Image tokens the model spends on an image of this size (0 when the size is unknown)"""
+    if not size:
+        return 0
+    width, height = size
+    scale = min(1.0, DEFAULT_IMAGE_MAX_DIMENSION / max(width, height, 1))
+    return math.ceil(width * height * scale * scale / IMAGE_TOKEN_PIXELS)
+
+
+def _pillow_available() -> bool:
+    global PILImage, ImageOps, _pillow_checked
+    if not _pillow_checked:
+        _pillow_checked = True
+        try:
+            from PIL import Image as PILImage, ImageOps
+        except ImportError:
+            print("[ImageOptimizer] Pillow is not installed, images are sent unchanged", file=sys.stderr)
+    return PILImage is not None
+
+
+def is_optimizer_available() -> bool:
+    """True when optimization is enabled, Pillow is installed and a limit is set"""
+    if not IMAGE_OPTIMIZE_ENABLED or not _pillow_available():
+        return False
+    return any(get_image_limits())
+
+
+def transcode_image(source, original_bytes: int, filename: str = "image") -> Optional[bytes]:
+    """
+    Re-encode an image the client cannot decode (BMP, TIFF...) as PNG
+
+    Images attached in the dialog are converted when they are added; this covers
+    entries saved before that and images from other responders.
+
+    Args:
+        source: Path or binary file object of the encoded image
+        original_bytes: Size of the encoded image
+        filename: Name used in the log
+
+    Returns:
+        bytes: PNG data, None without Pillow or when the image cannot be read
+    """
+    if not _pillow_available():
+        return None
+    started = time.perf_counter()
+    try:
+        with PILImage.open(source) as image:
+            data = _encode(_normalize_mode(ImageOps.exif_transpose(image)), "png")
+    except Exception as e:
+        print(f"[ImageOptimizer] Could not convert {filename}: {str(e)}", file=sys.stderr)
+        return None
+    metrics.increment("images.transcoded")
+    metrics.increment("images.transcode_bytes_saved", max(0, original_bytes - len(data)))
+    metrics.record_timing("images.transcode", time.perf_counter() - started)
+    print(f"[ImageOptimizer] {filename}: {original_bytes / 1024:.0f} KB -> PNG {len(data) / 1024:.0f} KB", file=sys.stderr)
+    return data
+
+
+def optimize_image(source, original_bytes: int, filename: str = "image") -> Tuple[Optional[bytes], Optional[str], Optional[Dict[str, Any]]]:
+    """
+    Downscale and recompress an image that exceeds the configured limits
+
+    Args:
+        source: Path or binary file object of the encoded image
+        original_bytes: Size of the encoded image
+        filename: Name used in the report
+
+    Returns:
+        tuple: (data, media_type, report). data is None when the original
+        should be sent as it is (within limits, animated, or not smaller).
+        report: filename, original_bytes, bytes, original_size, size, format
+    """
+    if not is_optimizer_available():
+        return None, None, None
+    max_dimension, max_bytes = get_image_limits()
+
+    started = time.perf_counter()
+    try:
+        with PILImage.open(source) as image:
+            original_size = _oriented_size(image)
+            too_large = bool(max_dimension) and max(image.size) > max_dimension
+            too_heavy = bool(max_bytes) and original_bytes > max_bytes
+            if not (too_large or too_heavy):
+                return None, None, None
+            if getattr(image, "is_animated", False):
+                # Thu nhỏ GIF/WebP động sẽ làm mất animation - gửi nguyên bản
+                return None, None, None
+
+            if too_large and image.format == "JPEG":
+                # Decode JPEG thẳng ở độ phân giải nhỏ hơn (nhanh hơn nhiều)
+                image.draft("RGB", (max_dimension, max_dimension))
+            # Ảnh chụp từ điện thoại: xoay theo EXIF trước khi encode lại (bản mới không còn EXIF)
+            working = _normalize_mode(ImageOps.exif_transpose(image))
+            if too_large:
+                working.thumbnail((max_dimension, max_dimension), PILImage.LANCZOS)
+            data, image_format, size = _encode_within(working, max_bytes)
+    except Exception as e:
+        print(f"[ImageOptimizer] Could not optimize {filename}: {str(e)}", file=sys.stderr)
+        return None, None, None
+
+    if not too_large and len(data) >= original_bytes:
+        # Nén lại không nhỏ hơn bản gốc
+        return None, None, None
+
+    report = {
+        "filename": filename,
+        "original_bytes": original_bytes,
+        "bytes": len(data),
+        "original_size": original_size,
+        "size": size,
+        "format": image_format
+    }
+    metrics.increment("images.optimized")
+    metrics.increment("images.bytes_saved", max(0, original_bytes - len(data)))
+    metrics.record_timing("images.optimize", time.perf_counter() - started)
+    print(
+        f"[ImageOptimizer] {filename}: {original_size[0]}x{original_size[1]} {original_bytes / 1024:.0f} KB"
+        f" -> {size[0]}x{size[1]} {image_format.upper()} {len(data) / 1024:.0f} KB",
+        file=sys.stderr
+    )
+    return data, f"image/{image_format}", report
+
+
+def _oriented_size(image) -> Tuple[int, int]:
+    """Size of the image as displayed, after its EXIF orientation"""
+    width, height = image.size
+    if image.format == "PNG" and "exif" not in image.info:
+        # getexif() của PNG decode cả ảnh để tìm chunk eXIf sau dữ liệu ảnh
+        return width, height
+    if image.getexif().get(_EXIF_ORIENTATION) in (5, 6, 7, 8):
+        return height, width
+    return width, height
+
+
+def _normalize_mode(image):
+    """Copy of the image in RGB, or RGBA when it really uses transparency"""
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+    if has_alpha:
+        rgba = image.convert("RGBA")
+        # Kênh alpha toàn 255 thì bỏ để còn chọn được JPEG
+        if rgba.getchannel("A").getextrema()[0] < 255:
+            return rgba
+        return rgba.convert("RGB")
+    return image.convert("RGB")
+
+
+def _encode(image, image_format: str, quality: int = IMAGE_JPEG_QUALITY) -> bytes:
+    buffer = io.BytesIO()
+    if image_format == "jpeg":
+        image.save(buffer, "JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(buffer, "PNG", optimize=False, compress_level=6)
+    return buffer.getvalue()
+
+
+def _encode_within(image, max_bytes: int):
+    """
+    Encode as the smaller of PNG/JPEG, lowering JPEG quality and then the
+    dimensions until the result fits max_bytes
+
+    Returns:
+        tuple: (data, format, (width, height))
+    """
+    for step in range(_MAX_SHRINK_STEPS + 1):
+        # Screenshot nhiều chữ thường nhỏ hơn ở PNG, ảnh chụp thì JPEG
+        candidates = [(_encode(image, "png"), "png")]
+        if image.mode == "RGB":
+            candidates.append((_encode(image, "jpeg"), "jpeg"))
+        data, image_format = min(candidates, key=lambda candidate: len(candidate[0]))
+        if not max_bytes or len(data) <= max_bytes:
+            return data, image_format, image.size
+
+        if image.mode == "RGB":
+            for quality in range(IMAGE_JPEG_QUALITY - 10, IMAGE_MIN_JPEG_QUALITY - 1, -10):
+                data, image_format = _encode(image, "jpeg", quality), "jpeg"
+                if len(data) <= max_bytes:
+                    return data, image_format, image.size
+
+        if step < _MAX_SHRINK_STEPS:
+            width, height = image.size
+            image = image.resize((max(1, width * 3 // 4), max(1, height * 3 // 4)), PILImage.LANCZOS)
+
+    # Vẫn vượt max_bytes sau khi đã thu nhỏ nhiều lần - gửi bản nhỏ nhất có được
+    return data, image_format, image.size
+
+
+def apply_image_budget(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Keep all images of one response within get_image_budget()
+
+    Over budget, every image is downscaled and re-encoded (JPEG at falling
+    quality, PNG when it has transparency) one step at a time, never below
+    IMAGE_BUDGET_MIN_DIMENSION on the long edge. Images are decoded one at a
+    time from the original, at reduced size where the format allows it;
+    animated images are left as they are. Only when that is not enough are
+    the lowest-priority images - the ones attached last - dropped; the first
+    image is always kept.
+
+    Args:
+        items: Images in priority order, each with filename, bytes, size (or None),
+            mime and its content as path, raw (bytes) or b64; original_size/original_bytes
+            and original_path/original_b64 when already optimized. Changed in place:
+            degraded images get raw/mime/size/bytes, dropped ones are removed.
+
+    Returns:
+        list: One report per changed image: filename, action ("resized"/"dropped"),
+        original_size, original_bytes, and for resized images size, bytes, format
+    """
+    max_bytes, max_tokens = get_image_budget()
+
+    def over_budget():
+        return (
+            (max_bytes and sum(item["bytes"] for item in items) > max_bytes)
+            or (max_tokens and sum(estimate_image_tokens(item["size"]) for item in items) > max_tokens)
+        )
+
+    if not items or not over_budget():
+        return []
+    started = time.perf_counter()
+    originals = {
+        id(item): (item.get("original_size", item["size"]), item.get("original_bytes", item["bytes"]))
+        for item in items
+    }
+    report = []
+
+    if _pillow_available():
+        _degrade_images(items, max_bytes, max_tokens, over_budget)
+
+    dropped = []
+    while over_budget() and len(items) > 1:
+        dropped.insert(0, items.pop())
+
+    for item in items:
+        if item.get("degraded"):
+            original_size, original_bytes = originals[id(item)]
+            report.append({
+                "filename": item["filename"],
+                "action": "resized",
+                "original_size": original_size,
+                "original_bytes": original_bytes,
+                "size": item["size"],
+                "bytes": item["bytes"],
+                "format": item["mime"].split("/")[-1]
+            })
+    for item in dropped:
+        original_size, original_bytes = originals[id(item)]
+        report.append({
+            "filename": item["filename"],
+            "action": "dropped",
+            "original_size": original_size,
+            "original_bytes": original_bytes
+        })
+
+    resized = len(report) - len(dropped)
+    metrics.increment("images.budget_exceeded")
+    metrics.increment("images.budget_resized", resized)
+    metrics.increment("images.budget_dropped", len(dropped))
+    metrics.record_timing("images.budget", time.perf_counter() - started)
+    print(
+        f"[ImageOptimizer] Image budget exceeded: resized {resized}, dropped {len(dropped)};"
+        f" now {sum(item['bytes'] for item in items) / 1024:.0f} KB,"
+        f" ~{sum(estimate_image_tokens(item['size']) for item in items)} tokens",
+        file=sys.stderr
+    )
+    return report
+
+
+def _budget_source(item):
+    """Encoded original of an item: path or bytes (the optimizer output only when there is no original)"""
+    if item.get("original_path") or item.get("path"):
+        return item.get("original_path") or item["path"]
+    if item.get("original_b64") or item.get("b64"):
+        return base64.b64decode(item.get("original_b64") or item["b64"])
+    return item["raw"]
+
+
+def _open_source(source):
+    return PILImage.open(source if isinstance(source, str) else io.BytesIO(source))
+
+
+def _decode_scaled(source, target: int):
+    """
+    Decode an image with its long edge at most target px, upright (EXIF)
+
+    JPEG is decoded straight at reduced resolution (draft), other formats are
+    reduced by an integer factor before the final resampling.
+    """
+    with _open_source(source) as image:
+        image.thumbnail((target, target), PILImage.LANCZOS, reducing_gap=2.0)
+        return _normalize_mode(ImageOps.exif_transpose(image))
+
+
+def _degrade_images(items, max_bytes, max_tokens, over_budget):
+    """Downscale/re-encode the images step by step until they fit or reach the minimum size"""
+    # Chỉ đọc header: cạnh dài hiển thị của từng ảnh, 0 = bỏ qua (ảnh động, không đọc được)
+    sources = [_budget_source(item) for item in items]
+    bases = []
+    for item, source in zip(items, sources):
+        try:
+            with _open_source(source) as image:
+                if getattr(image, "is_animated", False):
+                    # Thu nhỏ GIF/WebP động sẽ làm mất animation - giữ nguyên hoặc bỏ cả ảnh
+                    long_edge = 0
+                else:
+                    long_edge = max(_oriented_size(image))
+        except Exception as e:
+            print(f"[ImageOptimizer] Could not read {item['filename']}: {str(e)}", file=sys.stderr)
+            long_edge = 0
+        # Cạnh dài lớn hơn DEFAULT_IMAGE_MAX_DIMENSION không tốn thêm token - bắt đầu từ mức model thực sự dùng
+        bases.append(min(long_edge, DEFAULT_IMAGE_MAX_DIMENSION))
+
+    # Bước đầu ước lượng theo tỷ lệ token/byte đang vượt (cả hai tỷ lệ thuận với số pixel)
+    scale = 1.0
+    total_tokens = sum(estimate_image_tokens(item["size"]) for item in items)
+    total_bytes = sum(item["bytes"] for item in items)
+    if max_tokens and total_tokens > max_tokens:
+        scale = min(scale, math.sqrt(max_tokens / total_tokens))
+    if max_bytes and total_bytes > max_bytes:
+        scale = min(scale, math.sqrt(max_bytes / total_bytes))
+    quality = IMAGE_JPEG_QUALITY
+
+    while True:
+        at_minimum = True
+        for item, source, base in zip(items, sources, bases):
+            if not base:
+                continue
+            target = max(min(base, IMAGE_BUDGET_MIN_DIMENSION), int(base * scale))
+            if target > IMAGE_BUDGET_MIN_DIMENSION:
+                at_minimum = False
+            # Mỗi lần một ảnh: decode, encode rồi bỏ, không giữ ảnh đã decode giữa các bước
+            try:
+                resized = _decode_scaled(source, target)
+            except Exception as e:
+                print(f"[ImageOptimizer] Could not read {item['filename']}: {str(e)}", file=sys.stderr)
+                continue
+            image_format = "jpeg" if resized.mode == "RGB" else "png"
+            data = _encode(resized, image_format, quality)
+            smaller = item["size"] is None or max(resized.size) < max(item["size"])
+            if smaller or len(data) < item["bytes"]:
+                item.update(raw=data, mime=f"image/{image_format}", size=resized.size, bytes=len(data), degraded=True)
+                item.pop("path", None)
+                item.pop("b64", None)
+            resized.close()
+        if not over_budget() or at_minimum:
+            return
+        # Chỉ vượt byte: giảm chất lượng JPEG trước, rồi mới thu nhỏ tiếp
+        over_tokens = max_tokens and sum(estimate_image_tokens(item["size"]) for item in items) > max_tokens
+        if not over_tokens and quality - 10 >= IMAGE_MIN_JPEG_QUALITY:
+            quality -= 10
+        else:
+            scale *= 0.75
@@ -1,63 +1,192 @@
 """
 Image processing utilities for AI Interaction Tool
-Handles conversion of base64 image data to MCP Image objects
+Handles conversion of attached images (file references or base64 data) to MCP image content
 """
 
-from mcp.server.fastmcp.utilities.types import Image as MCPImage
+from mcp.types import ImageContent
 import base64
+import io
+import mimetypes
+import mmap
+import os
 import sys
-from typing import List, Dict, Any
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
+from . import metrics
+from .image_format import (
+    SIZE_SNIFF_BYTES, sniff_file, sniff_base64, sniff_image_format, is_client_format, media_type_for,
+    read_file_header, read_image_size
+)
+from .image_optimizer import is_optimizer_available, optimize_image, transcode_image, apply_image_budget
 
-def process_images(images_data: List[dict]) -> List[MCPImage]:
+
+def _image_format(media_type: str, filename: str) -> str:
+    """
+    Map media type / filename to the format name used in the image MIME type
+    (fallback when the image header is not recognized)
+    """
+    if "jpeg" in media_type or "jpg" in media_type or filename.lower().endswith(('.jpg', '.jpeg')):
+        return 'jpeg'
+    if "gif" in media_type or filename.lower().endswith('.gif'):
+        return 'gif'
+    if "webp" in media_type or filename.lower().endswith('.webp'):
+        return 'webp'
+    return 'png'  # Default to PNG
+
+
+def encode_image_file(image_path: str) -> str:
+    """
+    Base64-encode an image file straight from a read-only mmap of the file,
+    without an intermediate bytes copy of its content
+    
+    Args:
+        image_path: Path of the image file
+        
+    Returns:
+        str: Base64 text, "" for an empty file
+    """
+    with open(image_path, 'rb') as img_file:
+        if os.fstat(img_file.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(img_file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            metrics.increment("images.bytes_read", len(buffer))
+            return base64.b64encode(buffer).decode('ascii')
+
+
+def process_images(images_data: List[dict]) -> List[ImageContent]:
+    """
+    Process image data and convert to MCP image content
+    
+    Args:
+        images_data: List of image dictionaries, either file references
+            (path, media_type, filename) or inline base64_data
+        
+    Returns:
+        List[ImageContent]: Image content blocks ready for server response
+    """
+    return process_images_with_report(images_data)[0]
+
+
+def process_images_with_report(images_data: List[dict]) -> Tuple[List[ImageContent], List[Dict[str, Any]]]:
     """
-    Process image data and convert to MCP Image objects
+    Process image data and convert to MCP image content, within the per-response image budget
     
     Args:
-        images_data: List of image dictionaries containing base64_data, media_type, filename
+        images_data: List of image dictionaries in priority order, either file
+            references (path, media_type, filename) or inline base64_data
         
     Returns:
-        List[MCPImage]: Processed MCP Image objects ready for server response
+        tuple: (image content blocks, budget report from apply_image_budget -
+        empty when all images fit)
         
     Note:
-        Uses same approach as mcp-feedback-enhanced for compatibility
+        The base64 text of the MCP response is produced here exactly once.
+        Images over the size limits are downscaled/recompressed first
+        (image_optimizer.py); the others are encoded straight from the file,
+        or inline base64_data is passed through as-is. The MIME type comes
+        from the image header; formats the client cannot decode are converted
+        to PNG when Pillow is available. Sizes are read from the image headers,
+        images are only decoded again when the total is over budget.
     """
-    mcp_images = []
+    started = time.perf_counter()
+    items = []
+    optimize = is_optimizer_available()
     
     for i, img in enumerate(images_data, 1):
         try:
-            if not img.get("base64_data"):
-                continue
-            
-            # Decode base64 to raw bytes (mcp-feedback-enhanced approach)
-            if isinstance(img["base64_data"], str):
-                image_bytes = base64.b64decode(img["base64_data"])
-            else:
-                continue
-            
-            if len(image_bytes) == 0:
-                continue
-            
-            # Determine format from media_type or filename
-            media_type = img.get("media_type", "image/png")
-            filename = img.get("filename", "image.png")
-            
-            if "jpeg" in media_type or "jpg" in media_type or filename.lower().endswith(('.jpg', '.jpeg')):
-                image_format = 'jpeg'
-            elif "gif" in media_type or filename.lower().endswith('.gif'):
-                image_format = 'gif'
+            item = _budget_item(img, optimize)
+            if item:
+                items.append(item)
+        except Exception as e:
+            print(f"Error processing image {i}: {e}", file=sys.stderr)
+            continue
+    
+    report = apply_image_budget(items)
+    
+    image_contents = []
+    for i, item in enumerate(items, 1):
+        try:
+            if "raw" in item:
+                data = base64.b64encode(item["raw"]).decode('ascii')
+            elif "b64" in item:
+                data = item["b64"]
             else:
-                image_format = 'png'  # Default to PNG
-            
-            # Create MCPImage with raw bytes (NOT base64 string!)
-            mcp_image = MCPImage(data=image_bytes, format=image_format)
-            mcp_images.append(mcp_image)
-            
+                data = encode_image_file(item["path"])
+            if data:
+                image_contents.append(ImageContent(type="image", data=data, mimeType=item["mime"]))
         except Exception as e:
             print(f"Error processing image {i}: {e}", file=sys.stderr)
             continue
     
-    return mcp_images
+    if image_contents:
+        metrics.record_timing("images.process", time.perf_counter() - started)
+    return image_contents, report
+
+
+def _budget_item(img: dict, optimize: bool) -> Optional[Dict[str, Any]]:
+    """
+    One image after per-image optimization, with its size in bytes/pixels for the budget
+    
+    Returns:
+        dict: filename, mime, bytes, size and the content as path, raw or b64;
+        None for an entry without image data
+    """
+    filename = img.get("filename", "image.png")
+    optimized, optimized_type, optimize_report = None, None, None
+    
+    if img.get("path"):
+        # Một lần đọc đầu file cho cả định dạng và kích thước
+        header = read_file_header(img["path"])
+        image_format = sniff_image_format(header)
+        original_bytes = os.path.getsize(img["path"])
+        if optimize:
+            optimized, optimized_type, optimize_report = optimize_image(img["path"], original_bytes, filename)
+        if not optimized and image_format and not is_client_format(image_format):
+            optimized = transcode_image(img["path"], original_bytes, filename)
+            optimized_type = optimized and "image/png"
+        metrics.increment("images.encoded")
+        item = {"path": img["path"], "bytes": original_bytes, "size": read_image_size(header)}
+    elif isinstance(img.get("base64_data"), str) and img["base64_data"]:
+        data = img["base64_data"]
+        image_format = sniff_base64(data)
+        if optimize or (image_format and not is_client_format(image_format)):
+            raw = base64.b64decode(data)
+            if optimize:
+                optimized, optimized_type, optimize_report = optimize_image(io.BytesIO(raw), len(raw), filename)
+            if not optimized and image_format and not is_client_format(image_format):
+                optimized = transcode_image(io.BytesIO(raw), len(raw), filename)
+                optimized_type = optimized and "image/png"
+        # 4 base64 chars per 3 bytes, minus padding; kích thước từ SIZE_SNIFF_BYTES đầu tiên của ảnh
+        item = {
+            "b64": data,
+            "bytes": len(data) * 3 // 4 - data[-2:].count("="),
+            "size": read_image_size(base64.b64decode(data[:SIZE_SNIFF_BYTES * 4 // 3 // 4 * 4]))
+        }
+    else:
+        return None
+    
+    item["filename"] = filename
+    if optimized:
+        return {
+            "raw": optimized,
+            "filename": filename,
+            "bytes": len(optimized),
+            "mime": optimized_type,
+            "size": optimize_report["size"] if optimize_report else read_image_size(optimized[:SIZE_SNIFF_BYTES]),
+            # Ảnh như khi được đính kèm, cho báo cáo ngân sách; ngân sách thu nhỏ
+            # lại từ bản gốc thay vì nén lại bản đã nén
+            "original_size": optimize_report["original_size"] if optimize_report else item["size"],
+            "original_bytes": item["bytes"],
+            **({"original_path": item["path"]} if "path" in item else {"original_b64": item["b64"]})
+        }
+    
+    # Format from the image header, then media_type or filename
+    if image_format:
+        item["mime"] = media_type_for(image_format)
+    else:
+        item["mime"] = f"image/{_image_format(img.get('media_type', 'image/png'), filename)}"
+    return item
 
 
 def validate_image_data(image_data: dict) -> bool:
@@ -70,14 +199,12 @@ def validate_image_data(image_data: dict) -> bool:
     Returns:
         bool: True if valid, False otherwise
     """
-    required_fields = ["base64_data"]
-    
-    for field in required_fields:
-        if field not in image_data or not image_data[field]:
-            return False
+    # File reference: the file is read only when the response is built
+    if image_data.get("path"):
+        return os.path.isfile(image_data["path"])
     
     # Check if base64_data is valid string
-    if not isinstance(image_data["base64_data"], str):
+    if not image_data.get("base64_data") or not isinstance(image_data["base64_data"], str):
         return False
     
     try:
@@ -108,22 +235,67 @@ def get_image_info(image_data: dict) -> Dict[str, Any]:
     
     if validate_image_data(image_data):
         try:
-            image_bytes = base64.b64decode(image_data["base64_data"])
-            info["size_bytes"] = len(image_bytes)
+            if image_data.get("path"):
+                info["size_bytes"] = os.path.getsize(image_data["path"])
+            else:
+                # 4 base64 chars per 3 bytes, minus padding
+                encoded = image_data["base64_data"]
+                info["size_bytes"] = len(encoded) * 3 // 4 - encoded[-2:].count("=")
             info["is_valid"] = True
             
-            # Determine format
-            media_type = info["media_type"]
-            filename = info["filename"]
-            
-            if "jpeg" in media_type or "jpg" in media_type or filename.lower().endswith(('.jpg', '.jpeg')):
-                info["format"] = 'jpeg'
-            elif "gif" in media_type or filename.lower().endswith('.gif'):
-                info["format"] = 'gif'
+            # Determine format from the header
+            if image_data.get("path"):
+                image_format = sniff_file(image_data["path"])
             else:
-                info["format"] = 'png'
+                image_format = sniff_base64(image_data["base64_data"])
+            if image_format:
+                info["format"] = image_format
+                info["media_type"] = media_type_for(image_format)
+            else:
+                info["format"] = _image_format(info["media_type"], info["filename"])
                 
         except Exception as e:
             print(f"Error getting image info: {e}", file=sys.stderr)
     
-    return info 
\ No newline at end of file
+    return info 
+
+def image_file_reference(image_path: str, filename: str = None) -> Dict[str, Any]:
+    """
+    Attachment entry that refers to an image file instead of carrying its content
+    
+    Args:
+        image_path: Path of the image file
+        filename: Display name, defaults to the file's base name
+        
+    Returns:
+        Dict with path, media_type and filename
+    """
+    image_format = sniff_file(image_path)
+    if image_format:
+        media_type = media_type_for(image_format)
+    else:
+        media_type, _ = mimetypes.guess_type(image_path)
+    return {
+        "path": os.path.abspath(image_path),
+        "media_type": media_type or 'image/png',
+        "filename": filename or os.path.basename(image_path)
+    }
+
+
+def load_image_file(image_path: str, filename: str = None) -> Dict[str, Any]:
+    """
+    Read an image file into an inline attachment (base64_data instead of path)
+    
+    Args:
+        image_path: Path of the image file
+        filename: Display name, defaults to the file's base name
+        
+    Returns:
+        Dict with base64_data, media_type and filename
+    """
+    reference = image_file_reference(image_path, filename)
+    return {
+        "base64_data": encode_image_file(image_path),
+        "media_type": reference["media_type"],
+        "filename": reference["filename"]
+    }
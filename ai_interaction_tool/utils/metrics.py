@@ -0,0 +1,98 @@
+# Lightweight in-process metrics for AI Interaction Tool
+# Counters, gauges, timings và provider callbacks, đọc ra một snapshot dạng JSON
+
+import sys
+import threading
+
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_timings = {}
+_providers = {}
+
+
+def increment(name, value=1):
+    """
+    Tăng một counter
+
+    Args:
+        name (str): Tên metric, dạng "component.metric"
+        value (int): Giá trị cộng thêm
+    """
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name, value):
+    """Ghi giá trị hiện tại của một gauge"""
+    with _lock:
+        _gauges[name] = value
+
+
+def record_timing(name, seconds):
+    """
+    Ghi một mẫu thời gian (giây) - giữ count, total, max và last
+
+    Args:
+        name (str): Tên metric
+        seconds (float): Thời gian đo được
+    """
+    with _lock:
+        timing = _timings.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0})
+        timing["count"] += 1
+        timing["total"] += seconds
+        timing["max"] = max(timing["max"], seconds)
+        timing["last"] = seconds
+
+
+def register_provider(name, callback):
+    """
+    Đăng ký callback trả về dict, được gọi mỗi lần lấy snapshot
+    (dùng cho trạng thái sống như queue của scheduler)
+
+    Args:
+        name (str): Key của provider trong snapshot
+        callback (callable): Hàm không tham số trả về dict JSON-serializable
+    """
+    with _lock:
+        _providers[name] = callback
+
+
+def snapshot():
+    """
+    Lấy toàn bộ metrics hiện tại
+
+    Returns:
+        dict: {"counters": ..., "gauges": ..., "timings": ..., <provider>: ...}
+    """
+    with _lock:
+        result = {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "timings": {
+                name: {
+                    "count": timing["count"],
+                    "avg_ms": round(timing["total"] / timing["count"] * 1000, 2),
+                    "max_ms": round(timing["max"] * 1000, 2),
+                    "last_ms": round(timing["last"] * 1000, 2)
+                }
+                for name, timing in _timings.items()
+            }
+        }
+        providers = list(_providers.items())
+
+    # Provider có thể cần lock riêng của nó, gọi ngoài _lock để tránh deadlock
+    for name, callback in providers:
+        try:
+            result[name] = callback()
+        except Exception as e:
+            print(f"[Metrics] Provider {name} failed: {str(e)}", file=sys.stderr)
+    return result
+
+
+def reset():
+    """Xóa toàn bộ metrics (providers được giữ lại)"""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _timings.clear()
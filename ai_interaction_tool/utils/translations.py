@@ -161,9 +161,16 @@ def get_translations():
             "image_result_success": "✅ Successfully attached: {count} images",
             "image_result_duplicates": "⚠️ Skipped duplicates: {count} images (already attached)",
             "image_result_invalid": "❌ Failed to attach: {count} images (invalid format or access error)",
+            "image_ingest_processing": "Processing...",
+            "image_ingest_pasted": "Pasted image",
+            "image_ingest_cancel_tooltip": "Cancel adding this image",
             
             # Prompt section translations
-            "prompt_section_title": "📋 Question/Summary"
+            "prompt_section_title": "📋 Question/Summary",
+            
+            # Multi-session window translations
+            "session_tab_title": "Request #{number}",
+            "session_queue_status": "⏳ {count} pending requests • Longest wait: {wait}"
         },
         "vi": {
             "window_title": "Công Cụ Tương Tác AI",
@@ -321,9 +328,16 @@ def get_translations():
             "image_result_success": "✅ Đính kèm thành công: {count} ảnh",
             "image_result_duplicates": "⚠️ Bỏ qua trùng lặp: {count} ảnh (đã có sẵn)",
             "image_result_invalid": "❌ Không thể đính kèm: {count} ảnh (định dạng không hợp lệ hoặc lỗi truy cập)",
+            "image_ingest_processing": "Đang xử lý...",
+            "image_ingest_pasted": "Ảnh đã dán",
+            "image_ingest_cancel_tooltip": "Hủy thêm ảnh này",
             
             # Prompt section translations
-            "prompt_section_title": "📋 Câu Hỏi/Tóm Tắt"
+            "prompt_section_title": "📋 Câu Hỏi/Tóm Tắt",
+            
+            # Multi-session window translations
+            "session_tab_title": "Yêu cầu #{number}",
+            "session_queue_status": "⏳ {count} yêu cầu đang chờ • Chờ lâu nhất: {wait}"
         }
     }
 
@@ -0,0 +1,537 @@
+"""
+Startup and per-call latency benchmarks for AI Interaction Tool
+
+Runs offscreen (QT_QPA_PLATFORM=offscreen) against a throw-away config file and
+measures each stage separately:
+- cold import of the package, the MCP server module and the Qt dialog module
+- QApplication creation
+- InputDialog.__init__, broken down by _setup_* / _create_* / _restore_* step
+- first paint after show()
+- submit_text serialization and build_ui_result
+- format_text_only_response / format_mixed_response
+- process_images on a 4K screenshot (downscale + recompress)
+- preview thumbnails for 30 saved screenshots, from the on-disk thumbnail cache
+- a full tool call through the replay responder
+- config writes with 500 attached files (preference change, one appended file)
+
+Usage (from the project root):
+    python benchmarks/run_benchmarks.py                      # compare with baselines.json
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --update-baseline    # add baselines for new stages only
+    python benchmarks/run_benchmarks.py --reset-baseline     # store all current numbers as baseline
+
+Exit code is 1 when a metric's median regresses by more than --threshold
+(relative) and more than --noise-floor milliseconds over its baseline.
+
+Baselines are machine-specific. --update-baseline keeps the numbers already
+in baselines.json and only adds metrics it has no baseline for, so a change
+that adds a stage does not silently re-baseline the existing ones;
+--reset-baseline is for starting over on another machine.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+BASELINE_PATH = os.path.join(PROJECT_ROOT, "benchmarks", "baselines.json")
+DEFAULT_THRESHOLD = 0.25  # +25% so với baseline là regression
+DEFAULT_NOISE_FLOOR_MS = 2.0  # Bỏ qua chênh lệch nhỏ hơn mức nhiễu đo
+DEFAULT_REPEAT = 5  # Số lần lặp cho stage nặng (import, dựng dialog)
+LIGHT_REPEAT = 50  # Số lần lặp cho stage nhẹ (format, serialize)
+
+# Đo import lạnh trong process mới - mỗi stage cộng dồn lên stage trước
+COLD_IMPORT_SNIPPET = """
+import json, time
+t0 = time.perf_counter()
+import ai_interaction_tool
+t1 = time.perf_counter()
+import mcp_server
+t2 = time.perf_counter()
+from ai_interaction_tool.core import dialog
+t3 = time.perf_counter()
+print(json.dumps({
+    "import.package": (t1 - t0) * 1000,
+    "import.mcp_server": (t2 - t1) * 1000,
+    "import.qt_dialog": (t3 - t2) * 1000
+}))
+"""
+
+QAPPLICATION_SNIPPET = """
+import json, time
+from PyQt5 import QtWidgets
+from ai_interaction_tool.engine import get_application
+t0 = time.perf_counter()
+get_application()
+print(json.dumps({"qt.qapplication": (time.perf_counter() - t0) * 1000}))
+"""
+
+
+class Samples:
+    """Collects millisecond samples per metric name"""
+
+    def __init__(self):
+        self.values = {}
+
+    def add(self, name, milliseconds):
+        self.values.setdefault(name, []).append(milliseconds)
+
+    def summary(self):
+        return {
+            name: {
+                "median_ms": round(statistics.median(values), 3),
+                "min_ms": round(min(values), 3),
+                "max_ms": round(max(values), 3),
+                "samples": len(values)
+            }
+            for name, values in sorted(self.values.items())
+        }
+
+
+def _run_snippet(snippet, env):
+    """Run a snippet in a fresh interpreter and return the JSON it prints"""
+    completed = subprocess.run(
+        [sys.executable, "-c", snippet],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark subprocess failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def bench_cold_start(samples, env, repeat):
+    """Cold import and QApplication creation, each in a fresh process"""
+    for _ in range(repeat):
+        for name, value in _run_snippet(COLD_IMPORT_SNIPPET, env).items():
+            samples.add(name, value)
+        for name, value in _run_snippet(QAPPLICATION_SNIPPET, env).items():
+            samples.add(name, value)
+
+
+def _process_events(app, milliseconds):
+    """Let pending timers (e.g. delayed image restore) run"""
+    deadline = time.perf_counter() + milliseconds / 1000
+    while time.perf_counter() < deadline:
+        app.processEvents()
+
+
+def _dialog_steps(dialog_class):
+    """Construction steps of InputDialog, discovered by name"""
+    return sorted(
+        name for name in vars(dialog_class)
+        if name.startswith(("_setup_", "_create_", "_build_", "_restore_", "_refresh_")) and callable(getattr(dialog_class, name))
+    )
+
+
+def bench_dialog_init(samples, app, repeat):
+    """InputDialog.__init__ total and per step"""
+    from ai_interaction_tool.core.dialog import InputDialog
+
+    step_names = _dialog_steps(InputDialog)
+    originals = {name: getattr(InputDialog, name) for name in step_names}
+
+    def timed(name, method):
+        def wrapper(self, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                samples.add(f"dialog.step.{name.lstrip('_')}", (time.perf_counter() - started) * 1000)
+        return wrapper
+
+    for name, method in originals.items():
+        setattr(InputDialog, name, timed(name, method))
+    try:
+        # Lần dựng đầu tiên trả giá parse stylesheet/font, đo riêng
+        for index in range(repeat + 1):
+            started = time.perf_counter()
+            dialog = InputDialog(prompt="Benchmark prompt\nwith two lines")
+            elapsed = (time.perf_counter() - started) * 1000
+            samples.add("dialog.init_first" if index == 0 else "dialog.init", elapsed)
+            _process_events(app, 150)
+            dialog.deleteLater()
+            app.processEvents()
+    finally:
+        for name, method in originals.items():
+            setattr(InputDialog, name, method)
+
+
+def bench_dialog_pool(samples, app, repeat):
+    """Acquire a pooled dialog that was used and released before (reset instead of rebuild)"""
+    from ai_interaction_tool.core.dialog_pool import DialogPool
+
+    pool = DialogPool(size=1, enabled=True)
+    pool.prewarm()
+    for _ in range(repeat):
+        started = time.perf_counter()
+        dialog = pool.acquire("Benchmark prompt\nwith two lines")
+        samples.add("dialog.pool_acquire", (time.perf_counter() - started) * 1000)
+        dialog.input.setPlainText("draft left over from the previous call")
+        _process_events(app, 50)
+        pool.release(dialog)
+
+
+def bench_first_paint(samples, app, repeat):
+    """Time from show() until the dialog receives its first paint event"""
+    from PyQt5 import QtCore
+    from ai_interaction_tool.core.dialog import InputDialog
+
+    class PaintWatcher(QtCore.QObject):
+        def __init__(self):
+            super().__init__()
+            self.painted_at = None
+
+        def eventFilter(self, obj, event):
+            if event.type() == QtCore.QEvent.Paint and self.painted_at is None:
+                self.painted_at = time.perf_counter()
+            return False
+
+    for _ in range(repeat):
+        dialog = InputDialog(prompt="Benchmark prompt")
+        watcher = PaintWatcher()
+        dialog.installEventFilter(watcher)
+
+        started = time.perf_counter()
+        dialog.show()
+        deadline = started + 5
+        while watcher.painted_at is None and time.perf_counter() < deadline:
+            app.processEvents()
+        if watcher.painted_at is None:
+            # Một số platform plugin không gửi paint event, ép render để vẫn có số đo
+            dialog.grab()
+            watcher.painted_at = time.perf_counter()
+        samples.add("dialog.first_paint", (watcher.painted_at - started) * 1000)
+
+        # Phần phụ dựng dần sau khi hiển thị - đợi xong rồi lấy số đo của chính dialog
+        deadline = time.perf_counter() + 5
+        while dialog.deferred_steps and time.perf_counter() < deadline:
+            app.processEvents()
+        if dialog.time_to_interactive is not None:
+            samples.add("dialog.time_to_interactive", dialog.time_to_interactive * 1000)
+        if dialog.time_to_complete is not None:
+            samples.add("dialog.time_to_complete", dialog.time_to_complete * 1000)
+
+        dialog.removeEventFilter(watcher)
+        dialog.hide()
+        dialog.deleteLater()
+        _process_events(app, 150)
+
+
+def _make_image_payload(work_dir, width=256, height=256):
+    """A PNG file attachment in the same shape as ImageAttachmentWidget entries"""
+    from PyQt5 import QtGui
+
+    image = QtGui.QImage(width, height, QtGui.QImage.Format_RGB32)
+    for y in range(height):
+        for x in range(width):
+            image.setPixel(x, y, QtGui.qRgb(x % 256, y % 256, (x * y) % 256))
+    path = os.path.join(work_dir, f"benchmark_{width}x{height}.png")
+    image.save(path, "PNG")
+    return {
+        "path": path,
+        "filename": os.path.basename(path),
+        "media_type": "image/png"
+    }
+
+
+def _make_screenshot(work_dir, width=3840, height=2160):
+    """A 4K PNG screenshot full of text, the typical image of a coding session"""
+    from PyQt5 import QtCore, QtGui
+
+    image = QtGui.QImage(width, height, QtGui.QImage.Format_RGB32)
+    image.fill(QtGui.QColor("#1e1e1e"))
+    painter = QtGui.QPainter(image)
+    painter.setPen(QtGui.QColor("#d4d4d4"))
+    line = "def handle_request(self, payload): return self.formatter.render(payload, strict=True)  # noqa " * 2
+    for y in range(0, height, 18):
+        painter.drawText(QtCore.QPoint(10, y + 14), line)
+    painter.end()
+    path = os.path.join(work_dir, "screenshot_4k.png")
+    image.save(path, "PNG")
+    return {"path": path, "filename": os.path.basename(path), "media_type": "image/png"}
+
+
+def _sample_files(count=20):
+    return [
+        {"relative_path": f"src/module_{i}.py", "workspace_name": "benchmark", "name": f"module_{i}.py", "type": "file"}
+        for i in range(count)
+    ]
+
+
+def bench_submit(samples, app, repeat, images):
+    """submit_text serialization and build_ui_result on a filled dialog"""
+    from ai_interaction_tool.core.dialog import InputDialog
+    from ai_interaction_tool.core.response_formatter import build_ui_result
+
+    text = "Benchmark message line\n" * 200
+    for _ in range(repeat):
+        dialog = InputDialog()
+        _process_events(app, 150)
+        dialog.input.setPlainText(text)
+        dialog.attached_files = _sample_files()
+        dialog.image_attachment_widget.attached_images = list(images)
+
+        started = time.perf_counter()
+        dialog.submit_text()
+        samples.add("dialog.submit_text", (time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        build_ui_result(dialog.result_text, dialog.result_continue, True, None)
+        samples.add("format.build_ui_result", (time.perf_counter() - started) * 1000)
+
+        dialog.deleteLater()
+        app.processEvents()
+
+
+def bench_formatting(samples, repeat, images):
+    """format_text_only_response and format_mixed_response"""
+    from ai_interaction_tool.core.response_formatter import (
+        build_ui_result, format_text_only_response, format_mixed_response
+    )
+
+    text_payload = json.dumps({"text": "Benchmark message\n" * 200, "language": "en", "attached_files": _sample_files()})
+    tagged = build_ui_result(text_payload, True, True)
+    mixed = {
+        "text_content": "Benchmark message",
+        "attached_files": _sample_files(),
+        "attached_images": [{k: img[k] for k in ("path", "media_type", "filename")} for img in images],
+        "continue_chat": True,
+        "status": None
+    }
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        format_text_only_response(tagged)
+        samples.add("format.text_only", (time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        format_mixed_response(mixed)
+        samples.add("format.mixed", (time.perf_counter() - started) * 1000)
+
+
+def bench_image_optimize(samples, repeat, work_dir):
+    """process_images on a 4K screenshot: downscale + recompress (Pillow) before encoding"""
+    from ai_interaction_tool.utils.image_processing import process_images
+
+    screenshot = _make_screenshot(work_dir)
+    for _ in range(repeat):
+        started = time.perf_counter()
+        process_images([screenshot])
+        samples.add("images.process_4k_screenshot", (time.perf_counter() - started) * 1000)
+
+
+def bench_thumbnails(samples, repeat, work_dir, count=30):
+    """Preview thumbnails of saved images when a dialog is reopened (thumbnail cache warm)"""
+    from PyQt5 import QtGui
+    from ai_interaction_tool.core import image_store
+    from ai_interaction_tool.ui.thumbnail_cache import get_thumbnail
+
+    # Store riêng trong work_dir, không đụng user_images thật
+    image_store._image_store = image_store.ImageStore(work_dir)
+    source = _make_screenshot(work_dir, 1920, 1080)["path"]
+    blobs = []
+    for i in range(count):
+        # Mỗi ảnh một nội dung khác nhau (một pixel khác) để không bị dedupe
+        image = QtGui.QImage(source)
+        image.setPixel(0, 0, QtGui.qRgb(i, 0, 0))
+        path = os.path.join(work_dir, f"saved_{i}.png")
+        image.save(path, "PNG")
+        blobs.append(image_store.get_image_store().put_file(path))
+    for blob in blobs:
+        get_thumbnail(blob["path"], blob["sha256"])
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for blob in blobs:
+            get_thumbnail(blob["path"], blob["sha256"])
+        samples.add("images.restore_30_thumbnails", (time.perf_counter() - started) * 1000)
+    image_store.get_image_store().close()
+    image_store._image_store = None
+
+
+def bench_tool_call(samples, repeat, images, work_dir):
+    """Full ai_interaction_tool call through the replay responder (no human, no display)"""
+    from ai_interaction_tool.core import mcp_handler
+    from ai_interaction_tool.core.responders import ReplayResponder, set_responder
+
+    replay_path = os.path.join(work_dir, "answers.jsonl")
+    with open(replay_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"text": "text answer", "attached_files": _sample_files()}) + "\n")
+        f.write(json.dumps({
+            "text": "image answer",
+            "attached_images": [{k: img[k] for k in ("path", "media_type", "filename")} for img in images]
+        }) + "\n")
+
+    set_responder(ReplayResponder(replay_path, loop=True))
+    try:
+        async def run():
+            for _ in range(repeat):
+                for name in ("call.replay_text", "call.replay_images"):
+                    started = time.perf_counter()
+                    await mcp_handler.ai_interaction_tool()
+                    samples.add(name, (time.perf_counter() - started) * 1000)
+        asyncio.run(run())
+    finally:
+        set_responder(None)
+
+
+def bench_config(samples, repeat, work_dir):
+    """Config writes with a long attached-files list: preference change and one more attached file"""
+    from ai_interaction_tool.core.config import ConfigManager
+
+    manager = ConfigManager()
+    manager.set_last_workspace(os.path.join(work_dir, "workspace"))
+    files = [{"path": f"src/module_{i}.py", "name": f"module_{i}.py"} for i in range(500)]
+    manager.set_last_attached_files(files)
+    manager.flush()
+
+    for i in range(repeat):
+        started = time.perf_counter()
+        manager.set_window_size(900 + i % 2, 750)
+        manager.flush()
+        samples.add("config.write_preference", (time.perf_counter() - started) * 1000)
+
+        files = files + [{"path": f"src/extra_{i}.py", "name": f"extra_{i}.py"}]
+        started = time.perf_counter()
+        manager.set_last_attached_files(files)
+        manager.flush()
+        samples.add("config.append_attached_file", (time.perf_counter() - started) * 1000)
+
+
+def compare(results, baseline, threshold, noise_floor):
+    """
+    Compare medians with the baseline
+
+    Returns:
+        list: (name, baseline_ms, current_ms) of regressed metrics
+    """
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        current_ms, baseline_ms = current["median_ms"], reference["median_ms"]
+        if current_ms > baseline_ms * (1 + threshold) and current_ms - baseline_ms > noise_floor:
+            regressions.append((name, baseline_ms, current_ms))
+    return regressions
+
+
+def print_report(results, baseline, file=sys.stderr):
+    print(f"{'metric':<48}{'median ms':>12}{'baseline':>12}{'change':>10}", file=file)
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if reference:
+            change = (current["median_ms"] / reference["median_ms"] - 1) * 100 if reference["median_ms"] else 0.0
+            print(f"{name:<48}{current['median_ms']:>12.2f}{reference['median_ms']:>12.2f}{change:>+9.1f}%", file=file)
+        else:
+            print(f"{name:<48}{current['median_ms']:>12.2f}{'-':>12}{'-':>10}", file=file)
+
+
+def run(repeat, light_repeat):
+    """Run every stage and return the result document"""
+    work_dir = tempfile.mkdtemp(prefix="ai-interaction-bench-")
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    # Không bao giờ đụng tới config và user_images thật của user
+    os.environ["AI_INTERACTION_CONFIG_PATH"] = os.path.join(work_dir, "config.json")
+    os.environ["AI_INTERACTION_IMAGES_DIR"] = os.path.join(work_dir, "user_images")
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT)
+
+    samples = Samples()
+    bench_cold_start(samples, env, repeat)
+
+    from ai_interaction_tool.engine import get_application
+    app = get_application()
+    images = [_make_image_payload(work_dir), _make_image_payload(work_dir, 512, 384)]
+
+    bench_dialog_init(samples, app, repeat)
+    bench_dialog_pool(samples, app, repeat)
+    bench_first_paint(samples, app, repeat)
+    bench_submit(samples, app, repeat, images)
+    bench_formatting(samples, light_repeat, images)
+    bench_image_optimize(samples, repeat, work_dir)
+    bench_thumbnails(samples, repeat, work_dir)
+    bench_tool_call(samples, light_repeat, images, work_dir)
+    bench_config(samples, light_repeat, work_dir)
+
+    from PyQt5.QtCore import QT_VERSION_STR
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "qt": QT_VERSION_STR,
+            "repeat": repeat,
+            "light_repeat": light_repeat,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")
+        },
+        "metrics": samples.summary()
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="AI Interaction Tool latency benchmarks")
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true", help="Add metrics missing from the baseline")
+    parser.add_argument("--reset-baseline", action="store_true", help="Replace the whole baseline with the results")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed relative slowdown")
+    parser.add_argument("--noise-floor", type=float, default=DEFAULT_NOISE_FLOOR_MS, help="Ignore slowdowns below this many ms")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--light-repeat", type=int, default=LIGHT_REPEAT)
+    args = parser.parse_args(argv)
+
+    document = run(args.repeat, args.light_repeat)
+    output = json.dumps(document, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    existing = None
+    if os.path.exists(args.baseline) and not args.reset_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            existing = json.load(f)
+
+    if args.update_baseline or args.reset_baseline:
+        if existing is not None:
+            # Chỉ thêm metric mới, baseline cũ giữ nguyên để vẫn so được với nó
+            added = sorted(set(document["metrics"]) - set(existing["metrics"]))
+            existing["metrics"] = dict(sorted({
+                **existing["metrics"], **{name: document["metrics"][name] for name in added}
+            }.items()))
+            document = existing
+            print(f"[Benchmark] Added baselines for: {', '.join(added) or 'nothing'}", file=sys.stderr)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            f.write(json.dumps(document, indent=2) + "\n")
+        print(f"[Benchmark] Baseline updated: {args.baseline}", file=sys.stderr)
+        return 0
+
+    baseline = {}
+    if existing is not None:
+        baseline = existing.get("metrics", {})
+    else:
+        print(f"[Benchmark] No baseline at {args.baseline}, skipping regression check", file=sys.stderr)
+
+    print_report(document["metrics"], baseline)
+    regressions = compare(document["metrics"], baseline, args.threshold, args.noise_floor)
+    for name, baseline_ms, current_ms in regressions:
+        print(f"[Benchmark] REGRESSION {name}: {baseline_ms:.2f} ms -> {current_ms:.2f} ms", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
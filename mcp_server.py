@@ -1,12 +1,31 @@
+import asyncio
+import json
+
 from mcp.server.fastmcp import FastMCP
 # Import MCP tool function and description from ai_interaction_tool
-from ai_interaction_tool.core import ai_interaction_tool, get_tool_description
+from ai_interaction_tool.core import ai_interaction_tool, get_tool_description, get_interaction_metrics, warm_up
+from ai_interaction_tool.core.ui_host import start_ui_host
 
 # Tạo MCP server
 mcp = FastMCP("AI Interaction")
 
 mcp.add_tool(ai_interaction_tool, description=get_tool_description())
 
+
+@mcp.resource("ai-interaction://metrics", name="interaction_metrics", mime_type="application/json")
+async def interaction_metrics() -> str:
+    """Queue depth and per-request wait time of pending interactions"""
+    # Hỏi UI host qua pipe có thể chờ tới vài giây, không chặn event loop
+    return json.dumps(await asyncio.to_thread(get_interaction_metrics), ensure_ascii=False, indent=2)
+
 if __name__ == "__main__":
-    # Chạy server với transport=stdio
-    mcp.run(transport="stdio")
\ No newline at end of file
+    # Khởi động và làm nóng UI host process trước khi nhận request đầu tiên
+    ui_host = start_ui_host()
+    # Không có UI host: load Qt ở background thay vì trong lần gọi đầu tiên
+    warm_up()
+    try:
+        # Chạy server với transport=stdio
+        mcp.run(transport="stdio")
+    finally:
+        if ui_host is not None:
+            ui_host.shutdown()
\ No newline at end of file
@@ -0,0 +1,22 @@
+# Fixture dùng chung: config, danh sách và image store của mỗi test nằm trong
+# thư mục tạm, không động tới config.json/user_images của project.
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_interaction_tool.constants import CONFIG_PATH_ENV_VAR, IMAGES_DIR_ENV_VAR  # noqa: E402
+from ai_interaction_tool.core import image_store  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def isolated_paths(tmp_path, monkeypatch):
+    monkeypatch.setenv(CONFIG_PATH_ENV_VAR, str(tmp_path / "config.json"))
+    monkeypatch.setenv(IMAGES_DIR_ENV_VAR, str(tmp_path / "user_images"))
+    monkeypatch.setattr(image_store, "_image_store", None)
+    yield tmp_path
+    if image_store._image_store is not None:
+        image_store._image_store.close()
@@ -0,0 +1,102 @@
+import json
+import sqlite3
+
+from ai_interaction_tool.core.config import ConfigManager
+from ai_interaction_tool.core.config_store import (
+    JsonConfigStore, SqliteConfigStore, create_config_store, flatten_config, unflatten_config
+)
+
+
+def test_flatten_round_trip():
+    config = {"language": "vi", "last_workspace": None, "ui": {"size": {"width": 900}, "empty": {}}}
+
+    records = flatten_config(config)
+
+    assert records == {"language": "vi", "last_workspace": None, "ui.size.width": 900, "ui.empty": {}}
+    assert unflatten_config(records) == config
+
+
+def test_create_config_store_backend(tmp_path, monkeypatch):
+    json_path = str(tmp_path / "config.json")
+    assert isinstance(create_config_store(json_path), JsonConfigStore)
+    monkeypatch.setenv("AI_INTERACTION_CONFIG_BACKEND", "sqlite")
+    store = create_config_store(json_path)
+    assert isinstance(store, SqliteConfigStore)
+    assert store.path == str(tmp_path / "config.db")
+    assert isinstance(create_config_store(json_path, "unknown"), JsonConfigStore)
+
+
+def test_sqlite_store_writes_only_changed_subtrees(tmp_path):
+    store = SqliteConfigStore(str(tmp_path / "config.db"))
+    assert not store.exists()
+    config = {"language": "en", "last_workspace": None, "ui": {"width": 900, "height": 750}}
+    store.commit(store.prepare(config, None))
+    assert store.exists()
+
+    # Process khác đổi một key trong lúc này
+    other = SqliteConfigStore(str(tmp_path / "config.db"))
+    other.commit(other.prepare({"language": "vi"}, {"language"}))
+
+    config["last_workspace"] = {"path": "/w", "name": "w"}
+    del config["ui"]["height"]
+    store.commit(store.prepare(config, {"last_workspace", "ui.height"}))
+
+    assert SqliteConfigStore(str(tmp_path / "config.db")).load() == {
+        "language": "vi", "last_workspace": {"path": "/w", "name": "w"}, "ui": {"width": 900}
+    }
+
+
+def test_sqlite_store_imports_json_once(tmp_path):
+    json_path = tmp_path / "config.json"
+    json_path.write_text(json.dumps({"language": "vi", "ui": {"width": 1000}}), encoding="utf-8")
+    store = SqliteConfigStore(str(tmp_path / "config.db"), json_path=str(json_path))
+
+    assert store.load() == {"language": "vi", "ui": {"width": 1000}}
+    json_path.write_text(json.dumps({"language": "en"}), encoding="utf-8")
+    assert store.load()["language"] == "vi"
+
+
+def test_managers_in_different_processes_keep_each_others_changes(tmp_path):
+    first = ConfigManager(backend="sqlite")
+    second = ConfigManager(backend="sqlite")
+
+    first.set_language("vi")
+    assert first.save_config(wait=True)
+    second.set("ui_preferences.continue_chat_default", True)
+    assert second.save_config(wait=True)
+
+    reloaded = ConfigManager(backend="sqlite")
+    assert reloaded.get_language() == "vi"
+    assert reloaded.get("ui_preferences.continue_chat_default") is True
+
+
+def test_sqlite_backend_keeps_lists_in_database(tmp_path):
+    manager = ConfigManager(backend="sqlite")
+    manager.set_last_attached_files([{"path": "a.py"}, {"path": "b.py"}])
+    manager.flush()
+
+    with sqlite3.connect(str(tmp_path / "config.db")) as connection:
+        names = [row[0] for row in connection.execute("SELECT name FROM lists")]
+    assert names == ["attached_files.global"]
+    assert not (tmp_path / "config_lists").exists()
+    assert ConfigManager(backend="sqlite").get_last_attached_files() == [{"path": "a.py"}, {"path": "b.py"}]
+
+
+def test_json_backend_round_trip_and_write_failure(tmp_path, monkeypatch):
+    manager = ConfigManager(backend="json")
+    manager.set_last_attached_files([{"path": "a.py"}])
+    manager.set_language("vi")
+    assert manager.save_config(wait=True)
+
+    reloaded = ConfigManager(backend="json")
+    assert reloaded.get_language() == "vi"
+    assert reloaded.get_last_attached_files() == [{"path": "a.py"}]
+    assert (tmp_path / "config_lists" / "attached_files.global.jsonl").exists()
+
+    def fail(content):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(reloaded.store, "commit", fail)
+    reloaded.set_language("en")
+    assert reloaded.save_config(wait=True) is False
+    assert reloaded.save_config() is False
@@ -0,0 +1,128 @@
+import io
+import os
+
+import pytest
+
+from ai_interaction_tool.constants import (
+    IMAGE_BUDGET_BYTES_ENV_VAR, IMAGE_BUDGET_TOKENS_ENV_VAR, IMAGE_BUDGET_MIN_DIMENSION
+)
+from ai_interaction_tool.utils import image_optimizer
+from ai_interaction_tool.utils.image_optimizer import apply_image_budget, estimate_image_tokens
+from ai_interaction_tool.utils.image_processing import _budget_item
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _photo(path, size=(1000, 750)):
+    """Ảnh nhiễu (nén kém như ảnh chụp), lưu PNG"""
+    image = Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3))
+    image.save(path, "PNG")
+    return str(path)
+
+
+def _items(paths):
+    return [_budget_item({"path": path, "filename": os.path.basename(path)}, False) for path in paths]
+
+
+def _budget(monkeypatch, tokens=0, max_bytes=0):
+    monkeypatch.setenv(IMAGE_BUDGET_TOKENS_ENV_VAR, str(tokens))
+    monkeypatch.setenv(IMAGE_BUDGET_BYTES_ENV_VAR, str(max_bytes))
+
+
+def _tokens(items):
+    return sum(estimate_image_tokens(item["size"]) for item in items)
+
+
+def test_within_budget_is_unchanged(tmp_path, monkeypatch):
+    _budget(monkeypatch, tokens=10000)
+    items = _items([_photo(tmp_path / "a.png")])
+
+    assert apply_image_budget(items) == []
+    assert items[0]["path"].endswith("a.png")
+    assert "raw" not in items[0]
+
+
+def test_images_are_downscaled_to_fit(tmp_path, monkeypatch):
+    _budget(monkeypatch, tokens=2000)
+    items = _items([_photo(tmp_path / f"{name}.png") for name in "abc"])
+    assert _tokens(items) == 3000
+
+    report = apply_image_budget(items)
+
+    assert [entry["filename"] for entry in items] == ["a.png", "b.png", "c.png"]
+    assert [(entry["filename"], entry["action"]) for entry in report] == [
+        ("a.png", "resized"), ("b.png", "resized"), ("c.png", "resized")
+    ]
+    assert _tokens(items) <= 2000
+    for entry, item in zip(report, items):
+        assert entry["original_size"] == (1000, 750)
+        assert max(item["size"]) >= IMAGE_BUDGET_MIN_DIMENSION
+        assert item["mime"] == "image/jpeg"
+        with Image.open(io.BytesIO(item["raw"])) as decoded:
+            assert decoded.size == tuple(item["size"])
+
+
+def test_last_images_are_dropped_first(tmp_path, monkeypatch):
+    # Ở kích thước nhỏ nhất (512x384) mỗi ảnh ~263 token: chỉ đủ chỗ cho một ảnh
+    _budget(monkeypatch, tokens=400)
+    items = _items([_photo(tmp_path / f"{name}.png") for name in "abc"])
+
+    report = apply_image_budget(items)
+
+    assert [item["filename"] for item in items] == ["a.png"]
+    assert [(entry["filename"], entry["action"]) for entry in report] == [
+        ("a.png", "resized"), ("b.png", "dropped"), ("c.png", "dropped")
+    ]
+    assert max(items[0]["size"]) == IMAGE_BUDGET_MIN_DIMENSION
+    assert report[1]["original_bytes"] == os.path.getsize(tmp_path / "b.png")
+
+
+def test_first_image_is_always_kept(tmp_path, monkeypatch):
+    _budget(monkeypatch, tokens=1)
+    items = _items([_photo(tmp_path / "a.png"), _photo(tmp_path / "b.png")])
+
+    report = apply_image_budget(items)
+
+    assert [item["filename"] for item in items] == ["a.png"]
+    assert report[-1] == {
+        "filename": "b.png", "action": "dropped", "original_size": (1000, 750),
+        "original_bytes": os.path.getsize(tmp_path / "b.png")
+    }
+
+
+def test_byte_budget_is_met(tmp_path, monkeypatch):
+    path = _photo(tmp_path / "a.png", (600, 450))
+    _budget(monkeypatch, max_bytes=os.path.getsize(path) // 3)
+    items = _items([path])
+
+    report = apply_image_budget(items)
+
+    assert report[0]["action"] == "resized"
+    assert max(items[0]["size"]) >= IMAGE_BUDGET_MIN_DIMENSION
+    assert items[0]["bytes"] <= os.path.getsize(path) // 3
+
+
+def test_animated_images_are_not_reencoded(tmp_path, monkeypatch):
+    frames = [Image.frombytes("RGB", (800, 600), os.urandom(800 * 600 * 3)).convert("P") for _ in range(2)]
+    gif_path = str(tmp_path / "anim.gif")
+    frames[0].save(gif_path, save_all=True, append_images=frames[1:], duration=100)
+    _budget(monkeypatch, tokens=1100)
+    items = _items([gif_path, _photo(tmp_path / "b.png")])
+
+    report = apply_image_budget(items)
+
+    assert items[0]["path"] == gif_path
+    assert not items[0].get("degraded")
+    assert [(entry["filename"], entry["action"]) for entry in report] == [("b.png", "resized")]
+
+
+def test_without_pillow_images_are_only_dropped(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_optimizer, "_pillow_available", lambda: False)
+    _budget(monkeypatch, tokens=1500)
+    items = _items([_photo(tmp_path / f"{name}.png") for name in "abc"])
+
+    report = apply_image_budget(items)
+
+    assert [item["filename"] for item in items] == ["a.png"]
+    assert [entry["action"] for entry in report] == ["dropped", "dropped"]
+    assert "raw" not in items[0]
@@ -0,0 +1,88 @@
+import base64
+import io
+import struct
+
+import pytest
+
+from ai_interaction_tool.utils.image_format import (
+    sniff_image_format, read_image_size, sniff_base64, sniff_file, read_file_header,
+    is_client_format, extension_for
+)
+
+
+def _png(width, height):
+    return b"\x89PNG\r\n\x1a\n" + b"\x00\x00\x00\rIHDR" + struct.pack(">II", width, height) + b"\x08\x06\x00\x00\x00"
+
+
+def _webp(chunk, payload):
+    return b"RIFF" + struct.pack("<I", 4 + len(payload)) + b"WEBP" + chunk + struct.pack("<I", len(payload)) + payload
+
+
+HEADERS = {
+    "png": _png(640, 480),
+    "gif": b"GIF89a" + struct.pack("<HH", 320, 200) + b"\x00" * 6,
+    "bmp": b"BM" + b"\x00" * 16 + struct.pack("<ii", 300, -150) + b"\x00" * 8,
+    "webp": _webp(b"VP8X", b"\x00" * 4 + (1023).to_bytes(3, "little") + (767).to_bytes(3, "little")),
+    "tiff": b"II*\x00" + b"\x00" * 12,
+    "ico": b"\x00\x00\x01\x00" + b"\x00" * 12,
+}
+
+
+@pytest.mark.parametrize("image_format", sorted(HEADERS))
+def test_sniff_image_format(image_format):
+    assert sniff_image_format(HEADERS[image_format][:16]) == image_format
+
+
+def test_sniff_unknown_and_short_headers():
+    assert sniff_image_format(b"") is None
+    assert sniff_image_format(b"<svg xmlns=") is None
+    assert sniff_image_format(b"RIFF\x00\x00\x00\x00WAVE") is None
+    assert read_image_size(b"\x89PNG\r\n\x1a\n\x00\x00") is None
+
+
+@pytest.mark.parametrize("image_format, size", [
+    ("png", (640, 480)),
+    ("gif", (320, 200)),
+    ("bmp", (300, 150)),
+    ("webp", (1024, 768)),
+])
+def test_read_image_size(image_format, size):
+    assert read_image_size(HEADERS[image_format]) == size
+
+
+def test_read_webp_lossless_size():
+    bits = (800 - 1) | ((600 - 1) << 14)
+    header = _webp(b"VP8L", b"\x2f" + bits.to_bytes(4, "little") + b"\x00" * 8)
+    assert read_image_size(header) == (800, 600)
+
+
+def test_read_jpeg_size_after_exif_segment():
+    Image = pytest.importorskip("PIL.Image")
+    exif = Image.Exif()
+    exif[0x010E] = "x" * 20000  # ImageDescription: SOF nằm sau một APP1 lớn
+    buffer = io.BytesIO()
+    Image.new("RGB", (123, 45)).save(buffer, "JPEG", exif=exif.tobytes())
+    data = buffer.getvalue()
+
+    assert sniff_image_format(data[:16]) == "jpeg"
+    assert read_image_size(data) == (123, 45)
+    assert read_image_size(data[:1000]) is None
+
+
+def test_sniff_file_and_base64(tmp_path):
+    path = tmp_path / "really_a_gif.png"
+    path.write_bytes(HEADERS["gif"])
+
+    assert sniff_file(str(path)) == "gif"
+    assert sniff_file(str(tmp_path / "missing.png")) is None
+    assert read_file_header(str(tmp_path / "missing.png")) == b""
+    assert sniff_base64(base64.b64encode(HEADERS["webp"]).decode("ascii")) == "webp"
+    assert sniff_base64("not base64!") is None
+
+
+def test_client_formats_and_extensions():
+    assert is_client_format("jpeg")
+    assert not is_client_format("bmp")
+    assert not is_client_format(None)
+    assert extension_for("jpeg") == ".jpg"
+    assert extension_for("avif") == ".avif"
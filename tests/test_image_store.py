@@ -0,0 +1,185 @@
+import os
+import types
+
+import pytest
+
+from ai_interaction_tool.core import image_store
+from ai_interaction_tool.core.image_store import ImageStore, session_holder
+
+
+class Clock:
+    """time.time() giả cho image_store, tăng tay giữa các bước"""
+
+    def __init__(self, start):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(1_700_000_000.0)
+    monkeypatch.setattr(image_store, "time", types.SimpleNamespace(time=clock.time))
+    return clock
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ImageStore(str(tmp_path / "user_images"))
+    yield store
+    store.close()
+
+
+def _blob(index, size=100):
+    return bytes([index]) * size
+
+
+def test_put_bytes_deduplicates_and_counts_refs(store):
+    first = store.put_bytes(_blob(1), ".png", holder="config:a")
+    second = store.put_bytes(_blob(1), ".PNG", holder="config:b")
+
+    assert not first["deduplicated"]
+    assert second["deduplicated"]
+    assert second["path"] == first["path"]
+    assert os.path.exists(first["path"])
+    assert store.sha_from_path(first["path"]) == first["sha256"]
+    assert store.ref_counts() == {first["sha256"]: 2}
+
+
+def test_put_file_copies_into_store(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(image_store, "IMAGE_STORE_LINK_FILES", False)
+    source = tmp_path / "photo.JPG"
+    source.write_bytes(_blob(7, 5000))
+
+    result = store.put_file(str(source), holder="config:a")
+
+    assert result["path"].endswith(".jpg")
+    assert not result["linked"]
+    assert result["size_bytes"] == 5000
+    assert not os.path.samefile(result["path"], source)
+    assert store.verify(result["path"])
+
+
+def test_empty_file_is_rejected(store, tmp_path):
+    source = tmp_path / "empty.png"
+    source.write_bytes(b"")
+    with pytest.raises(ValueError):
+        store.put_file(str(source))
+
+
+def test_release_then_garbage_collection_after_grace(store, clock):
+    kept = store.put_bytes(_blob(1), ".png", holder="config:a")
+    released = store.put_bytes(_blob(2), ".png", holder="config:a")
+
+    store.set_holder_refs("config:a", [kept["sha256"]])
+    assert store.collect_garbage(grace=60) == 0
+
+    clock.advance(61)
+    assert store.collect_garbage(grace=60) == 1
+    assert store.known_shas() == {kept["sha256"]}
+    assert not os.path.exists(released["path"])
+    assert os.path.exists(kept["path"])
+
+
+def test_unheld_blob_survives_grace_period(store, clock):
+    added = store.put_bytes(_blob(3), ".png")
+
+    clock.advance(30)
+    assert store.collect_garbage(grace=60) == 0
+    # Giữ lại trong grace period: dialog kịp nhận ảnh vào danh sách đính kèm
+    store.acquire(added["sha256"], "config:a")
+    clock.advance(60)
+    assert store.collect_garbage(grace=60) == 0
+
+    store.drop_holder("config:a")
+    clock.advance(61)
+    assert store.collect_garbage(grace=60) == 1
+    assert store.known_shas() == set()
+
+
+def test_stale_session_refs_are_dropped_by_garbage_collection(store, clock):
+    added = store.put_bytes(_blob(4), ".png", holder="session:999999999:1")
+
+    assert store.collect_garbage(grace=0) == 1
+    assert added["sha256"] not in store.known_shas()
+
+
+def test_retention_evicts_least_recently_used_first(store, clock):
+    shas = []
+    for index in range(4):
+        shas.append(store.put_bytes(_blob(index, 100), ".png", holder="config:a")["sha256"])
+        clock.advance(10)
+    # Ảnh đầu tiên được lưu lại ở workspace khác: thành ảnh dùng gần nhất
+    store.set_holder_refs("config:b", [shas[0]])
+
+    evicted, evicted_bytes = store.enforce_retention(limits=(0, 0, 2), grace=0)
+
+    assert (evicted, evicted_bytes) == (2, 200)
+    assert store.known_shas() == {shas[0], shas[3]}
+    assert store.ref_counts() == {shas[0]: 2, shas[3]: 1}
+
+
+def test_retention_by_bytes_and_age(store, clock):
+    old = store.put_bytes(_blob(1, 300), ".png", holder="config:a")["sha256"]
+    clock.advance(100)
+    middle = store.put_bytes(_blob(2, 300), ".png", holder="config:a")["sha256"]
+    clock.advance(100)
+    new = store.put_bytes(_blob(3, 300), ".png", holder="config:a")["sha256"]
+
+    assert store.enforce_retention(limits=(700, 0, 0), grace=0) == (1, 300)
+    assert store.known_shas() == {middle, new}
+
+    clock.advance(50)
+    assert store.enforce_retention(limits=(0, 120, 0), grace=0) == (1, 300)
+    assert store.known_shas() == {new}
+    assert old not in store.ref_counts()
+
+
+def test_retention_never_evicts_session_images(store, clock):
+    owner = object()
+    held = store.put_bytes(_blob(1), ".png", holder=session_holder(owner))["sha256"]
+    clock.advance(10)
+    saved = store.put_bytes(_blob(2), ".png", holder="config:a")["sha256"]
+
+    assert store.enforce_retention(limits=(0, 0, 1), grace=0) == (1, 100)
+    assert store.known_shas() == {held}
+    assert saved not in store.ref_counts()
+
+    # Vượt giới hạn nhưng chỉ còn ảnh đang đính kèm - không xóa gì
+    assert store.enforce_retention(limits=(1, 0, 0), grace=0) == (0, 0)
+    assert store.known_shas() == {held}
+
+
+def test_retention_keeps_new_blobs_within_grace(store, clock):
+    store.put_bytes(_blob(1), ".png")
+    store.put_bytes(_blob(2), ".png")
+
+    assert store.enforce_retention(limits=(0, 0, 1), grace=60) == (0, 0)
+    clock.advance(61)
+    assert store.enforce_retention(limits=(0, 0, 1), grace=60) == (1, 100)
+
+
+def test_verify_detects_blob_changed_through_hardlink(store, tmp_path):
+    source = tmp_path / "linked.png"
+    source.write_bytes(_blob(9, 1000))
+
+    result = store.put_file(str(source), holder="config:a")
+    if not result["linked"]:
+        pytest.skip("filesystem does not support hard links")
+    assert store.verify(result["path"])
+
+    source.write_bytes(_blob(8, 1200))
+    assert not store.verify(result["path"])
+    # Thêm lại ảnh gốc (đã sửa) tạo blob mới thay vì dùng blob hỏng
+    readded = store.put_file(str(source), holder="config:a")
+    assert readded["sha256"] != result["sha256"]
+
+
+def test_get_image_store_uses_images_dir_override(tmp_path):
+    store = image_store.get_image_store()
+    assert store.images_dir == str(tmp_path / "user_images")
+    assert image_store.get_image_store() is store
@@ -0,0 +1,196 @@
+import json
+
+from ai_interaction_tool.constants import LIST_STORE_COMPACT_OPS
+from ai_interaction_tool.core.list_store import ListStore, SqliteListStore
+
+
+def _log(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_add_and_remove_are_appended_and_replayed(tmp_path):
+    path = str(tmp_path / "lists" / "attached_files.global.jsonl")
+    store = ListStore(path)
+
+    store.replace(["a", "b"])
+    store.flush()
+    store.replace(["a", "b", "c", "d"])
+    store.flush()
+    store.replace(["a", "d"])
+    store.flush()
+
+    assert _log(path) == [
+        {"op": "add", "items": ["a", "b"]},
+        {"op": "add", "items": ["c", "d"]},
+        {"op": "remove", "index": [1, 2]},
+    ]
+    assert ListStore(path).items() == ["a", "d"]
+
+
+def test_reorder_is_written_as_set(tmp_path):
+    path = str(tmp_path / "list.jsonl")
+    store = ListStore(path)
+    store.replace([{"path": "x"}, {"path": "y"}])
+    store.flush()
+
+    store.replace([{"path": "y"}, {"path": "x"}])
+    store.flush()
+
+    assert _log(path) == [{"op": "set", "items": [{"path": "y"}, {"path": "x"}]}]
+    assert ListStore(path).items() == [{"path": "y"}, {"path": "x"}]
+
+
+def test_unchanged_list_is_not_pending(tmp_path):
+    store = ListStore(str(tmp_path / "list.jsonl"))
+    store.replace(["a"])
+    store.flush()
+
+    assert not store.replace(["a"])
+    assert not store.has_pending()
+
+
+def test_concurrent_writers_merge_by_value(tmp_path):
+    path = str(tmp_path / "list.jsonl")
+    seed = ListStore(path)
+    seed.replace(["a", "b", "c"])
+    seed.flush()
+
+    first = ListStore(path)
+    second = ListStore(path)
+    assert first.items() == second.items() == ["a", "b", "c"]
+    first.replace(["b", "c"])
+    second.replace(["a", "b", "c", "d"])
+    first.flush()
+    second.flush()
+
+    # Thay đổi của cả hai process đều còn, vị trí xóa tính trên nội dung mới nhất
+    assert ListStore(path).items() == ["b", "c", "d"]
+    assert second.items() == ["b", "c", "d"]
+
+    second.replace(["c", "d"])
+    first.invalidate()
+    assert first.items() == ["b", "c", "d"]
+    second.flush()
+    first.invalidate()
+    assert first.items() == ["c", "d"]
+
+
+def test_item_attached_twice_is_kept_after_merge(tmp_path):
+    path = str(tmp_path / "list.jsonl")
+    store = ListStore(path)
+    store.replace([{"path": "a.py"}])
+    store.flush()
+    other = ListStore(path)
+    other.replace([{"path": "a.py"}, {"path": "b.py"}])
+    other.flush()
+
+    # Đính kèm a.py lần nữa: phần tử đã có từ trước không phải là thay đổi của process khác
+    store.replace([{"path": "a.py"}, {"path": "a.py"}])
+    store.flush()
+
+    assert ListStore(path).items() == [{"path": "a.py"}, {"path": "b.py"}, {"path": "a.py"}]
+
+
+def test_same_item_added_by_both_writers_is_not_doubled(tmp_path):
+    path = str(tmp_path / "list.jsonl")
+    first = ListStore(path)
+    second = ListStore(path)
+    assert first.items() == second.items() == []
+
+    first.replace([{"path": "a.py", "name": "a"}])
+    second.replace([{"name": "a", "path": "a.py"}, {"path": "b.py"}])
+    first.flush()
+    second.flush()
+
+    assert ListStore(path).items() == [{"path": "a.py", "name": "a"}, {"path": "b.py"}]
+
+
+def test_pending_changes_survive_invalidate(tmp_path):
+    path = str(tmp_path / "list.jsonl")
+    store = ListStore(path)
+    store.replace(["a"])
+    other = ListStore(path)
+    other.replace(["b"])
+    other.flush()
+
+    store.invalidate()
+    assert store.items() == ["b", "a"]
+    store.flush()
+    assert ListStore(path).items() == ["b", "a"]
+
+
+def test_corrupt_line_is_skipped_and_compacted(tmp_path):
+    path = tmp_path / "list.jsonl"
+    path.write_text('{"op":"add","items":["a","b"]}\n{"op":"add","ite', encoding="utf-8")
+
+    store = ListStore(str(path))
+    assert store.items() == ["a", "b"]
+    assert store.has_pending()
+
+    store.flush()
+    assert _log(path) == [{"op": "set", "items": ["a", "b"]}]
+
+
+def test_long_log_is_compacted(tmp_path):
+    path = str(tmp_path / "list.jsonl")
+    store = ListStore(path)
+    for count in range(1, LIST_STORE_COMPACT_OPS + 2):
+        store.replace(list(range(count)))
+        store.flush()
+
+    assert len(_log(path)) < LIST_STORE_COMPACT_OPS
+    assert ListStore(path).items() == list(range(LIST_STORE_COMPACT_OPS + 1))
+
+
+def test_delete_removes_file(tmp_path):
+    path = tmp_path / "list.jsonl"
+    store = ListStore(str(path))
+    store.replace(["a"])
+    store.flush()
+
+    store.delete()
+    assert not path.exists()
+    assert ListStore(str(path)).items() == []
+
+
+def test_sqlite_list_round_trip_and_merge(tmp_path):
+    db_path = str(tmp_path / "config.db")
+    first = SqliteListStore(db_path, "attached_files.global")
+    first.replace(["a", "b"])
+    first.flush()
+
+    second = SqliteListStore(db_path, "attached_files.global")
+    assert second.items() == ["a", "b"]
+    first.replace(["a"])
+    second.replace(["a", "b", "c"])
+    first.flush()
+    second.flush()
+
+    assert SqliteListStore(db_path, "attached_files.global").items() == ["a", "c"]
+
+    first.replace(["a", "c", "a"])
+    first.flush()
+    assert SqliteListStore(db_path, "attached_files.global").items() == ["a", "c", "a"]
+    assert SqliteListStore(db_path, "attached_images.global").items() == []
+
+
+def test_sqlite_list_imports_legacy_jsonl(tmp_path):
+    legacy_path = str(tmp_path / "config_lists" / "attached_files.global.jsonl")
+    legacy = ListStore(legacy_path)
+    legacy.replace(["old"])
+    legacy.flush()
+
+    store = SqliteListStore(str(tmp_path / "config.db"), "attached_files.global", legacy_path=legacy_path)
+    assert store.items() == ["old"]
+    store.replace(["old", "new"])
+    store.flush()
+
+    # Sau lần ghi đầu danh sách nằm trong database, file cũ không còn được đọc
+    legacy.replace([])
+    legacy.flush()
+    reopened = SqliteListStore(str(tmp_path / "config.db"), "attached_files.global", legacy_path=legacy_path)
+    assert reopened.items() == ["old", "new"]
+
+    reopened.delete()
+    assert SqliteListStore(str(tmp_path / "config.db"), "attached_files.global").items() == []
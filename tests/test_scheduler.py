@@ -0,0 +1,52 @@
+from ai_interaction_tool.core.scheduler import InteractionScheduler, preview_prompt
+from ai_interaction_tool.utils import metrics
+
+
+def test_requests_are_tracked_in_arrival_order():
+    scheduler = InteractionScheduler("test_scheduler")
+
+    assert scheduler.add("a", "first prompt") == 1
+    assert scheduler.add("b", "second\n  prompt", timeout=30) == 2
+    assert scheduler.queue_depth() == 2
+    assert scheduler.get("b")["timeout"] == 30
+    assert scheduler.get("missing") is None
+
+    stats = scheduler.stats()
+    assert [entry["id"] for entry in stats["pending"]] == ["a", "b"]
+    assert stats["pending"][1]["prompt"] == "second prompt"
+    assert stats["oldest_wait_seconds"] == stats["pending"][0]["wait_seconds"]
+
+
+def test_complete_reports_wait_time_once():
+    scheduler = InteractionScheduler("test_scheduler")
+    scheduler.add("a")
+
+    assert scheduler.wait_time("a") >= 0
+    wait = scheduler.complete("a", "timeout")
+    assert wait >= 0
+    assert scheduler.complete("a") is None
+    assert scheduler.wait_time("a") is None
+    assert scheduler.queue_depth() == 0
+    assert scheduler.stats() == {"queue_depth": 0, "oldest_wait_seconds": 0.0, "pending": []}
+
+
+def test_sequence_numbers_keep_growing():
+    scheduler = InteractionScheduler("test_scheduler")
+    scheduler.add("a")
+    scheduler.complete("a")
+
+    assert scheduler.add("b") == 2
+
+
+def test_stats_are_registered_with_metrics():
+    scheduler = InteractionScheduler("test_scheduler")
+    scheduler.add("a", "hello")
+
+    assert metrics.snapshot()["test_scheduler"]["queue_depth"] == 1
+    scheduler.complete("a")
+
+
+def test_preview_prompt():
+    assert preview_prompt(None) == ""
+    assert preview_prompt("  one\n two  ") == "one two"
+    assert preview_prompt("x" * 10, length=5) == "xxxx…"